@@ -0,0 +1,251 @@
+"""Agendamento das chamadas ao Ollama: backoff, concorrência adaptativa e orçamento de retries.
+
+As falhas são separadas em dois tipos:
+
+- ``transporte``: timeout, conexão recusada ou derrubada, servidor ocupado
+  (HTTP 429/503) ou erro 5xx. O servidor está sobrecarregado ou fora do ar;
+  a chamada é repetida depois de uma espera exponencial com jitter, para não
+  empilhar mais trabalho sobre ele;
+- ``saida``: o modelo respondeu, mas a resposta veio vazia, fora do formato
+  ou com um erro da própria requisição. Repetir na hora é o certo (o
+  ``OllamaAnalyzer`` cuida disso), sem espera.
+
+O número de requisições em voo é controlado no estilo AIMD (aumento aditivo,
+redução multiplicativa): cada resposta rápida aumenta o limite em
+``1/limite`` (cerca de +1 por rodada), e um erro de transporte ou uma latência
+muito acima da melhor observada reduz o limite pela metade, no máximo uma vez
+por latência média. Todas as repetições, dos dois tipos, consomem um
+orçamento por execução, que impede que um servidor degradado multiplique o
+trabalho.
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+import ollama
+
+logger = logging.getLogger(__name__)
+
+TRANSPORTE = "transporte"
+SAIDA = "saida"
+
+# Respostas HTTP que indicam servidor ocupado ou com problema
+STATUS_TRANSPORTE = {408, 429, 500, 502, 503, 504}
+
+
+def tipo_erro(erro: BaseException) -> str:
+    """Classifica uma exceção como ``TRANSPORTE`` ou ``SAIDA``.
+
+    Segue a cadeia de causas (``raise ... from``), então a falha de todos os
+    endpoints do ``PoolEndpoints`` é classificada pelo erro que a causou.
+    """
+    atual: Optional[BaseException] = erro
+    while atual is not None:
+        if isinstance(atual, (httpx.TransportError, ConnectionError, TimeoutError)):
+            return TRANSPORTE
+        if isinstance(atual, ollama.ResponseError):
+            status = getattr(atual, "status_code", -1)
+            return TRANSPORTE if status in STATUS_TRANSPORTE or status >= 500 else SAIDA
+        atual = atual.__cause__
+    return SAIDA
+
+
+class OrcamentoRetries:
+    """Limite de repetições para a execução inteira.
+
+    ``maximo`` é um teto absoluto e ``proporcao`` limita as repetições a essa
+    fração das chamadas feitas (com ``minimo`` repetições sempre permitidas,
+    para o início da execução). ``None`` desativa o respectivo limite.
+    """
+
+    def __init__(self, maximo: Optional[int] = None, proporcao: Optional[float] = None, minimo: int = 10):
+        self.maximo = maximo
+        self.proporcao = proporcao
+        self.minimo = minimo
+        self.chamadas = 0
+        self.usados = 0
+        self.negados = 0
+        self._lock = threading.Lock()
+
+    def registrar_chamada(self) -> None:
+        with self._lock:
+            self.chamadas += 1
+
+    def consumir(self) -> bool:
+        """Reserva uma repetição; ``False`` se o orçamento acabou."""
+        with self._lock:
+            permitido = self.maximo is None or self.usados < self.maximo
+            if permitido and self.proporcao is not None:
+                permitido = self.usados < max(self.minimo, self.proporcao * self.chamadas)
+            if permitido:
+                self.usados += 1
+            else:
+                self.negados += 1
+            return permitido
+
+
+class LimitadorAIMD:
+    """Semáforo com limite de requisições em voo ajustado pela latência e pelos erros."""
+
+    def __init__(
+        self,
+        maximo: int,
+        minimo: int = 1,
+        inicial: Optional[int] = None,
+        reducao: float = 0.5,
+        tolerancia_latencia: float = 2.0,
+        alfa: float = 0.2,
+    ):
+        self.maximo = max(maximo, 1)
+        self.minimo = max(min(minimo, self.maximo), 1)
+        self.limite = float(inicial if inicial is not None else self.minimo)
+        self.limite = min(max(self.limite, self.minimo), self.maximo)
+        # Fator aplicado ao limite em cada sinal de sobrecarga
+        self.reducao = reducao
+        # Sobrecarga quando a latência média passa deste múltiplo da melhor
+        self.tolerancia_latencia = tolerancia_latencia
+        # Peso de cada nova amostra na média móvel exponencial da latência
+        self.alfa = alfa
+        self.em_voo = 0
+        self.latencia_media: Optional[float] = None
+        self.latencia_base: Optional[float] = None
+        self.reducoes = 0
+        self._ultima_reducao = 0.0
+        self._soma_limite = 0.0
+        self._amostras_limite = 0
+        self._condicao = threading.Condition()
+
+    @property
+    def limite_atual(self) -> int:
+        return max(self.minimo, int(self.limite))
+
+    def adquirir(self) -> None:
+        with self._condicao:
+            while self.em_voo >= self.limite_atual:
+                self._condicao.wait()
+            self.em_voo += 1
+            self._soma_limite += self.limite_atual
+            self._amostras_limite += 1
+
+    def liberar(self, latencia: Optional[float] = None, erro_transporte: bool = False) -> None:
+        """Devolve a vaga e ajusta o limite com o resultado da chamada."""
+        with self._condicao:
+            self.em_voo -= 1
+            if latencia is not None and not erro_transporte:
+                if self.latencia_media is None:
+                    self.latencia_media = latencia
+                else:
+                    self.latencia_media += self.alfa * (latencia - self.latencia_media)
+                if self.latencia_base is None or self.latencia_media < self.latencia_base:
+                    self.latencia_base = self.latencia_media
+
+            lenta = (
+                self.latencia_media is not None
+                and self.latencia_media > self.latencia_base * self.tolerancia_latencia
+            )
+            if erro_transporte or lenta:
+                agora = time.monotonic()
+                # Uma redução por "rodada": as respostas das requisições que já
+                # estavam em voo refletem a sobrecarga anterior
+                if agora - self._ultima_reducao >= (self.latencia_media or 0.0):
+                    self.limite = max(self.minimo, self.limite * self.reducao)
+                    self._ultima_reducao = agora
+                    self.reducoes += 1
+                    logger.debug(f"Concorrência reduzida para {self.limite_atual}")
+            else:
+                self.limite = min(self.maximo, self.limite + 1.0 / self.limite)
+            self._condicao.notify_all()
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._condicao:
+            return {
+                "limite_atual": self.limite_atual,
+                "limite_medio": round(self._soma_limite / self._amostras_limite, 2) if self._amostras_limite else None,
+                "reducoes": self.reducoes,
+                "latencia_media_s": round(self.latencia_media, 3) if self.latencia_media is not None else None,
+                "latencia_base_s": round(self.latencia_base, 3) if self.latencia_base is not None else None,
+            }
+
+
+class Agendador:
+    """Executa as chamadas ao modelo com limite de concorrência, backoff e orçamento de retries."""
+
+    def __init__(
+        self,
+        limitador: Optional[LimitadorAIMD] = None,
+        orcamento: Optional[OrcamentoRetries] = None,
+        max_tentativas_transporte: int = 5,
+        espera_base: float = 0.5,
+        espera_maxima: float = 30.0,
+        seed: Optional[int] = None,
+    ):
+        self.limitador = limitador
+        self.orcamento = orcamento
+        self.max_tentativas_transporte = max_tentativas_transporte
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.erros = {TRANSPORTE: 0, SAIDA: 0}
+        self.tempo_espera = 0.0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def espera(self, tentativa: int) -> float:
+        """Backoff exponencial com jitter completo: sorteio entre 0 e ``base * 2**tentativa``."""
+        with self._lock:
+            return self._rng.uniform(0, min(self.espera_maxima, self.espera_base * 2 ** tentativa))
+
+    def permitir_retry(self) -> bool:
+        """Consome uma repetição do orçamento da execução."""
+        return self.orcamento is None or self.orcamento.consumir()
+
+    def executar(self, funcao: Callable[..., Any], **kwargs: Any) -> Any:
+        """Chama ``funcao(**kwargs)`` repetindo apenas as falhas de transporte.
+
+        Falhas de saída e falhas de transporte sem tentativas ou orçamento
+        restantes são propagadas para quem chamou.
+        """
+        tentativa = 0
+        while True:
+            if self.orcamento is not None:
+                self.orcamento.registrar_chamada()
+            if self.limitador is not None:
+                self.limitador.adquirir()
+            inicio = time.perf_counter()
+            try:
+                resposta = funcao(**kwargs)
+            except Exception as e:
+                categoria = tipo_erro(e)
+                if self.limitador is not None:
+                    self.limitador.liberar(erro_transporte=categoria == TRANSPORTE)
+                with self._lock:
+                    self.erros[categoria] += 1
+                tentativa += 1
+                if categoria != TRANSPORTE or tentativa >= self.max_tentativas_transporte or not self.permitir_retry():
+                    raise
+                espera = self.espera(tentativa - 1)
+                logger.debug(f"Erro de transporte ({e}); nova tentativa em {espera:.2f}s")
+                with self._lock:
+                    self.tempo_espera += espera
+                time.sleep(espera)
+                continue
+            if self.limitador is not None:
+                self.limitador.liberar(latencia=time.perf_counter() - inicio)
+            return resposta
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            estatisticas: Dict[str, Any] = {
+                "erros_transporte": self.erros[TRANSPORTE],
+                "erros_saida": self.erros[SAIDA],
+                "tempo_em_backoff_s": round(self.tempo_espera, 3),
+            }
+        if self.orcamento is not None:
+            estatisticas["retries_usados"] = self.orcamento.usados
+            estatisticas["retries_negados"] = self.orcamento.negados
+        if self.limitador is not None:
+            estatisticas.update(self.limitador.estatisticas())
+        return estatisticas
@@ -0,0 +1,213 @@
+"""Benchmark do índice de consultas (``consulta.py``) contra as varreduras equivalentes em pandas.
+
+Usa as classificações gravadas em
+``results/relacionamentos_toxicos_20250615_031911.json`` e as letras de
+``--dataset``. Sem ``--dataset``, monta um dataset sintético com as letras de
+``data/30musicas.csv`` (o ``indice`` de cada resultado é a linha do dataset,
+como no ``all_songs_data.csv``). Para cada consulta mede o tempo do índice e
+da varredura em pandas com o DataFrame já carregado, e confere se as duas
+devolvem as mesmas músicas. Também mede a construção do índice, a
+atualização incremental com resultados acrescentados a um checkpoint JSONL e
+o tempo que o notebook gasta só para carregar o CSV.
+
+Uso:
+    python benchmark_consulta.py
+    python benchmark_consulta.py --dataset ../data/all_songs_data.csv --repeticoes 20
+"""
+
+import argparse
+import json
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from consulta import IndiceConsulta, tokenizar
+from ingestao import COLUNA_ANO, COLUNA_ARTISTA, COLUNA_LETRA, COLUNA_TITULO, ler_musicas
+from pos_processamento import NIVEL_NUMERICO
+
+RAIZ = Path(__file__).resolve().parent
+RESULTADOS_PADRAO = RAIZ / "results" / "relacionamentos_toxicos_20250615_031911.json"
+LETRAS_PADRAO = RAIZ.parent / "data" / "30musicas.csv"
+
+# Fração dos resultados acrescentada depois da primeira indexação
+FRACAO_INCREMENTO = 0.1
+
+
+def gerar_dataset(resultados: pd.DataFrame, letras_csv: Path, destino: Path) -> Path:
+    """Dataset sintético com uma linha por ``indice`` e letras reais repetidas."""
+    letras = pd.read_csv(letras_csv, usecols=["Lyrics"])["Lyrics"].dropna().tolist()
+    linhas = resultados.set_index("indice").reindex(range(int(resultados["indice"].max()) + 1))
+    pd.DataFrame({
+        COLUNA_TITULO: linhas["titulo"].to_numpy(),
+        COLUNA_ARTISTA: linhas["artista"].to_numpy(),
+        # O sufixo torna cada letra única, como em benchmark_pipeline.py
+        COLUNA_LETRA: [f"{letras[i % len(letras)]}\n({titulo} #{i})" for i, titulo in enumerate(linhas["titulo"])],
+        COLUNA_ANO: linhas["ano"].to_numpy(),
+    }).to_csv(destino, index=False)
+    return destino
+
+
+def regex_frase(frase: str) -> str:
+    """Regex equivalente à busca de frase do índice (palavras em sequência)."""
+    return r"\b" + r"\W+".join(re.escape(termo) for termo in tokenizar(frase)) + r"\b"
+
+
+def consultas_pandas(df: pd.DataFrame) -> Dict[str, Callable[[], set]]:
+    nivel = df["nivel_toxicidade"].map(NIVEL_NUMERICO)
+
+    def media_artista() -> set:
+        por_artista = nivel.groupby(df["artista"]).agg(["mean", "count"])
+        artistas = por_artista[(por_artista["count"] >= 3) & (por_artista["mean"] > 0.5)].index
+        return set(artistas)
+
+    return {
+        "flag_decada": lambda: set(df.loc[df["ciume_possessividade"] & df["ano"].between(1980, 1989), "indice"]),
+        "niveis_artista": lambda: set(df.loc[
+            df["nivel_toxicidade"].isin(["alto", "muito alto"]) & df["artista"].str.lower().isin(["madonna", "eminem"]),
+            "indice",
+        ]),
+        "media_artista": media_artista,
+        "frase_justificativa": lambda: set(df.loc[
+            df["justificativa"].str.contains(regex_frase("never let you go"), case=False, regex=True, na=False), "indice"
+        ]),
+        "frase_letra": lambda: set(df.loc[
+            df["letra"].str.contains(regex_frase("i love you"), case=False, regex=True, na=False), "indice"
+        ]),
+        "combinada": lambda: set(df.loc[
+            df["dependencia"]
+            & df["nivel_toxicidade"].isin(["moderado", "alto", "muito alto"])
+            & df["letra"].str.contains(regex_frase("baby"), case=False, regex=True, na=False),
+            "indice",
+        ]),
+    }
+
+
+def consultas_indice(indice: IndiceConsulta) -> Dict[str, Callable[[], set]]:
+    def ids(linhas: np.ndarray) -> set:
+        return set(indice.linhas["indice"].to_numpy()[linhas].tolist())
+
+    def media_artista() -> set:
+        tabela = indice.media_por_artista(minimo_musicas=3)
+        return set(tabela.loc[tabela["media_nivel"] > 0.5, "artista"])
+
+    return {
+        "flag_decada": lambda: ids(indice.filtrar(flags=["ciume_possessividade"], ano=(1980, 1989))),
+        "niveis_artista": lambda: ids(indice.filtrar(niveis=["alto", "muito alto"], artistas=["madonna", "eminem"])),
+        "media_artista": media_artista,
+        "frase_justificativa": lambda: ids(indice.filtrar(frase="never let you go", campo="justificativa")),
+        "frase_letra": lambda: ids(indice.filtrar(frase="i love you", campo="letra")),
+        "combinada": lambda: ids(indice.filtrar(
+            flags=["dependencia"], niveis=["moderado", "alto", "muito alto"], frase="baby", campo="letra"
+        )),
+    }
+
+
+def medir(funcao: Callable[[], Any], repeticoes: int) -> Tuple[float, Any]:
+    """Mediana do tempo (ms) de ``funcao`` e o último resultado."""
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return round(float(np.median(tempos)), 3), resultado
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark do índice de consultas contra varreduras em pandas.")
+    parser.add_argument("--resultados", default=str(RESULTADOS_PADRAO), help="Arquivo JSON de resultados.")
+    parser.add_argument("--dataset", default=None, help="Dataset com as letras (padrão: sintético a partir de --letras).")
+    parser.add_argument("--letras", default=str(LETRAS_PADRAO), help="CSV de onde vêm as letras sintéticas.")
+    parser.add_argument("--repeticoes", type=int, default=10, help="Execuções de cada consulta (vale a mediana).")
+    parser.add_argument("--salvar", default=None, help="Grava os números em JSON.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    with open(args.resultados, encoding="utf-8") as f:
+        registros = json.load(f)
+    resultados = pd.DataFrame(registros)
+
+    with tempfile.TemporaryDirectory() as temporario:
+        temporario = Path(temporario)
+        dataset = Path(args.dataset) if args.dataset else gerar_dataset(resultados, Path(args.letras), temporario / "dataset.csv")
+        csv_path = temporario / "resultados.csv"
+        resultados.to_csv(csv_path, index=False)
+
+        # Como no notebook: carregar o CSV de resultados e as letras do dataset
+        inicio = time.perf_counter()
+        df = pd.read_csv(csv_path)
+        letras = {m.indice: m.letra for m in ler_musicas(dataset)}
+        df["letra"] = df["indice"].map(letras)
+        carga_pandas_ms = round((time.perf_counter() - inicio) * 1000, 1)
+
+        # Construção completa e incremental (checkpoint JSONL crescendo)
+        checkpoint = temporario / "checkpoint.jsonl"
+        corte = int(len(registros) * (1 - FRACAO_INCREMENTO))
+        with open(checkpoint, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in registros[:corte])
+        inicio = time.perf_counter()
+        IndiceConsulta.abrir(temporario / "indice").atualizar(checkpoint, dataset)
+        construcao_ms = round((time.perf_counter() - inicio) * 1000, 1)
+        with open(checkpoint, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in registros[corte:])
+        inicio = time.perf_counter()
+        contagem = IndiceConsulta.abrir(temporario / "indice").atualizar(checkpoint)
+        incremento_ms = round((time.perf_counter() - inicio) * 1000, 1)
+
+        inicio = time.perf_counter()
+        indice = IndiceConsulta.abrir(temporario / "indice")
+        abertura_ms = round((time.perf_counter() - inicio) * 1000, 1)
+
+        print(f"\n📚 {len(registros)} resultados, letras de {dataset if args.dataset else 'dataset sintético'}")
+        print(f"→ pandas: carregar resultados + letras: {carga_pandas_ms} ms")
+        print(f"→ Índice: construção com {corte} músicas {construcao_ms} ms | "
+              f"+{contagem['novas']} músicas incremental {incremento_ms} ms | abertura {abertura_ms} ms")
+
+        numeros: Dict[str, Any] = {
+            "musicas": len(registros),
+            "carga_pandas_ms": carga_pandas_ms,
+            "construcao_ms": construcao_ms,
+            "incremento_ms": incremento_ms,
+            "abertura_indice_ms": abertura_ms,
+            "consultas": {},
+        }
+        divergencias: List[str] = []
+        pandas_consultas = consultas_pandas(df)
+        print(f"\n{'consulta':<22} {'pandas (ms)':>12} {'índice (ms)':>12} {'speedup':>9} {'músicas':>8}")
+        for nome, consulta in consultas_indice(indice).items():
+            tempo_indice, esperado_indice = medir(consulta, args.repeticoes)
+            tempo_pandas, esperado_pandas = medir(pandas_consultas[nome], args.repeticoes)
+            speedup = round(tempo_pandas / tempo_indice, 1) if tempo_indice else float("inf")
+            numeros["consultas"][nome] = {
+                "pandas_ms": tempo_pandas,
+                "indice_ms": tempo_indice,
+                "speedup": speedup,
+                "resultados": len(esperado_indice),
+                "iguais": esperado_indice == esperado_pandas,
+            }
+            if esperado_indice != esperado_pandas:
+                divergencias.append(f"{nome}: {len(esperado_indice ^ esperado_pandas)} músicas diferentes")
+            print(f"{nome:<22} {tempo_pandas:>12} {tempo_indice:>12} {speedup:>8}x {len(esperado_indice):>8}")
+
+    if divergencias:
+        print("\n⚠️ Resultados diferentes entre o índice e o pandas:")
+        for divergencia in divergencias:
+            print(f"→ {divergencia}")
+    else:
+        print("\n✅ Índice e pandas devolvem as mesmas músicas em todas as consultas")
+
+    if args.salvar:
+        with open(args.salvar, "w", encoding="utf-8") as f:
+            json.dump(numeros, f, ensure_ascii=False, indent=2)
+        print(f"→ Números salvos em: {args.salvar}")
+
+
+if __name__ == "__main__":
+    main()
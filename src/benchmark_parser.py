@@ -0,0 +1,182 @@
+"""Micro-benchmark e corpus de fuzz do parser de respostas.
+
+O corpus é gerado a partir das classificações gravadas em
+``results/relacionamentos_toxicos_20250615_031911.json``: cada registro é
+reescrito nos formatos que o modelo costuma devolver (texto, JSON, JSON no
+meio de texto, campos acentuados, ``sim``/``não``...) e em variantes
+quebradas (campo ausente, booleano inválido, resposta truncada ou fora do
+formato). Cada caso guarda o resultado esperado, então o benchmark mede ao
+mesmo tempo a velocidade e a taxa de acerto do parser.
+
+Uso:
+    python benchmark_parser.py
+    python benchmark_parser.py --salvar-corpus results/corpus_parser.jsonl
+"""
+
+import argparse
+import json
+import random
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List
+
+from mock_ollama import carregar_replay, corromper, formatar_resposta
+from ollama_analysis import OllamaAnalyzer
+from parser_resposta import CAMPOS_BOOLEANOS, PADRAO, PARSEADO, parsear_resposta
+
+RAIZ = Path(__file__).resolve().parent
+REPLAY_PADRAO = RAIZ / "results" / "relacionamentos_toxicos_20250615_031911.json"
+
+CAMPOS = ("nivel_toxicidade", *CAMPOS_BOOLEANOS, "justificativa")
+
+ACENTUADOS = {
+    "abuso_emocional": "Abuso emocional",
+    "ciume_possessividade": "Ciúme_possessividade",
+    "dependencia": "Dependência",
+    "objetificacao": "Objetificação",
+    "violencia_traicao": "Violência_traição",
+}
+
+
+def _esperado(registro: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "nivel_toxicidade": registro["nivel_toxicidade"],
+        **{campo: bool(registro.get(campo)) for campo in CAMPOS_BOOLEANOS},
+        "justificativa": (registro.get("justificativa") or "").strip(),
+    }
+
+
+def _caso(variante: str, resposta: str, esperado: Dict[str, Any], origem: Dict[str, str]) -> Dict[str, Any]:
+    return {"variante": variante, "resposta": resposta, "esperado": esperado, "origem": origem}
+
+
+def gerar_corpus(registros: List[Dict[str, Any]], seed: int = 42) -> List[Dict[str, Any]]:
+    """Gera os casos do corpus (uma variante sorteada por registro)."""
+    rng = random.Random(seed)
+    corpus = []
+    for registro in registros:
+        esperado = _esperado(registro)
+        if not esperado["justificativa"]:
+            continue
+        completo = {campo: PARSEADO for campo in CAMPOS}
+        variante = rng.choice((
+            "texto", "json", "json_em_texto", "acentuado", "sim_nao",
+            "justificativa_multilinha", "campo_ausente", "booleano_invalido", "fora_do_formato",
+        ))
+
+        if variante == "texto":
+            resposta = formatar_resposta(registro)
+        elif variante == "json":
+            resposta = json.dumps(esperado, ensure_ascii=False)
+        elif variante == "json_em_texto":
+            resposta = f"Segue a análise:\n```json\n{json.dumps(esperado, ensure_ascii=False, indent=2)}\n```\nEspero ter ajudado."
+        elif variante in ("acentuado", "sim_nao"):
+            linhas = [f"Nível de toxicidade: {esperado['nivel_toxicidade'].upper()}"]
+            for campo in CAMPOS_BOOLEANOS:
+                nome = ACENTUADOS[campo] if variante == "acentuado" else campo
+                valor = ("Sim" if esperado[campo] else "Não") if variante == "sim_nao" else str(esperado[campo]).lower()
+                linhas.append(f"{nome}: {valor}")
+            linhas.append(f"Justificativa: {esperado['justificativa']}")
+            resposta = "\n".join(linhas)
+        elif variante == "justificativa_multilinha":
+            palavras = esperado["justificativa"].split()
+            meio = max(len(palavras) // 2, 1)
+            registro_multi = dict(registro, justificativa=" ".join(palavras[:meio]) + "\n  " + " ".join(palavras[meio:]))
+            resposta = formatar_resposta(registro_multi)
+            esperado = dict(esperado, justificativa=" ".join(palavras))
+        elif variante == "campo_ausente":
+            campo = rng.choice(CAMPOS_BOOLEANOS)
+            resposta = "\n".join(l for l in formatar_resposta(registro).splitlines() if not l.startswith(campo))
+            esperado = dict(esperado, **{campo: False})
+            completo = dict(completo, **{campo: PADRAO})
+        elif variante == "booleano_invalido":
+            campo = rng.choice(CAMPOS_BOOLEANOS)
+            linhas = [f"{campo}: untrue" if l.startswith(campo) else l for l in formatar_resposta(registro).splitlines()]
+            resposta = "\n".join(linhas)
+            esperado = dict(esperado, **{campo: False})
+            completo = dict(completo, **{campo: PADRAO})
+        else:
+            # Respostas que não trazem o nível: precisam gerar nova tentativa
+            resposta = corromper(formatar_resposta(registro), rng.randrange(3))
+            esperado = None
+            completo = {"nivel_toxicidade": PADRAO}
+
+        corpus.append(_caso(variante, resposta, esperado, completo))
+    return corpus
+
+
+def conferir(corpus: List[Dict[str, Any]]) -> Dict[str, Dict[str, int]]:
+    """Conta, por variante, os casos em que o parser devolveu o esperado."""
+    acertos: Counter = Counter()
+    totais: Counter = Counter()
+    for caso in corpus:
+        parseada = parsear_resposta(caso["resposta"])
+        ok = all(parseada.origem[campo] == origem for campo, origem in caso["origem"].items())
+        if caso["esperado"] is not None:
+            ok = ok and parseada.para_dict() == caso["esperado"]
+        totais[caso["variante"]] += 1
+        acertos[caso["variante"]] += ok
+    return {variante: {"acertos": acertos[variante], "total": totais[variante]} for variante in sorted(totais)}
+
+
+def medir(corpus: List[Dict[str, Any]], repeticoes: int) -> Dict[str, float]:
+    """Tempo do parse sozinho e do parse + validação feita pelo analisador."""
+    respostas = [caso["resposta"] for caso in corpus]
+    analyzer = OllamaAnalyzer()
+    total = len(respostas) * repeticoes
+
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for resposta in respostas:
+            parsear_resposta(resposta)
+    parse = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for resposta in respostas:
+            parseada = parsear_resposta(resposta)
+            parseada.parseado("nivel_toxicidade") and analyzer.is_valid_response(parseada.para_dict())
+    validacao = time.perf_counter() - inicio
+
+    return {
+        "respostas": len(respostas),
+        "parses_por_s": round(total / parse, 1),
+        "parse_us": round(parse / total * 1e6, 2),
+        "validacoes_por_s": round(total / validacao, 1),
+        "validacao_us": round(validacao / total * 1e6, 2),
+    }
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Micro-benchmark do parser de respostas do modelo.")
+    parser.add_argument("--replay", default=str(REPLAY_PADRAO), help="JSON com as classificações gravadas.")
+    parser.add_argument("--repeticoes", type=int, default=5, help="Passadas pelo corpus na medição de tempo.")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do sorteio das variantes.")
+    parser.add_argument("--salvar-corpus", default=None, help="Grava o corpus de fuzz em JSONL.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    corpus = gerar_corpus(carregar_replay(args.replay), args.seed)
+
+    if args.salvar_corpus:
+        Path(args.salvar_corpus).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.salvar_corpus, "w", encoding="utf-8") as f:
+            for caso in corpus:
+                f.write(json.dumps(caso, ensure_ascii=False) + "\n")
+        print(f"Corpus salvo em: {args.salvar_corpus}")
+
+    print("\nAcertos por variante:")
+    erros = 0
+    for variante, contagem in conferir(corpus).items():
+        erros += contagem["total"] - contagem["acertos"]
+        print(f"→ {variante}: {contagem['acertos']}/{contagem['total']}")
+
+    print(f"\nDesempenho: {medir(corpus, args.repeticoes)}")
+    print("\n✅ Todas as respostas do corpus foram lidas corretamente" if not erros else f"\n❌ {erros} respostas lidas incorretamente")
+
+
+if __name__ == "__main__":
+    main()
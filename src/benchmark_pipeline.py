@@ -0,0 +1,388 @@
+"""Benchmark offline do pipeline de classificação.
+
+Sobe o mock do Ollama (``mock_ollama.py``) reproduzindo as classificações
+gravadas em ``results/relacionamentos_toxicos_20250615_031911.json``, com
+latência e taxa de respostas malformadas configuráveis, e executa o
+``OllamaAnalyzer`` e o ``analise_conteudo_toxico`` de ponta a ponta, sem
+cache nem checkpoint. Reporta músicas/s, retries, tempo de parse e memória.
+Com ``--lote`` também mede o modo lote (várias músicas por chamada): tokens
+por música, músicas/s e concordância com o resultado de uma música por vez.
+Com ``--capacidade``/``--fila-maxima`` o mock fica sujeito a sobrecarga (503)
+e ``--adaptativo`` mede também o agendador (``agendador.py``). Com
+``--estruturado`` cada concorrência também roda sem o esquema, e a diferença
+de retries entre as duas execuções é reportada como retries economizados. Com
+``--cascata MODELO`` o mock imita também um modelo de triagem mais rápido e
+com ruído no nível, e o benchmark mede a cascata (``cascata.py``): taxa de
+escalada, tempo de modelo por música, concordância e deslocamento da
+distribuição de níveis em relação ao modelo principal sozinho.
+
+Os números podem ser salvos como baseline e comparados nas execuções
+seguintes, para que regressões no caminho crítico apareçam como números:
+
+    python benchmark_pipeline.py --salvar-baseline results/benchmark_baseline.json
+    python benchmark_pipeline.py --baseline results/benchmark_baseline.json
+"""
+
+import argparse
+import json
+import logging
+import platform
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from agendador import Agendador, LimitadorAIMD, OrcamentoRetries
+from ingestao import Musica
+from metricas import ColetorMetricas
+from mock_ollama import CAMPOS_BOOLEANOS, carregar_replay, criar_servidor, formatar_resposta, iniciar_em_thread
+from ollama_analysis import OllamaAnalyzer, analise_conteudo_toxico, carregar_exemplos_manuais
+from pool_endpoints import PoolEndpoints
+from pos_processamento import NIVEL_NUMERICO
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RAIZ = Path(__file__).resolve().parent
+REPLAY_PADRAO = RAIZ / "results" / "relacionamentos_toxicos_20250615_031911.json"
+EXEMPLOS_PADRAO = RAIZ.parent / "data" / "30-musicas-Mozart.csv"
+LETRAS_PADRAO = RAIZ.parent / "data" / "30musicas.csv"
+
+# Métricas em que valores maiores são melhores (as demais: menores são melhores)
+MAIOR_MELHOR = {"musicas_por_s", "parses_por_s", "retries_economizados"}
+
+
+def gerar_corpus(registros: List[Dict[str, Any]], letras_csv: Path, n: int) -> List[Musica]:
+    """Monta ``n`` músicas sintéticas com letras reais e títulos/artistas gravados."""
+    letras = pd.read_csv(letras_csv, usecols=["Lyrics"])["Lyrics"].dropna().tolist()
+    corpus = []
+    for i in range(n):
+        registro = registros[i % len(registros)]
+        # O sufixo torna cada letra única para o mock e para o pré-processamento
+        letra = f"{letras[i % len(letras)]}\n({registro['titulo']} #{i})"
+        corpus.append(Musica(i, registro["titulo"], registro["artista"], letra, registro.get("ano")))
+    return corpus
+
+
+def medir_parse(analyzer: OllamaAnalyzer, registros: List[Dict[str, Any]], repeticoes: int) -> Dict[str, float]:
+    """Tempo de ``parse_response`` + ``is_valid_response`` sobre respostas gravadas."""
+    respostas = [formatar_resposta(r) for r in registros]
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for resposta in respostas:
+            analyzer.is_valid_response(analyzer.parse_response(resposta))
+    duracao = time.perf_counter() - inicio
+    total = len(respostas) * repeticoes
+    return {
+        "parses_por_s": round(total / duracao, 1),
+        "parse_us": round(duracao / total * 1e6, 2),
+    }
+
+
+def executar_pipeline(
+    url: str,
+    corpus: List[Musica],
+    concorrencia: int,
+    exemplos_csv: Path,
+    estruturado: bool,
+    tamanho_lote: int = 1,
+    agendador: Optional[Agendador] = None,
+    modelo_triagem: Optional[str] = None,
+    limiar_confianca: float = 0.8,
+) -> Tuple[Dict[str, Any], pd.DataFrame]:
+    coletor = ColetorMetricas()
+    analyzer = OllamaAnalyzer(
+        pool=PoolEndpoints([url]),
+        metricas=coletor,
+        modo_estruturado=estruturado,
+        tamanho_lote=tamanho_lote,
+        agendador=agendador,
+        modelo_triagem=modelo_triagem,
+        limiar_confianca=limiar_confianca,
+    )
+    carregar_exemplos_manuais(analyzer, str(exemplos_csv))
+
+    inicio = time.perf_counter()
+    resultados = analise_conteudo_toxico(corpus, concorrencia=concorrencia, analyzer=analyzer)
+    duracao = time.perf_counter() - inicio
+
+    resumo = coletor.resumo()
+    etapas = resumo.get("tempo_por_etapa_s", {})
+    metricas = {
+        "concorrencia": concorrencia,
+        "tamanho_lote": tamanho_lote,
+        "musicas": len(corpus),
+        "classificadas": len(resultados),
+        "duracao_s": round(duracao, 3),
+        "musicas_por_s": round(len(corpus) / duracao, 2),
+        "retries": analyzer.retries(),
+        "retries_por_musica": round(analyzer.retries() / max(len(corpus), 1), 3),
+        "falhas": analyzer.estatisticas["falhas"],
+        "latencia_p50_s": resumo.get("latencia_p50_s"),
+        "latencia_p95_s": resumo.get("latencia_p95_s"),
+        "parse_total_s": etapas.get("parse", 0.0),
+        "montagem_prompt_total_s": etapas.get("montagem_prompt", 0.0),
+        "prompt_tokens_por_musica": resumo.get("prompt_tokens_por_musica"),
+        "tokens_gerados_por_musica": resumo.get("tokens_gerados_por_musica"),
+        "tempo_modelo_por_musica_s": resumo.get("tempo_modelo_por_musica_s"),
+        "memoria_pico_mb": memoria_pico_mb(),
+    }
+    if agendador is not None:
+        metricas["agendamento"] = agendador.estatisticas()
+    if analyzer.cascata is not None:
+        metricas["cascata"] = analyzer.cascata.resumo()
+    return metricas, resultados
+
+
+def concordancia(referencia: pd.DataFrame, resultados: pd.DataFrame) -> Dict[str, float]:
+    """Fração das músicas de ``referencia`` com o mesmo nível e as mesmas flags."""
+    if referencia.empty or resultados.empty:
+        return {"nivel": 0.0, "flags": 0.0, "classificacao": 0.0}
+    juntos = referencia.merge(resultados, on="indice", how="left", suffixes=("", "_outro"))
+    nivel = juntos["nivel_toxicidade"] == juntos["nivel_toxicidade_outro"]
+    flags = pd.concat([juntos[c] == juntos[f"{c}_outro"] for c in CAMPOS_BOOLEANOS], axis=1).all(axis=1)
+    return {
+        "nivel": round(float(nivel.mean()), 4),
+        "flags": round(float(flags.mean()), 4),
+        "classificacao": round(float((nivel & flags).mean()), 4),
+    }
+
+
+def deslocamento_niveis(referencia: pd.DataFrame, resultados: pd.DataFrame) -> Dict[str, float]:
+    """Diferença entre as distribuições de nível de dois resultados.
+
+    ``variacao_total`` é metade da soma das diferenças absolutas das
+    proporções de cada nível (0: distribuições iguais) e ``media`` é a
+    diferença do nível numérico médio (``NIVEL_NUMERICO``).
+    """
+    if referencia.empty or resultados.empty:
+        return {"variacao_total": 0.0, "media": 0.0}
+    antes = referencia["nivel_toxicidade"].value_counts(normalize=True)
+    depois = resultados["nivel_toxicidade"].value_counts(normalize=True)
+    variacao = antes.subtract(depois, fill_value=0.0).abs().sum() / 2
+    media = (
+        resultados["nivel_toxicidade"].map(NIVEL_NUMERICO).mean()
+        - referencia["nivel_toxicidade"].map(NIVEL_NUMERICO).mean()
+    )
+    return {"variacao_total": round(float(variacao), 4), "media": round(float(media), 4)}
+
+
+def memoria_pico_mb() -> float:
+    """Pico de memória residente do processo até agora.
+
+    Usa ``getrusage`` em vez de ``tracemalloc``, que deixaria o caminho
+    crítico várias vezes mais lento e distorceria as outras medidas.
+    """
+    if resource is None:
+        return 0.0
+    # Linux informa em KiB
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)
+
+
+def comparar(atual: Dict[str, Any], baseline: Dict[str, Any], tolerancia: float) -> List[str]:
+    """Lista as métricas que pioraram mais que ``tolerancia`` em relação ao baseline."""
+    regressoes = []
+    for cenario, metricas in atual["cenarios"].items():
+        base = baseline.get("cenarios", {}).get(cenario)
+        if not base:
+            continue
+        for nome, valor in metricas.items():
+            referencia = base.get(nome)
+            if not isinstance(valor, (int, float)) or not isinstance(referencia, (int, float)) or not referencia:
+                continue
+            variacao = (valor - referencia) / abs(referencia)
+            if nome not in MAIOR_MELHOR:
+                variacao = -variacao
+            simbolo = "▲" if variacao >= 0 else "▼"
+            print(f"  {cenario:<24} {nome:<26} {referencia:>12} → {valor:>12} {simbolo} {variacao*100:+.1f}%")
+            if variacao < -tolerancia and nome in ("musicas_por_s", "parses_por_s", "retries_por_musica", "memoria_pico_mb"):
+                regressoes.append(f"{cenario}.{nome}: {referencia} → {valor}")
+    return regressoes
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark offline do pipeline com um mock do Ollama.")
+    parser.add_argument("--musicas", type=int, default=200, help="Número de músicas sintéticas.")
+    parser.add_argument("--latencia", type=float, default=0.05, help="Latência (s) de cada geração no mock.")
+    parser.add_argument("--taxa-malformada", type=float, default=0.05, help="Fração de respostas malformadas.")
+    parser.add_argument(
+        "--concorrencia",
+        type=int,
+        nargs="+",
+        default=[1, 4, 8],
+        help="Níveis de concorrência a medir.",
+    )
+    parser.add_argument(
+        "--lote",
+        type=int,
+        nargs="*",
+        default=[],
+        help="Tamanhos de lote a medir contra o modo de uma música por vez.",
+    )
+    parser.add_argument("--estruturado", action="store_true", help="Usa o modo de saída estruturada.")
+    parser.add_argument(
+        "--adaptativo",
+        action="store_true",
+        help="Também mede cada concorrência com o agendador (backoff e limite AIMD de requisições em voo).",
+    )
+    parser.add_argument("--capacidade", type=int, default=0, help="Gerações simultâneas no mock (0: sem limite).")
+    parser.add_argument("--fila-maxima", type=int, default=0, help="Fila do mock além da capacidade antes de responder 503.")
+    parser.add_argument(
+        "--cascata",
+        default=None,
+        metavar="MODELO",
+        help="Também mede a cascata com este modelo de triagem (imitado pelo mock).",
+    )
+    parser.add_argument("--taxa-ruido", type=float, default=0.15, help="Fração das letras com nível errado na triagem.")
+    parser.add_argument("--fator-latencia", type=float, default=0.2, help="Latência da triagem como fração de --latencia.")
+    parser.add_argument("--limiar-confianca", type=float, default=0.8, help="Confiança mínima para aceitar a triagem.")
+    parser.add_argument("--repeticoes-parse", type=int, default=5, help="Passadas pelas respostas gravadas no teste de parse.")
+    parser.add_argument("--replay", default=str(REPLAY_PADRAO), help="JSON com as classificações gravadas.")
+    parser.add_argument("--exemplos", default=str(EXEMPLOS_PADRAO), help="CSV de exemplos manuais.")
+    parser.add_argument("--letras", default=str(LETRAS_PADRAO), help="CSV de onde vêm as letras sintéticas.")
+    parser.add_argument("--salvar-baseline", default=None, help="Salva os resultados como baseline neste arquivo.")
+    parser.add_argument("--baseline", default=None, help="Compara com um baseline salvo anteriormente.")
+    parser.add_argument("--tolerancia", type=float, default=0.15, help="Piora relativa tolerada antes de acusar regressão.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    registros = carregar_replay(args.replay)
+    corpus = gerar_corpus(registros, Path(args.letras), args.musicas)
+    servidor = criar_servidor(
+        latencia=args.latencia,
+        registros=registros,
+        taxa_malformada=args.taxa_malformada,
+        capacidade=args.capacidade,
+        fila_maxima=args.fila_maxima,
+        modelo_triagem=args.cascata,
+        taxa_ruido=args.taxa_ruido,
+        fator_latencia=args.fator_latencia,
+    )
+    url, _ = iniciar_em_thread(servidor)
+
+    resultado: Dict[str, Any] = {
+        "data": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "configuracao": {
+            "musicas": args.musicas,
+            "latencia": args.latencia,
+            "taxa_malformada": args.taxa_malformada,
+            "estruturado": args.estruturado,
+            "capacidade": args.capacidade,
+            "fila_maxima": args.fila_maxima,
+            "cascata": args.cascata,
+        },
+        "cenarios": {},
+    }
+
+    try:
+        resultado["cenarios"]["parse"] = medir_parse(OllamaAnalyzer(), registros, args.repeticoes_parse)
+        print(f"Parse: {resultado['cenarios']['parse']}")
+        for concorrencia in args.concorrencia:
+            # O mock sorteia as respostas malformadas por prompt: zera entre cenários
+            servidor.vistos.clear()
+            metricas, referencia = executar_pipeline(url, corpus, concorrencia, Path(args.exemplos), args.estruturado)
+            resultado["cenarios"][f"pipeline_c{concorrencia}"] = metricas
+            print(
+                f"Concorrência {concorrencia}: {metricas['musicas_por_s']} músicas/s, "
+                f"{metricas['retries']} retries, {metricas['falhas']} falhas, {servidor.recusadas} recusadas pelo servidor, "
+                f"parse {metricas['parse_total_s']}s, tempo de modelo {metricas['tempo_modelo_por_musica_s']}s/música, "
+                f"pico de memória {metricas['memoria_pico_mb']} MB"
+            )
+            if args.estruturado:
+                servidor.vistos.clear()
+                livre, _ = executar_pipeline(url, corpus, concorrencia, Path(args.exemplos), False)
+                metricas["retries_sem_esquema"] = livre["retries"]
+                metricas["retries_economizados"] = livre["retries"] - metricas["retries"]
+                print(
+                    f"  Sem esquema: {livre['retries']} retries, {livre['falhas']} falhas "
+                    f"→ {metricas['retries_economizados']} retries economizados pelo modo estruturado"
+                )
+            if args.cascata:
+                servidor.vistos.clear()
+                metricas, resultados = executar_pipeline(
+                    url,
+                    corpus,
+                    concorrencia,
+                    Path(args.exemplos),
+                    args.estruturado,
+                    modelo_triagem=args.cascata,
+                    limiar_confianca=args.limiar_confianca,
+                )
+                metricas["concordancia"] = concordancia(referencia, resultados)
+                metricas["deslocamento_niveis"] = deslocamento_niveis(referencia, resultados)
+                resultado["cenarios"][f"pipeline_c{concorrencia}_cascata"] = metricas
+                cascata = metricas["cascata"]
+                print(
+                    f"  Cascata ({args.cascata}): {metricas['musicas_por_s']} músicas/s, "
+                    f"tempo de modelo {cascata['tempo_modelo_por_musica_s']}s/música, "
+                    f"{cascata['taxa_escalada']*100:.1f}% escaladas {cascata['motivos']}, "
+                    f"calibração: nível igual em {cascata.get('concordancia_nivel', 0.0)*100:.1f}% "
+                    f"de {cascata['calibradas']}, concordância com o modelo principal: {metricas['concordancia']}, "
+                    f"deslocamento dos níveis: {metricas['deslocamento_niveis']}"
+                )
+            if args.adaptativo:
+                servidor.vistos.clear()
+                agendador = Agendador(
+                    limitador=LimitadorAIMD(maximo=concorrencia),
+                    orcamento=OrcamentoRetries(proporcao=0.5),
+                    espera_base=args.latencia,
+                    seed=42,
+                )
+                metricas, _ = executar_pipeline(
+                    url, corpus, concorrencia, Path(args.exemplos), args.estruturado, agendador=agendador
+                )
+                resultado["cenarios"][f"pipeline_c{concorrencia}_adaptativo"] = metricas
+                agendamento = metricas["agendamento"]
+                print(
+                    f"  Adaptativo: {metricas['musicas_por_s']} músicas/s, {metricas['falhas']} falhas, "
+                    f"{agendamento['erros_transporte']} erros de transporte, "
+                    f"em voo: média {agendamento['limite_medio']} (máximo {concorrencia}), "
+                    f"{agendamento['tempo_em_backoff_s']}s em backoff"
+                )
+            for tamanho_lote in args.lote:
+                servidor.vistos.clear()
+                metricas, resultados = executar_pipeline(
+                    url, corpus, concorrencia, Path(args.exemplos), args.estruturado, tamanho_lote
+                )
+                metricas["concordancia"] = concordancia(referencia, resultados)
+                resultado["cenarios"][f"pipeline_c{concorrencia}_lote{tamanho_lote}"] = metricas
+                print(
+                    f"  Lote {tamanho_lote}: {metricas['musicas_por_s']} músicas/s, "
+                    f"{metricas['prompt_tokens_por_musica']} tokens de prompt por música, "
+                    f"{metricas['retries']} retries, {metricas['falhas']} falhas, "
+                    f"concordância com uma música por vez: {metricas['concordancia']}"
+                )
+            servidor.recusadas = 0
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\nComparação com o baseline {args.baseline}:")
+        regressoes = comparar(resultado, baseline, args.tolerancia)
+        if regressoes:
+            print("\n❌ Regressões acima da tolerância:")
+            for regressao in regressoes:
+                print(f"→ {regressao}")
+        else:
+            print("\n✅ Nenhuma regressão acima da tolerância")
+
+    if args.salvar_baseline:
+        Path(args.salvar_baseline).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.salvar_baseline, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        print(f"\nBaseline salvo em: {args.salvar_baseline}")
+
+
+if __name__ == "__main__":
+    main()
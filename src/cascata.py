@@ -0,0 +1,155 @@
+"""Cascata de modelos: um modelo pequeno classifica primeiro e o grande só revê as dúvidas.
+
+O modelo de triagem recebe o mesmo prompt, exemplos e formato do modelo
+principal. A resposta dele é aceita, a não ser que haja um motivo para
+escalar a música ao modelo principal:
+
+- ``invalida``: a resposta não passou no parse/``is_valid_response``;
+- ``contradicao``: o nível contradiz as flags (``na`` com alguma flag
+  verdadeira, ou um nível tóxico sem nenhuma flag);
+- ``confianca``: a probabilidade dos tokens do nível, pelos ``logprobs`` que
+  o Ollama devolve, ficou abaixo do limiar.
+
+Uma amostra de calibração (escolhida pelo hash da letra, estável entre
+execuções) vai ao modelo principal mesmo quando a triagem é aceita; a
+concordância entre os dois nessa amostra estima o erro das músicas que não
+foram escaladas.
+"""
+
+import math
+import threading
+from typing import Any, Dict, Optional, Sequence
+
+from letras import hash_letra
+from parser_resposta import CAMPOS_BOOLEANOS, trecho_nivel
+from pos_processamento import NIVEL_NUMERICO
+
+INVALIDA = "invalida"
+CONTRADICAO = "contradicao"
+CONFIANCA = "confianca"
+CALIBRACAO = "calibracao"
+
+
+def confianca_nivel(resposta: str, logprobs: Optional[Sequence[Any]]) -> Optional[float]:
+    """Probabilidade dos tokens que formam o nível de toxicidade na resposta.
+
+    ``logprobs`` é a lista devolvida pelo Ollama, um item por token gerado
+    (com ``token`` e ``logprob``). Os tokens que se sobrepõem ao valor do
+    nível têm as log-probabilidades somadas. ``None`` se o servidor não
+    devolveu logprobs ou se o nível não foi encontrado.
+    """
+    if not logprobs:
+        return None
+    trecho = trecho_nivel(resposta)
+    if trecho is None:
+        return None
+    inicio, fim = trecho
+
+    soma = 0.0
+    encontrados = 0
+    posicao = 0
+    for item in logprobs:
+        token = item["token"] or ""
+        proxima = posicao + len(token)
+        if proxima > inicio and posicao < fim:
+            soma += float(item["logprob"])
+            encontrados += 1
+        if proxima >= fim:
+            break
+        posicao = proxima
+    if not encontrados:
+        return None
+    return math.exp(soma)
+
+
+def contraditoria(result: Dict[str, Any]) -> bool:
+    """Nível e flags incompatíveis segundo as regras do prompt."""
+    nivel = str(result.get("nivel_toxicidade", "")).strip().lower()
+    alguma_flag = any(bool(result.get(campo)) for campo in CAMPOS_BOOLEANOS)
+    return (nivel == "na") == alguma_flag
+
+
+def motivo_escalada(
+    result: Optional[Dict[str, Any]],
+    confianca: Optional[float],
+    limiar: float,
+) -> Optional[str]:
+    """Motivo para escalar a música ao modelo principal (``None`` aceita a triagem)."""
+    if result is None:
+        return INVALIDA
+    if contraditoria(result):
+        return CONTRADICAO
+    if confianca is not None and confianca < limiar:
+        return CONFIANCA
+    return None
+
+
+class EstatisticasCascata:
+    """Contadores da cascata: escaladas por motivo, tempo de modelo e calibração."""
+
+    def __init__(self, taxa_calibracao: float = 0.05):
+        self.taxa_calibracao = taxa_calibracao
+        self.musicas = 0
+        self.motivos: Dict[str, int] = {}
+        self.sem_logprobs = 0
+        # Tempo de servidor (``total_duration``) somado por modelo, em ns
+        self.tempo_modelo: Dict[str, int] = {}
+        self.chamadas_modelo: Dict[str, int] = {}
+        self.calibradas = 0
+        self.concordancia_nivel = 0
+        self.concordancia_flags = 0
+        self.distancia_nivel = 0.0
+        self._lock = threading.Lock()
+
+    def na_amostra(self, text: str) -> bool:
+        """A letra faz parte da amostra de calibração?"""
+        return int(hash_letra(text)[:8], 16) % 10_000 < self.taxa_calibracao * 10_000
+
+    def registrar_chamada(self, modelo: str, response: Any) -> None:
+        duracao = (response.get("total_duration") if response is not None else None) or 0
+        with self._lock:
+            self.tempo_modelo[modelo] = self.tempo_modelo.get(modelo, 0) + int(duracao)
+            self.chamadas_modelo[modelo] = self.chamadas_modelo.get(modelo, 0) + 1
+
+    def registrar_triagem(self, motivo: Optional[str], confianca: Optional[float]) -> None:
+        with self._lock:
+            self.musicas += 1
+            if motivo is not None:
+                self.motivos[motivo] = self.motivos.get(motivo, 0) + 1
+            if confianca is None and motivo != INVALIDA:
+                self.sem_logprobs += 1
+
+    def registrar_calibracao(self, pequeno: Dict[str, Any], grande: Dict[str, Any]) -> None:
+        nivel_pequeno = str(pequeno.get("nivel_toxicidade", "")).strip().lower()
+        nivel_grande = str(grande.get("nivel_toxicidade", "")).strip().lower()
+        with self._lock:
+            self.calibradas += 1
+            self.concordancia_nivel += nivel_pequeno == nivel_grande
+            self.concordancia_flags += all(
+                bool(pequeno.get(campo)) == bool(grande.get(campo)) for campo in CAMPOS_BOOLEANOS
+            )
+            self.distancia_nivel += abs(
+                NIVEL_NUMERICO.get(nivel_pequeno, 0.0) - NIVEL_NUMERICO.get(nivel_grande, 0.0)
+            )
+
+    def resumo(self) -> Dict[str, Any]:
+        with self._lock:
+            escaladas = sum(self.motivos.values())
+            resumo: Dict[str, Any] = {
+                "musicas": self.musicas,
+                "escaladas": escaladas,
+                "taxa_escalada": round(escaladas / self.musicas, 4) if self.musicas else 0.0,
+                "motivos": dict(sorted(self.motivos.items())),
+                "sem_logprobs": self.sem_logprobs,
+                "tempo_modelo_s": {m: round(t / 1e9, 3) for m, t in self.tempo_modelo.items()},
+                "chamadas_modelo": dict(self.chamadas_modelo),
+                "tempo_modelo_por_musica_s": (
+                    round(sum(self.tempo_modelo.values()) / 1e9 / self.musicas, 3) if self.musicas else 0.0
+                ),
+                "calibradas": self.calibradas,
+            }
+            if self.calibradas:
+                resumo["concordancia_nivel"] = round(self.concordancia_nivel / self.calibradas, 4)
+                resumo["concordancia_flags"] = round(self.concordancia_flags / self.calibradas, 4)
+                resumo["distancia_media_nivel"] = round(self.distancia_nivel / self.calibradas, 4)
+            return resumo
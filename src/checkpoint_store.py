@@ -0,0 +1,146 @@
+"""Armazenamento durável (append-only) dos resultados da classificação.
+
+Cada resultado é gravado como uma linha JSON assim que fica pronto, com
+``flush`` + ``fsync``, então uma queda do processo perde no máximo a música
+que estava sendo escrita. Ao reiniciar, as músicas já classificadas são
+identificadas por ``(indice, hash_letra, impressao)`` e puladas.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Collection, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Colunas exportadas para CSV/JSON, na ordem usada pelos resultados
+COLUNAS_RESULTADO = [
+    "indice",
+    "titulo",
+    "artista",
+    "ano",
+    "nivel_toxicidade",
+    "abuso_emocional",
+    "ciume_possessividade",
+    "dependencia",
+    "objetificacao",
+    "violencia_traicao",
+    "justificativa",
+    "origem",
+]
+
+# Colunas que identificam a letra e a configuração de cada resultado; ficam
+# no armazenamento e no formato colunar, fora das visões CSV/JSON
+COLUNAS_IMPRESSAO = ["hash_letra", "impressao"]
+
+
+def checkpoint_padrao(dataset: str | Path) -> Path:
+    """Checkpoint usado por padrão para ``dataset``: um arquivo por dataset em ``results/``."""
+    return Path("results") / f"checkpoint_{Path(dataset).stem}.jsonl"
+
+
+def _json_default(valor: Any) -> Any:
+    # Valores vindos do pandas chegam como tipos do NumPy
+    if isinstance(valor, np.generic):
+        return valor.item()
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+class CheckpointStore:
+    """Arquivo JSONL com um resultado por linha."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        if not self.path.exists():
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for linha in f:
+                linha = linha.strip()
+                if not linha:
+                    continue
+                try:
+                    yield json.loads(linha)
+                except json.JSONDecodeError:
+                    # Última linha incompleta de uma execução interrompida
+                    continue
+
+    def registros(self) -> List[Dict[str, Any]]:
+        return list(self)
+
+    def chaves_concluidas(self) -> Set[Tuple[int, str, str]]:
+        """Chaves ``(indice, hash_letra, impressao)`` das músicas já classificadas.
+
+        Só a última versão de cada música conta: um resultado reclassificado
+        com outra configuração substitui o anterior.
+        """
+        ultimos = {r["indice"]: (r["indice"], r.get("hash_letra"), r.get("impressao")) for r in self}
+        return set(ultimos.values())
+
+    def registrar(self, registro: Dict[str, Any]) -> None:
+        """Grava um resultado no fim do arquivo e força a escrita em disco."""
+        linha = json.dumps(registro, ensure_ascii=False, default=_json_default)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                # Se a execução anterior caiu no meio de uma linha, começa outra
+                if f.tell() > 0 and not self._termina_com_quebra():
+                    f.write("\n")
+                f.write(linha + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def registrar_varios(self, registros: Iterable[Dict[str, Any]]) -> int:
+        """Grava vários resultados de uma vez, com um único ``fsync``; devolve quantos."""
+        linhas = [json.dumps(registro, ensure_ascii=False, default=_json_default) for registro in registros]
+        if not linhas:
+            return 0
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                if f.tell() > 0 and not self._termina_com_quebra():
+                    f.write("\n")
+                f.write("\n".join(linhas) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        return len(linhas)
+
+    def _termina_com_quebra(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def para_dataframe(
+        self,
+        incluir_impressao: bool = False,
+        indices: Optional[Collection[int]] = None,
+    ) -> pd.DataFrame:
+        """Resultados do arquivo (a última versão de cada música), ordenados por ``indice``.
+
+        Com ``incluir_impressao`` as ``COLUNAS_IMPRESSAO`` são mantidas no fim.
+        Com ``indices`` só as músicas desses índices são devolvidas.
+        """
+        esperadas = [*COLUNAS_RESULTADO, *COLUNAS_IMPRESSAO] if incluir_impressao else COLUNAS_RESULTADO
+        df = pd.DataFrame(self.registros())
+        if df.empty:
+            return pd.DataFrame(columns=esperadas)
+        df = df.drop_duplicates(subset="indice", keep="last").sort_values("indice")
+        if indices is not None:
+            df = df[df["indice"].isin(indices)]
+        colunas = [c for c in esperadas if c in df.columns]
+        return df[colunas].reset_index(drop=True)
+
+    def exportar(self, csv_path: str | Path, json_path: str | Path) -> pd.DataFrame:
+        """Gera os arquivos CSV e JSON finais a partir do armazenamento."""
+        return exportar_dataframe(self.para_dataframe(), csv_path, json_path)
+
+
+def exportar_dataframe(df: pd.DataFrame, csv_path: str | Path, json_path: str | Path) -> pd.DataFrame:
+    """Grava ``df`` nos arquivos CSV e JSON finais (o formato de ``CheckpointStore.exportar``)."""
+    df.to_csv(csv_path, index=False)
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(df.to_dict(orient="records"), f, ensure_ascii=False, indent=2, default=_json_default)
+    return df
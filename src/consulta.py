@@ -0,0 +1,576 @@
+"""Índices persistentes para consultar os resultados da classificação e as letras.
+
+Construídos uma vez a partir do arquivo de resultados (e do dataset com as
+letras), respondem em milissegundos às perguntas que hoje exigem carregar o
+CSV no notebook e varrê-lo com pandas:
+
+- bitmaps (``np.packbits``) das cinco flags, de cada nível de toxicidade e
+  das linhas válidas, combinados com operações bit a bit;
+- índices ordenados por ano (busca binária de intervalo) e por artista (as
+  linhas de cada artista contíguas);
+- índice invertido posicional sobre ``justificativa`` e as letras, que
+  responde buscas por palavra e por frase exata ("never let you go").
+
+O índice de texto é dividido em segmentos imutáveis: ``atualizar`` lê só os
+resultados novos ou alterados (num checkpoint JSONL, só as linhas
+acrescentadas desde a última atualização), tokeniza apenas essas letras e
+grava um novo segmento. Uma linha alterada é marcada como removida e volta
+como linha nova; ``compactar`` junta os segmentos e descarta as linhas
+removidas. Os bitmaps e índices ordenados são recalculados a cada
+atualização a partir das colunas guardadas, sem reler nada.
+
+Uso:
+    python consulta.py indexar results/relacionamentos_toxicos_20250615_031911.json \\
+        --dataset ../data/all_songs_data.csv
+    python consulta.py buscar --flag ciume_possessividade --ano 1980 1989
+    python consulta.py buscar --media-artista 0.5 --min-musicas 3
+    python consulta.py buscar --frase "never let you go" --campo justificativa
+"""
+
+import argparse
+import io
+import os
+import pickle
+import re
+import time
+import unicodedata
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from formato_colunar import ler_arquivo_resultados
+from ingestao import ler_musicas
+from parser_resposta import CAMPOS_BOOLEANOS
+from pos_processamento import NIVEL_NUMERICO
+
+# Mudanças no formato do índice exigem reconstruí-lo
+VERSAO_INDICE = 1
+
+NIVEIS = tuple(NIVEL_NUMERICO)
+VALOR_NIVEL = np.array([NIVEL_NUMERICO[nivel] for nivel in NIVEIS])
+
+CAMPOS_TEXTO = ("justificativa", "letra")
+COLUNAS_LINHA = ["indice", "titulo", "artista", "ano", "nivel_toxicidade", *CAMPOS_BOOLEANOS, "justificativa", "hash_letra"]
+
+# Segmentos de texto acumulados antes de ``atualizar`` compactar o índice
+MAX_SEGMENTOS = 8
+
+# Tokens maiores que isto (URLs, lixo de scraping) não entram no índice
+MAX_TAMANHO_TOKEN = 40
+
+INDICE_PADRAO = "results/indice_consulta"
+
+_RE_TOKEN = re.compile(r"\w+")
+
+
+def tokenizar(texto: Any) -> List[str]:
+    """Palavras do texto em minúsculas e sem acentos."""
+    if not isinstance(texto, str):
+        return []
+    texto = texto.lower()
+    if not texto.isascii():
+        texto = "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+    return [token for token in _RE_TOKEN.findall(texto) if len(token) <= MAX_TAMANHO_TOKEN]
+
+
+def _para_bool(serie: pd.Series) -> np.ndarray:
+    if serie.dtype == bool:
+        return serie.to_numpy()
+    return serie.astype(str).str.strip().str.lower().isin(["true", "1", "1.0"]).to_numpy()
+
+
+def _normalizar_resultados(df: pd.DataFrame) -> pd.DataFrame:
+    """Colunas de ``COLUNAS_LINHA`` com tipos fixos (a última versão de cada ``indice``)."""
+    df = df.drop_duplicates(subset="indice", keep="last")
+    linhas = pd.DataFrame({"indice": df["indice"].astype("int64").to_numpy()})
+    for coluna in ("titulo", "artista", "justificativa", "hash_letra"):
+        valores = df[coluna] if coluna in df.columns else pd.Series([None] * len(df))
+        linhas[coluna] = [None if pd.isna(v) else str(v) for v in valores]
+    linhas["ano"] = pd.to_numeric(df["ano"], errors="coerce").to_numpy(dtype="float64") if "ano" in df.columns else np.nan
+    linhas["nivel_toxicidade"] = df["nivel_toxicidade"].astype(str).str.strip().str.lower().to_numpy()
+    for campo in CAMPOS_BOOLEANOS:
+        linhas[campo] = _para_bool(df[campo]) if campo in df.columns else False
+    return linhas[COLUNAS_LINHA]
+
+
+def _digest(linhas: pd.DataFrame) -> np.ndarray:
+    """Hash de cada linha, para achar as linhas alteradas em uma atualização."""
+    return pd.util.hash_pandas_object(linhas.drop(columns="indice"), index=False).to_numpy()
+
+
+def carregar_letras(dataset: str | Path, indices: Set[int], tamanho_bloco: int = 1000) -> Dict[int, str]:
+    """Letras das músicas ``indices`` do dataset, lido em fluxo."""
+    if not indices:
+        return {}
+    letras = {}
+    for musica in ler_musicas(dataset, tamanho_bloco=tamanho_bloco):
+        if musica.indice in indices:
+            letras[musica.indice] = musica.letra
+            if len(letras) == len(indices):
+                break
+    return letras
+
+
+@dataclass
+class Segmento:
+    """Índice invertido posicional de um conjunto de linhas.
+
+    Para cada campo guarda o vocabulário ordenado e, por termo, as
+    ocorrências ``(linha, posição)`` ordenadas, no formato CSR: as ocorrências
+    do termo ``t`` ficam em ``[inicios[t], inicios[t + 1])``.
+    """
+
+    nome: str
+    campos: Dict[str, Dict[str, np.ndarray]]
+
+    @classmethod
+    def construir(cls, nome: str, linhas: np.ndarray, textos: Dict[str, Sequence[Any]]) -> "Segmento":
+        campos = {}
+        for campo, valores in textos.items():
+            ids: Dict[str, int] = {}
+            termos: List[int] = []
+            docs: List[int] = []
+            posicoes: List[int] = []
+            for linha, texto in zip(linhas, valores):
+                tokens = tokenizar(texto)
+                termos.extend(ids.setdefault(token, len(ids)) for token in tokens)
+                docs.extend([int(linha)] * len(tokens))
+                posicoes.extend(range(len(tokens)))
+            vocabulario = np.array(sorted(ids), dtype=str) if ids else np.array([], dtype=str)
+            # Os ids seguem a ordem de inserção em ``ids``; passam à ordem do vocabulário
+            reordenar = np.searchsorted(vocabulario, np.array(list(ids), dtype=str)).astype(np.int64)
+            campos[campo] = cls._csr(
+                vocabulario,
+                reordenar[np.array(termos, dtype=np.int64)],
+                np.array(docs, dtype=np.int32),
+                np.array(posicoes, dtype=np.int32),
+            )
+        return cls(nome, campos)
+
+    @staticmethod
+    def _csr(vocabulario: np.ndarray, termos: np.ndarray, docs: np.ndarray, posicoes: np.ndarray) -> Dict[str, np.ndarray]:
+        ordem = np.lexsort((posicoes, docs, termos))
+        contagem = np.bincount(termos, minlength=len(vocabulario)) if len(termos) else np.zeros(len(vocabulario), dtype=np.int64)
+        return {
+            "vocabulario": vocabulario,
+            "inicios": np.concatenate([[0], np.cumsum(contagem)]).astype(np.int64),
+            "docs": docs[ordem],
+            "posicoes": posicoes[ordem],
+        }
+
+    def ocorrencias(self, campo: str, termo: str) -> Tuple[np.ndarray, np.ndarray]:
+        dados = self.campos[campo]
+        vocabulario = dados["vocabulario"]
+        i = int(np.searchsorted(vocabulario, termo))
+        if i >= len(vocabulario) or vocabulario[i] != termo:
+            vazio = np.array([], dtype=np.int32)
+            return vazio, vazio
+        inicio, fim = dados["inicios"][i], dados["inicios"][i + 1]
+        return dados["docs"][inicio:fim], dados["posicoes"][inicio:fim]
+
+    def frase(self, campo: str, termos: Sequence[str]) -> np.ndarray:
+        """Linhas em que os termos aparecem em sequência."""
+        docs, posicoes = self.ocorrencias(campo, termos[0])
+        # Cada ocorrência vira uma chave (linha, posição em que a frase começa)
+        chaves = (docs.astype(np.int64) << 32) | posicoes.astype(np.int64)
+        for deslocamento, termo in enumerate(termos[1:], start=1):
+            if not len(chaves):
+                break
+            docs, posicoes = self.ocorrencias(campo, termo)
+            validas = posicoes >= deslocamento
+            seguintes = (docs[validas].astype(np.int64) << 32) | (posicoes[validas].astype(np.int64) - deslocamento)
+            chaves = np.intersect1d(chaves, seguintes, assume_unique=True)
+        return np.unique(chaves >> 32)
+
+    def salvar(self, diretorio: Path) -> None:
+        arrays = {f"{campo}__{nome}": valor for campo, dados in self.campos.items() for nome, valor in dados.items()}
+        temporario = diretorio / f"{self.nome}.tmp.npz"
+        np.savez(temporario, **arrays)
+        os.replace(temporario, diretorio / f"{self.nome}.npz")
+
+    @classmethod
+    def carregar(cls, diretorio: Path, nome: str) -> "Segmento":
+        campos: Dict[str, Dict[str, np.ndarray]] = {}
+        with np.load(diretorio / f"{nome}.npz") as arquivo:
+            for chave in arquivo.files:
+                campo, parte = chave.split("__", 1)
+                campos.setdefault(campo, {})[parte] = arquivo[chave]
+        return cls(nome, campos)
+
+    @classmethod
+    def mesclar(cls, nome: str, segmentos: Sequence["Segmento"], novo_id: np.ndarray) -> "Segmento":
+        """Junta segmentos renumerando as linhas por ``novo_id`` (-1 descarta a linha)."""
+        campos = {}
+        for campo in CAMPOS_TEXTO:
+            partes = [s.campos[campo] for s in segmentos if campo in s.campos]
+            vocabulario = np.unique(np.concatenate([p["vocabulario"] for p in partes])) if partes else np.array([], dtype=str)
+            termos, docs, posicoes = [], [], []
+            for parte in partes:
+                local = np.repeat(np.arange(len(parte["vocabulario"])), np.diff(parte["inicios"]))
+                global_ = np.searchsorted(vocabulario, parte["vocabulario"])[local]
+                renumerados = novo_id[parte["docs"]]
+                mantidos = renumerados >= 0
+                termos.append(global_[mantidos])
+                docs.append(renumerados[mantidos].astype(np.int32))
+                posicoes.append(parte["posicoes"][mantidos])
+            if not partes:
+                termos, docs, posicoes = [np.array([], dtype=np.int64)], [np.array([], dtype=np.int32)], [np.array([], dtype=np.int32)]
+            campos[campo] = cls._csr(vocabulario, np.concatenate(termos), np.concatenate(docs), np.concatenate(posicoes))
+        return cls(nome, campos)
+
+
+class IndiceConsulta:
+    """Índices dos resultados e das letras, gravados em um diretório."""
+
+    def __init__(self, diretorio: str | Path):
+        self.diretorio = Path(diretorio)
+        self.linhas = pd.DataFrame(columns=COLUNAS_LINHA)
+        self.digest = np.array([], dtype=np.uint64)
+        self.vivas = np.array([], dtype=bool)
+        self.segmentos: List[Segmento] = []
+        self.fontes: Dict[str, Dict[str, Any]] = {}
+        self.dataset: Optional[str] = None
+        self._proximo_segmento = 0
+        self._reconstruir_estruturas()
+
+    # -- persistência ---------------------------------------------------------
+
+    @classmethod
+    def abrir(cls, diretorio: str | Path) -> "IndiceConsulta":
+        """Carrega o índice do diretório (vazio se ainda não existe)."""
+        indice = cls(diretorio)
+        base = indice.diretorio / "base.pkl"
+        if not base.exists():
+            return indice
+        with open(base, "rb") as f:
+            estado = pickle.load(f)
+        if estado.get("versao") != VERSAO_INDICE:
+            raise ValueError(f"Índice {diretorio} em formato antigo; reconstrua com 'indexar --reconstruir'")
+        indice.linhas = estado["linhas"]
+        indice.digest = estado["digest"]
+        indice.vivas = np.unpackbits(estado["vivas"], count=len(indice.linhas)).astype(bool)
+        indice.fontes = estado["fontes"]
+        indice.dataset = estado["dataset"]
+        indice._proximo_segmento = estado["proximo_segmento"]
+        indice.segmentos = [Segmento.carregar(indice.diretorio, nome) for nome in estado["segmentos"]]
+        indice._reconstruir_estruturas()
+        return indice
+
+    @staticmethod
+    def descartar(diretorio: str | Path) -> int:
+        """Apaga os arquivos do índice em ``diretorio`` (e só eles); devolve quantos."""
+        diretorio = Path(diretorio)
+        arquivos = [diretorio / "base.pkl", diretorio / "base.pkl.tmp", *diretorio.glob("segmento_*.npz")]
+        apagados = 0
+        for arquivo in arquivos:
+            if arquivo.exists():
+                arquivo.unlink()
+                apagados += 1
+        return apagados
+
+    def salvar(self) -> None:
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        estado = {
+            "versao": VERSAO_INDICE,
+            "linhas": self.linhas,
+            "digest": self.digest,
+            "vivas": np.packbits(self.vivas),
+            "fontes": self.fontes,
+            "dataset": self.dataset,
+            "proximo_segmento": self._proximo_segmento,
+            "segmentos": [s.nome for s in self.segmentos],
+        }
+        # Os segmentos já estão gravados: base.pkl só passa a apontar para eles agora
+        temporario = self.diretorio / "base.pkl.tmp"
+        with open(temporario, "wb") as f:
+            pickle.dump(estado, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporario, self.diretorio / "base.pkl")
+        em_uso = {f"{s.nome}.npz" for s in self.segmentos}
+        for arquivo in self.diretorio.glob("segmento_*.npz"):
+            if arquivo.name not in em_uso:
+                arquivo.unlink()
+
+    # -- construção e atualização ---------------------------------------------
+
+    def _reconstruir_estruturas(self) -> None:
+        """Bitmaps e índices ordenados a partir das colunas guardadas."""
+        self.total = len(self.linhas)
+        self.bitmap_vivas = np.packbits(self.vivas)
+        self.bitmaps = {campo: np.packbits(self.linhas[campo].to_numpy(dtype=bool)) for campo in CAMPOS_BOOLEANOS}
+        self.codigo_nivel = pd.Categorical(self.linhas["nivel_toxicidade"], categories=NIVEIS).codes.astype(np.int8)
+        self.bitmaps_nivel = {nivel: np.packbits(self.codigo_nivel == i) for i, nivel in enumerate(NIVEIS)}
+
+        self.ano = self.linhas["ano"].to_numpy(dtype="float64")
+        # Anos ausentes (NaN) ficam no fim da ordem e fora de qualquer intervalo
+        self.ordem_ano = np.argsort(self.ano, kind="stable")
+        self.anos_ordenados = self.ano[self.ordem_ano]
+
+        artistas = self.linhas["artista"].fillna("").to_numpy(dtype=object)
+        self.artistas, codigos = np.unique(artistas, return_inverse=True) if self.total else (np.array([], dtype=object), np.array([], dtype=np.int64))
+        self.codigo_artista = codigos.astype(np.int32)
+        self.ordem_artista = np.argsort(self.codigo_artista, kind="stable")
+        self.inicio_artista = np.searchsorted(self.codigo_artista[self.ordem_artista], np.arange(len(self.artistas) + 1))
+        self._artistas_minusculos = np.array([a.lower() for a in self.artistas], dtype=object)
+
+    def _ler_novos(self, resultados: str | Path) -> pd.DataFrame:
+        """Resultados ainda não vistos: só o trecho acrescentado num JSONL, o arquivo todo nos demais formatos."""
+        path = Path(resultados).resolve()
+        stat = path.stat()
+        fonte = self.fontes.get(str(path))
+        if fonte and fonte["tamanho"] == stat.st_size and fonte["mtime"] == stat.st_mtime:
+            return pd.DataFrame(columns=COLUNAS_LINHA)
+
+        if path.suffix.lower() == ".jsonl":
+            inicio = fonte["offset"] if fonte and stat.st_size >= fonte["offset"] else 0
+            with open(path, "rb") as f:
+                f.seek(inicio)
+                trecho = f.read()
+            # Uma última linha incompleta fica para a próxima atualização
+            fim = trecho.rfind(b"\n") + 1
+            offset = inicio + fim
+            texto = trecho[:fim].decode("utf-8")
+            df = pd.read_json(io.StringIO(texto), lines=True) if texto.strip() else pd.DataFrame(columns=COLUNAS_LINHA)
+        else:
+            offset = stat.st_size
+            df = ler_arquivo_resultados(path)
+        self.fontes[str(path)] = {"tamanho": stat.st_size, "mtime": stat.st_mtime, "offset": offset}
+        return df
+
+    def atualizar(
+        self,
+        resultados: str | Path,
+        dataset: Optional[str | Path] = None,
+        tamanho_bloco: int = 1000,
+    ) -> Dict[str, int]:
+        """Indexa os resultados novos ou alterados de ``resultados``.
+
+        As letras vêm de ``dataset`` (ou do dataset usado na última
+        atualização); sem dataset só a ``justificativa`` é indexada.
+        """
+        if dataset is not None:
+            self.dataset = str(Path(dataset).resolve())
+        df = self._ler_novos(resultados)
+        if df.empty:
+            return {"novas": 0, "alteradas": 0, "iguais": 0}
+
+        entrada = _normalizar_resultados(df)
+        digest = _digest(entrada)
+        atuais = pd.Series(np.flatnonzero(self.vivas), index=self.linhas["indice"].to_numpy()[self.vivas])
+        posicao = atuais.reindex(entrada["indice"].to_numpy()).to_numpy()
+        existentes = ~np.isnan(posicao)
+        iguais = np.zeros(len(entrada), dtype=bool)
+        iguais[existentes] = self.digest[posicao[existentes].astype(np.int64)] == digest[existentes]
+        alteradas = existentes & ~iguais
+        self.vivas[posicao[alteradas].astype(np.int64)] = False
+
+        novas = entrada[~iguais].reset_index(drop=True)
+        if not novas.empty:
+            ids = np.arange(self.total, self.total + len(novas))
+            letras = carregar_letras(self.dataset, set(novas["indice"].tolist()), tamanho_bloco) if self.dataset else {}
+            segmento = Segmento.construir(
+                f"segmento_{self._proximo_segmento:05d}",
+                ids,
+                {
+                    "justificativa": novas["justificativa"].tolist(),
+                    "letra": [letras.get(i) for i in novas["indice"].tolist()],
+                },
+            )
+            self.diretorio.mkdir(parents=True, exist_ok=True)
+            segmento.salvar(self.diretorio)
+            self._proximo_segmento += 1
+            self.segmentos.append(segmento)
+            self.linhas = pd.concat([self.linhas, novas], ignore_index=True) if self.total else novas
+            self.digest = np.concatenate([self.digest, digest[~iguais]])
+            self.vivas = np.concatenate([self.vivas, np.ones(len(novas), dtype=bool)])
+
+        if len(self.segmentos) > MAX_SEGMENTOS:
+            self.compactar()
+        else:
+            self._reconstruir_estruturas()
+        self.salvar()
+        return {
+            "novas": int((~existentes).sum()),
+            "alteradas": int(alteradas.sum()),
+            "iguais": int(iguais.sum()),
+        }
+
+    def compactar(self) -> None:
+        """Junta os segmentos em um só e descarta as linhas removidas."""
+        novo_id = np.where(self.vivas, np.cumsum(self.vivas) - 1, -1)
+        segmento = Segmento.mesclar(f"segmento_{self._proximo_segmento:05d}", self.segmentos, novo_id)
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        segmento.salvar(self.diretorio)
+        self._proximo_segmento += 1
+        self.segmentos = [segmento]
+        self.linhas = self.linhas[self.vivas].reset_index(drop=True)
+        self.digest = self.digest[self.vivas]
+        self.vivas = np.ones(len(self.linhas), dtype=bool)
+        self._reconstruir_estruturas()
+
+    # -- consultas --------------------------------------------------------------
+
+    def _bitmap(self, linhas: np.ndarray) -> np.ndarray:
+        mascara = np.zeros(self.total, dtype=bool)
+        mascara[linhas] = True
+        return np.packbits(mascara)
+
+    def linhas_do_artista(self, artistas: Iterable[str]) -> np.ndarray:
+        """Linhas dos artistas (nome exato, sem diferenciar maiúsculas)."""
+        procurados = {a.strip().lower() for a in artistas}
+        codigos = np.flatnonzero(np.isin(self._artistas_minusculos, list(procurados)))
+        if not len(codigos):
+            return np.array([], dtype=np.int64)
+        return np.concatenate([self.ordem_artista[self.inicio_artista[c]:self.inicio_artista[c + 1]] for c in codigos])
+
+    def linhas_do_periodo(self, inicio: float, fim: float) -> np.ndarray:
+        """Linhas com ``inicio <= ano <= fim``."""
+        a = np.searchsorted(self.anos_ordenados, inicio, side="left")
+        b = np.searchsorted(self.anos_ordenados, fim, side="right")
+        return self.ordem_ano[a:b]
+
+    def buscar_frase(self, frase: str, campo: str = "justificativa") -> np.ndarray:
+        """Linhas válidas em que a frase aparece (``campo``: justificativa, letra ou todos)."""
+        termos = tokenizar(frase)
+        if not termos:
+            return np.array([], dtype=np.int64)
+        campos = CAMPOS_TEXTO if campo == "todos" else (campo,)
+        partes = [s.frase(c, termos) for s in self.segmentos for c in campos if c in s.campos]
+        linhas = np.unique(np.concatenate(partes)) if partes else np.array([], dtype=np.int64)
+        return linhas[self.vivas[linhas]]
+
+    def filtrar(
+        self,
+        flags: Sequence[str] = (),
+        niveis: Sequence[str] = (),
+        ano: Optional[Tuple[float, float]] = None,
+        artistas: Sequence[str] = (),
+        frase: Optional[str] = None,
+        campo: str = "justificativa",
+    ) -> np.ndarray:
+        """Linhas que atendem a todos os filtros (flags verdadeiras, um dos níveis, período, artistas, frase)."""
+        mascara = self.bitmap_vivas.copy()
+        for flag in flags:
+            mascara &= self.bitmaps[flag]
+        if niveis:
+            por_nivel = np.zeros_like(mascara)
+            for nivel in niveis:
+                por_nivel |= self.bitmaps_nivel[nivel.strip().lower()]
+            mascara &= por_nivel
+        if ano is not None:
+            mascara &= self._bitmap(self.linhas_do_periodo(*ano))
+        if artistas:
+            mascara &= self._bitmap(self.linhas_do_artista(artistas))
+        if frase:
+            mascara &= self._bitmap(self.buscar_frase(frase, campo))
+        return np.flatnonzero(np.unpackbits(mascara, count=self.total))
+
+    def media_por_artista(self, linhas: Optional[np.ndarray] = None, minimo_musicas: int = 1) -> pd.DataFrame:
+        """Nível numérico médio (``NIVEL_NUMERICO``) e número de músicas por artista."""
+        if linhas is None:
+            linhas = np.flatnonzero(self.vivas)
+        conhecidos = linhas[self.codigo_nivel[linhas] >= 0]
+        codigos = self.codigo_artista[conhecidos]
+        musicas = np.bincount(codigos, minlength=len(self.artistas))
+        soma = np.bincount(codigos, weights=VALOR_NIVEL[self.codigo_nivel[conhecidos]], minlength=len(self.artistas))
+        com_musicas = np.flatnonzero(musicas >= max(minimo_musicas, 1))
+        return pd.DataFrame({
+            "artista": self.artistas[com_musicas],
+            "musicas": musicas[com_musicas],
+            "media_nivel": soma[com_musicas] / musicas[com_musicas],
+        }).sort_values(["media_nivel", "musicas"], ascending=False, ignore_index=True)
+
+    def contar_por(self, coluna: str, linhas: Optional[np.ndarray] = None) -> pd.Series:
+        """Número de músicas por ``ano``, ``nivel_toxicidade`` ou ``artista``."""
+        if linhas is None:
+            linhas = np.flatnonzero(self.vivas)
+        if coluna == "nivel_toxicidade":
+            contagem = np.bincount(self.codigo_nivel[linhas][self.codigo_nivel[linhas] >= 0], minlength=len(NIVEIS))
+            return pd.Series(contagem, index=list(NIVEIS), name="musicas")
+        if coluna == "artista":
+            contagem = np.bincount(self.codigo_artista[linhas], minlength=len(self.artistas))
+            com_musicas = np.flatnonzero(contagem)
+            return pd.Series(contagem[com_musicas], index=self.artistas[com_musicas], name="musicas").sort_values(ascending=False)
+        if coluna == "ano":
+            anos = self.ano[linhas]
+            valores, contagem = np.unique(anos[~np.isnan(anos)], return_counts=True)
+            return pd.Series(contagem, index=valores.astype(int), name="musicas")
+        raise ValueError(f"Coluna não suportada: {coluna}")
+
+    def para_dataframe(self, linhas: np.ndarray) -> pd.DataFrame:
+        return self.linhas.iloc[linhas].drop(columns="hash_letra").reset_index(drop=True)
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Índices persistentes para consultas rápidas sobre os resultados e as letras."
+    )
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    indexar = comandos.add_parser("indexar", help="Cria o índice ou acrescenta os resultados novos/alterados.")
+    indexar.add_argument("resultados", help="Arquivo de resultados (Parquet, Feather, CSV, JSON ou checkpoint JSONL).")
+    indexar.add_argument("--indice", default=INDICE_PADRAO, help="Diretório do índice.")
+    indexar.add_argument("--dataset", default=None, help="Dataset com as letras (padrão: o da última indexação; sem ele só a justificativa).")
+    indexar.add_argument("--reconstruir", action="store_true", help="Descarta o índice existente e indexa do zero.")
+    indexar.add_argument("--compactar", action="store_true", help="Junta os segmentos do índice de texto depois de atualizar.")
+    indexar.add_argument("--tamanho-bloco", type=int, default=1000, help="Linhas lidas do dataset por vez.")
+
+    buscar = comandos.add_parser("buscar", help="Consulta o índice.")
+    buscar.add_argument("--indice", default=INDICE_PADRAO, help="Diretório do índice.")
+    buscar.add_argument("--flag", action="append", default=[], choices=CAMPOS_BOOLEANOS, help="Flag que deve ser verdadeira (repita para várias).")
+    buscar.add_argument("--nivel", action="append", default=[], choices=NIVEIS, help="Nível aceito (repita para vários).")
+    buscar.add_argument("--ano", type=float, nargs=2, metavar=("INICIO", "FIM"), default=None, help="Período, inclusive.")
+    buscar.add_argument("--artista", action="append", default=[], help="Artista (nome exato; repita para vários).")
+    buscar.add_argument("--frase", default=None, help="Palavra ou frase exata a procurar.")
+    buscar.add_argument("--campo", default="justificativa", choices=[*CAMPOS_TEXTO, "todos"], help="Onde procurar a frase.")
+    buscar.add_argument("--media-artista", type=float, default=None, metavar="LIMIAR", help="Artistas com nível médio acima do limiar.")
+    buscar.add_argument("--min-musicas", type=int, default=1, help="Mínimo de músicas do artista em --media-artista.")
+    buscar.add_argument("--por", default=None, choices=["ano", "nivel_toxicidade", "artista"], help="Conta as músicas encontradas por coluna.")
+    buscar.add_argument("--limite", type=int, default=20, help="Linhas mostradas.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+
+    if args.comando == "indexar":
+        if args.reconstruir:
+            IndiceConsulta.descartar(args.indice)
+        inicio = time.perf_counter()
+        indice = IndiceConsulta.abrir(args.indice)
+        contagem = indice.atualizar(args.resultados, args.dataset, args.tamanho_bloco)
+        if args.compactar and len(indice.segmentos) > 1:
+            indice.compactar()
+            indice.salvar()
+        print(f"✅ Índice {args.indice} atualizado em {(time.perf_counter() - inicio)*1000:.0f} ms")
+        print(f"→ Novas: {contagem['novas']} | Alteradas: {contagem['alteradas']} | Sem mudança: {contagem['iguais']}")
+        print(f"→ Músicas no índice: {int(indice.vivas.sum())} | Segmentos de texto: {len(indice.segmentos)}")
+        if indice.dataset is None:
+            print("⚠️ Sem --dataset: só a justificativa foi indexada para busca de texto")
+        return
+
+    inicio = time.perf_counter()
+    indice = IndiceConsulta.abrir(args.indice)
+    carregado = time.perf_counter()
+    linhas = indice.filtrar(args.flag, args.nivel, args.ano, args.artista, args.frase, args.campo)
+    if args.media_artista is not None:
+        tabela = indice.media_por_artista(linhas, args.min_musicas)
+        tabela = tabela[tabela["media_nivel"] > args.media_artista]
+    elif args.por:
+        tabela = indice.contar_por(args.por, linhas).to_frame()
+    else:
+        tabela = indice.para_dataframe(linhas[:args.limite])
+    fim = time.perf_counter()
+
+    print(f"🔎 {len(linhas)} músicas em {(fim - carregado)*1000:.1f} ms (índice carregado em {(carregado - inicio)*1000:.0f} ms)")
+    if args.media_artista is not None:
+        print(f"→ {len(tabela)} artistas com nível médio acima de {args.media_artista}")
+    if not tabela.empty:
+        with pd.option_context("display.max_colwidth", 80, "display.width", 200):
+            print(tabela.head(args.limite).to_string(index=args.por is not None))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,10 @@
 import argparse
 from pathlib import Path
 
-import pandas as pd
+from pos_processamento import NIVEL_NUMERICO, processar_resultados, salvar_agregados
 
 # Mapeamento de categorias para valores numéricos
-TOXICITY_MAPPING = {
-    "na": 0.0,
-    "muito baixo": 0.1,
-    "baixo": 0.2,
-    "moderado": 0.3,
-    "alto": 0.8,
-    "muito alto": 1.0,
-}
+TOXICITY_MAPPING = NIVEL_NUMERICO
 
 
 def convert_toxicity(
@@ -41,48 +34,25 @@ def convert_toxicity(
     -------
     Path
         Caminho do arquivo CSV gerado.
+
+    A conversão é feita por ``pos_processamento.processar_resultados``, que lê
+    o CSV em blocos e, na mesma passada, grava o cache de agregados do arquivo
+    de entrada (ver ``pos_processamento.carregar_agregados``).
     """
 
     input_csv = Path(input_csv)
     if not input_csv.exists():
         raise FileNotFoundError(f"CSV de entrada não encontrado: {input_csv}")
 
-    df = pd.read_csv(input_csv)
-
-    if column_name not in df.columns:
-        raise KeyError(
-            f"A coluna '{column_name}' não foi encontrada no CSV. Colunas disponíveis: {list(df.columns)}"
-        )
-
-    # Aplica o mapeamento
-    numeric_series = df[column_name].str.lower().map(TOXICITY_MAPPING)
-
-    # Verifica se houve valores não mapeados
-    if numeric_series.isna().any():
-        valores_invalidos = (
-            df.loc[numeric_series.isna(), column_name]
-            .dropna()
-            .unique()
-            .tolist()
-        )
-        raise ValueError(
-            "Foram encontrados valores de toxicidade sem mapeamento: "
-            + ", ".join(map(str, valores_invalidos))
-        )
-
-    if new_column:
-        df[f"{column_name}_num"] = numeric_series.astype(float)
-    else:
-        df[column_name] = numeric_series.astype(float)
-
     # Define o caminho de saída, se não foi fornecido
     if output_csv is None:
         output_csv = input_csv.with_name(f"{input_csv.stem}_converted{input_csv.suffix}")
     else:
         output_csv = Path(output_csv)
 
-    # Salva o resultado
-    df.to_csv(output_csv, index=False)
+    # Converte em blocos; a mesma passada valida os níveis e gera os agregados
+    agregados = processar_resultados(input_csv, output_csv, nova_coluna=new_column, coluna=column_name)
+    salvar_agregados(agregados, input_csv)
     return output_csv
 
 
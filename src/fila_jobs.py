@@ -0,0 +1,702 @@
+"""Fila de jobs local para classificar o corpus com vários processos e máquinas.
+
+O dataset é dividido em shards, registrados em um SQLite (sem broker
+externo), e as músicas de cada shard são copiadas para um arquivo próprio,
+então cada worker lê só o seu shard:
+
+- ``intervalo``: faixas contíguas de linhas ``[inicio, fim)``;
+- ``hash``: a música vai para o shard ``hash_letra % num_shards``, então
+  letras repetidas caem no mesmo shard (e no mesmo cache de respostas).
+
+Cada worker reivindica um shard com um lease (prazo de posse renovado por um
+batimento em segundo plano), classifica as músicas com
+``analise_conteudo_toxico`` gravando em um checkpoint por lease e marca o
+shard como concluído. Se o worker morre, o lease expira e outro worker
+reivindica o shard, retomando dos checkpoints dos leases anteriores; um
+worker que perdeu o lease para de classificar na próxima música e, até lá,
+continua gravando só no próprio arquivo. Um shard que esgota ``max_tentativas`` fica
+como ``falhou``.
+
+Os workers podem rodar em várias máquinas que compartilhem o diretório da
+fila (o SQLite e o diretório ``<fila>_shards`` ao lado dele), desde que o sistema de arquivos tenha locks POSIX confiáveis (exigência
+do SQLite) e os relógios estejam sincronizados (os leases usam a hora do
+sistema). No final, ``mesclar`` junta os checkpoints no mesmo CSV/JSON que o
+``main()`` do ``ollama_analysis.py`` grava.
+
+Uso:
+    python fila_jobs.py criar results/fila.sqlite --dataset ../data/all_songs_data.csv --tamanho-shard 500
+    python fila_jobs.py worker results/fila.sqlite --processos 4 -c 2
+    python fila_jobs.py estado results/fila.sqlite
+    python fila_jobs.py mesclar results/fila.sqlite
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import math
+import multiprocessing
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from agendador import Agendador, LimitadorAIMD, OrcamentoRetries
+from checkpoint_store import COLUNAS_IMPRESSAO, COLUNAS_RESULTADO, CheckpointStore, exportar_dataframe
+from formato_colunar import exportar_visoes, pyarrow_disponivel, salvar_resultados
+from ingestao import Musica, ler_musicas
+from letras import hash_letra
+from ollama_analysis import (
+    EXEMPLOS_PADRAO,
+    PROMPT_CLASSIFICACAO,
+    OllamaAnalyzer,
+    analise_conteudo_toxico,
+    carregar_exemplos_manuais,
+)
+from pool_endpoints import PoolEndpoints
+from pos_processamento import agregar, salvar_agregados
+from pre_filtro import PreFiltro
+from response_cache import CacheRespostas
+
+logger = logging.getLogger(__name__)
+
+PENDENTE = "pendente"
+EM_ANDAMENTO = "em_andamento"
+CONCLUIDO = "concluido"
+FALHOU = "falhou"
+
+ESTRATEGIAS = ("intervalo", "hash")
+
+
+class LeasePerdido(RuntimeError):
+    """O lease do shard expirou e outro worker pode tê-lo reivindicado."""
+
+
+@dataclass
+class Shard:
+    id: int
+    inicio: Optional[int]
+    fim: Optional[int]
+    lease: str
+    tentativas: int
+
+
+def shard_por_hash(letra: str, num_shards: int) -> int:
+    """Shard de uma letra na estratégia ``hash``."""
+    return int(hash_letra(letra)[:8], 16) % num_shards
+
+
+def _novo_lease() -> str:
+    # Começa pela hora da reivindicação, com largura fixa: ordenar os
+    # checkpoints de um shard pelo nome os põe na ordem dos leases
+    return f"{time.time_ns():020d}-{uuid.uuid4().hex[:12]}"
+
+
+def _ultimos_registros(paths: List[Path]) -> List[Dict[str, Any]]:
+    """A última versão de cada música nos checkpoints ``paths``, lidos em ordem."""
+    registros: Dict[int, Dict[str, Any]] = {}
+    for path in paths:
+        for registro in CheckpointStore(path):
+            registros[registro["indice"]] = registro
+    return list(registros.values())
+
+
+class FilaJobs:
+    """Shards do dataset e os seus leases em um arquivo SQLite."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit: as transações que precisam de exclusividade usam BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(str(self.path), timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS config (chave TEXT PRIMARY KEY, valor TEXT NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS shards ("
+            " id INTEGER PRIMARY KEY,"
+            " inicio INTEGER,"
+            " fim INTEGER,"
+            " estado TEXT NOT NULL DEFAULT 'pendente',"
+            " worker TEXT,"
+            " lease TEXT,"
+            " lease_ate REAL,"
+            " tentativas INTEGER NOT NULL DEFAULT 0,"
+            " classificadas INTEGER,"
+            " erro TEXT,"
+            " atualizado REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_estado ON shards (estado)")
+
+    @property
+    def diretorio_shards(self) -> Path:
+        # Relativo ao arquivo da fila: cada máquina pode montá-lo em outro caminho
+        return self.path.with_name(f"{self.path.stem}_shards")
+
+    def caminho_entrada(self, shard_id: int) -> Path:
+        return self.diretorio_shards / f"entrada_{shard_id:05d}.jsonl"
+
+    def caminho_checkpoint(self, shard: Shard) -> Path:
+        # Um arquivo por lease: um worker que perdeu o lease e ainda não
+        # percebeu nunca escreve no arquivo do novo dono do shard
+        return self.diretorio_shards / f"shard_{shard.id:05d}_{shard.lease}.jsonl"
+
+    def config(self) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT chave, valor FROM config").fetchall())
+
+    def criar(
+        self,
+        dataset: str | Path,
+        tamanho_shard: Optional[int] = 500,
+        num_shards: Optional[int] = None,
+        estrategia: str = "intervalo",
+        max_tentativas: int = 3,
+        tamanho_bloco: int = 1000,
+    ) -> int:
+        """Divide o dataset em shards; devolve o número de shards.
+
+        ``num_shards`` tem prioridade sobre ``tamanho_shard``. Chamar de novo
+        com a mesma configuração não muda nada (vários nós podem rodar o
+        ``criar``); uma configuração diferente para a mesma fila é um erro.
+        O dataset é lido duas vezes: uma para contar as músicas e outra para
+        copiar as de cada shard para ``caminho_entrada``.
+        """
+        if estrategia not in ESTRATEGIAS:
+            raise ValueError(f"Estratégia desconhecida: {estrategia}. Use uma de: {', '.join(ESTRATEGIAS)}")
+        dataset = str(Path(dataset).resolve())
+        pedida = {"dataset": dataset, "estrategia": estrategia}
+        existente = self.config()
+        if existente:
+            if any(existente.get(chave) != valor for chave, valor in pedida.items()):
+                raise ValueError(f"A fila {self.path} já foi criada com outra configuração: {existente}")
+            return int(existente["num_shards"])
+
+        total = sum(1 for _ in ler_musicas(dataset, tamanho_bloco=tamanho_bloco))
+        if num_shards is None:
+            num_shards = math.ceil(total / max(tamanho_shard or total, 1))
+        num_shards = max(min(num_shards, total), 1)
+        por_shard = math.ceil(total / num_shards)
+        agora = time.time()
+        linhas = []
+        for shard_id in range(num_shards):
+            if estrategia == "intervalo":
+                linhas.append((shard_id, shard_id * por_shard, min((shard_id + 1) * por_shard, total), agora))
+            else:
+                linhas.append((shard_id, None, None, agora))
+
+        config = {
+            **pedida,
+            "num_shards": str(num_shards),
+            "total": str(total),
+            "max_tentativas": str(max_tentativas),
+        }
+        # Os arquivos de entrada são gerados à parte e só movidos para o
+        # diretório dos shards por quem grava a configuração
+        temporario = self.path.with_name(f"{self.path.stem}_shards.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            _particionar(dataset, temporario, estrategia, num_shards, por_shard, tamanho_bloco)
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    # Outro nó pode ter criado a fila enquanto o dataset era lido
+                    criada = self._conn.execute("SELECT COUNT(*) FROM config").fetchone()[0] > 0
+                    if not criada:
+                        self._conn.executemany("INSERT INTO config (chave, valor) VALUES (?, ?)", config.items())
+                        self._conn.executemany(
+                            "INSERT INTO shards (id, inicio, fim, atualizado) VALUES (?, ?, ?, ?)", linhas
+                        )
+                        self.diretorio_shards.mkdir(parents=True, exist_ok=True)
+                        for entrada in temporario.iterdir():
+                            os.replace(entrada, self.diretorio_shards / entrada.name)
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        finally:
+            shutil.rmtree(temporario, ignore_errors=True)
+        if criada:
+            return self.criar(dataset, tamanho_shard, num_shards, estrategia, max_tentativas, tamanho_bloco)
+        return num_shards
+
+    def reivindicar(self, worker: str, lease_s: float) -> Optional[Shard]:
+        """Toma posse de um shard pendente ou com lease expirado (``None`` se não há).
+
+        Shards com lease expirado que já esgotaram as tentativas passam a
+        ``falhou``: um shard que derruba todo worker que o pega não volta
+        para a fila para sempre.
+        """
+        agora = time.time()
+        max_tentativas = int(self.config().get("max_tentativas", 3))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE shards SET estado = ?, lease = NULL, erro = 'lease expirado', atualizado = ?"
+                    " WHERE estado = ? AND lease_ate < ? AND tentativas >= ?",
+                    (FALHOU, agora, EM_ANDAMENTO, agora, max_tentativas),
+                )
+                linha = self._conn.execute(
+                    "SELECT id, inicio, fim, tentativas FROM shards"
+                    " WHERE estado = ? OR (estado = ? AND lease_ate < ?)"
+                    " ORDER BY tentativas, id LIMIT 1",
+                    (PENDENTE, EM_ANDAMENTO, agora),
+                ).fetchone()
+                if linha is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                shard = Shard(id=linha[0], inicio=linha[1], fim=linha[2], lease=_novo_lease(), tentativas=linha[3] + 1)
+                self._conn.execute(
+                    "UPDATE shards SET estado = ?, worker = ?, lease = ?, lease_ate = ?, tentativas = ?, atualizado = ?"
+                    " WHERE id = ?",
+                    (EM_ANDAMENTO, worker, shard.lease, agora + lease_s, shard.tentativas, agora, shard.id),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return shard
+
+    def _atualizar_com_lease(self, shard: Shard, sql: str, parametros: tuple) -> None:
+        """Executa ``sql`` só se o lease ainda for do worker; senão ``LeasePerdido``."""
+        with self._lock:
+            cursor = self._conn.execute(
+                f"{sql} WHERE id = ? AND lease = ? AND estado = ?",
+                (*parametros, shard.id, shard.lease, EM_ANDAMENTO),
+            )
+        if cursor.rowcount == 0:
+            raise LeasePerdido(f"Lease do shard {shard.id} perdido")
+
+    def renovar(self, shard: Shard, lease_s: float) -> None:
+        """Batimento: estende o lease do shard."""
+        agora = time.time()
+        self._atualizar_com_lease(shard, "UPDATE shards SET lease_ate = ?, atualizado = ?", (agora + lease_s, agora))
+
+    def concluir(self, shard: Shard, classificadas: int) -> None:
+        self._atualizar_com_lease(
+            shard,
+            "UPDATE shards SET estado = ?, lease = NULL, lease_ate = NULL, classificadas = ?, erro = NULL, atualizado = ?",
+            (CONCLUIDO, classificadas, time.time()),
+        )
+
+    def liberar(self, shard: Shard, erro: str) -> None:
+        """Devolve o shard à fila depois de um erro (ou marca ``falhou`` sem tentativas restantes)."""
+        max_tentativas = int(self.config().get("max_tentativas", 3))
+        estado = FALHOU if shard.tentativas >= max_tentativas else PENDENTE
+        self._atualizar_com_lease(
+            shard,
+            "UPDATE shards SET estado = ?, lease = NULL, lease_ate = NULL, erro = ?, atualizado = ?",
+            (estado, erro[:500], time.time()),
+        )
+
+    def reabrir_falhas(self) -> int:
+        """Volta os shards ``falhou`` para ``pendente``, com as tentativas zeradas."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE shards SET estado = ?, tentativas = 0, erro = NULL, atualizado = ? WHERE estado = ?",
+                (PENDENTE, time.time(), FALHOU),
+            )
+        return cursor.rowcount
+
+    def terminou(self) -> bool:
+        """Nenhum shard pendente ou em andamento."""
+        with self._lock:
+            return not self._conn.execute(
+                "SELECT 1 FROM shards WHERE estado IN (?, ?) LIMIT 1", (PENDENTE, EM_ANDAMENTO)
+            ).fetchone()
+
+    def resumo(self) -> Dict[str, Any]:
+        agora = time.time()
+        with self._lock:
+            estados = dict(self._conn.execute("SELECT estado, COUNT(*) FROM shards GROUP BY estado").fetchall())
+            workers = dict(self._conn.execute(
+                "SELECT worker, COUNT(*) FROM shards WHERE estado = ? AND lease_ate >= ? GROUP BY worker",
+                (EM_ANDAMENTO, agora),
+            ).fetchall())
+            expirados = self._conn.execute(
+                "SELECT COUNT(*) FROM shards WHERE estado = ? AND lease_ate < ?", (EM_ANDAMENTO, agora)
+            ).fetchone()[0]
+            classificadas = self._conn.execute("SELECT COALESCE(SUM(classificadas), 0) FROM shards").fetchone()[0]
+            erros = self._conn.execute(
+                "SELECT id, erro FROM shards WHERE estado = ? ORDER BY id", (FALHOU,)
+            ).fetchall()
+        return {
+            "shards": sum(estados.values()),
+            "estados": {estado: estados.get(estado, 0) for estado in (PENDENTE, EM_ANDAMENTO, CONCLUIDO, FALHOU)},
+            "workers_ativos": workers,
+            "leases_expirados": expirados,
+            "classificadas": classificadas,
+            "falhas": erros,
+        }
+
+    def musicas_do_shard(self, shard: Shard) -> Iterator[Musica]:
+        """Músicas do shard, lidas em fluxo do arquivo gerado no ``criar``."""
+        path = self.caminho_entrada(shard.id)
+        if not path.exists():
+            # Shard sem músicas (estratégia ``hash`` com poucas letras)
+            return
+        with open(path, encoding="utf-8") as f:
+            for linha in f:
+                yield Musica(**json.loads(linha))
+
+    def checkpoints(self, shard_id: Optional[int] = None) -> List[Path]:
+        """Checkpoints de todos os shards (ou só de ``shard_id``), na ordem dos leases."""
+        padrao = f"shard_{shard_id:05d}_*.jsonl" if shard_id is not None else "shard_*.jsonl"
+        return sorted(self.diretorio_shards.glob(padrao))
+
+    def fechar(self) -> None:
+        self._conn.close()
+
+
+def _particionar(
+    dataset: str | Path,
+    destino: Path,
+    estrategia: str,
+    num_shards: int,
+    por_shard: int,
+    tamanho_bloco: int,
+) -> None:
+    """Copia as músicas do dataset para um arquivo JSONL por shard em ``destino``."""
+    destino.mkdir(parents=True)
+    pendentes: Dict[int, List[str]] = {}
+
+    def descarregar() -> None:
+        for shard_id, linhas in pendentes.items():
+            with open(destino / f"entrada_{shard_id:05d}.jsonl", "a", encoding="utf-8") as f:
+                f.writelines(linhas)
+        pendentes.clear()
+
+    for lidas, musica in enumerate(ler_musicas(dataset, tamanho_bloco=tamanho_bloco), 1):
+        if estrategia == "intervalo":
+            shard_id = musica.indice // por_shard
+        else:
+            shard_id = shard_por_hash(musica.letra, num_shards)
+        pendentes.setdefault(shard_id, []).append(json.dumps(musica._asdict(), ensure_ascii=False) + "\n")
+        if lidas % tamanho_bloco == 0:
+            descarregar()
+    descarregar()
+
+
+class Batimento:
+    """Renova o lease do shard em segundo plano enquanto o worker trabalha.
+
+    ``perdido`` é sinalizado quando a renovação falha: outro worker pode ter
+    reivindicado o shard e este deve parar.
+    """
+
+    def __init__(self, fila: FilaJobs, shard: Shard, lease_s: float):
+        self.fila = fila
+        self.shard = shard
+        self.lease_s = lease_s
+        self.perdido = threading.Event()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+
+    def _executar(self) -> None:
+        while not self._parar.wait(self.lease_s / 3):
+            try:
+                self.fila.renovar(self.shard, self.lease_s)
+            except LeasePerdido:
+                logger.warning(f"⚠️ Lease do shard {self.shard.id} perdido; parando na próxima música")
+                self.perdido.set()
+                return
+            except sqlite3.Error as e:
+                # Banco ocupado: tenta de novo no próximo batimento, antes do lease expirar
+                logger.warning(f"⚠️ Falha ao renovar o lease do shard {self.shard.id}: {e}")
+
+    def __enter__(self) -> "Batimento":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._parar.set()
+        self._thread.join()
+
+
+def executar_worker(
+    fila: FilaJobs,
+    analyzer: OllamaAnalyzer,
+    worker: str,
+    concorrencia: int = 1,
+    lease_s: float = 600.0,
+    pre_filtro: Optional[PreFiltro] = None,
+    prompt: str = PROMPT_CLASSIFICACAO,
+    esperar: bool = True,
+    intervalo_espera: float = 10.0,
+) -> int:
+    """Reivindica e processa shards até a fila acabar; devolve os shards concluídos.
+
+    Com ``esperar`` o worker continua enquanto houver shards em andamento em
+    outros workers, para reivindicá-los se os leases expirarem.
+    """
+    concluidos = 0
+    while True:
+        shard = fila.reivindicar(worker, lease_s)
+        if shard is None:
+            if not esperar or fila.terminou():
+                return concluidos
+            time.sleep(intervalo_espera)
+            continue
+
+        logger.info(f"📦 Shard {shard.id} reivindicado por {worker} (tentativa {shard.tentativas})")
+        checkpoint = CheckpointStore(fila.caminho_checkpoint(shard))
+        try:
+            anteriores = [path for path in fila.checkpoints(shard.id) if path != checkpoint.path]
+            if anteriores:
+                # Retoma dos leases anteriores copiando os resultados para o
+                # arquivo deste lease; os antigos não são mais alterados aqui
+                recuperadas = checkpoint.registrar_varios(_ultimos_registros(anteriores))
+                logger.info(f"↩️ Shard {shard.id}: {recuperadas} músicas recuperadas de {len(anteriores)} checkpoint(s)")
+            with Batimento(fila, shard, lease_s) as batimento:
+                musicas = itertools.takewhile(
+                    lambda _: not batimento.perdido.is_set(),
+                    fila.musicas_do_shard(shard),
+                )
+                analise_conteudo_toxico(
+                    musicas,
+                    concorrencia=concorrencia,
+                    analyzer=analyzer,
+                    checkpoint=checkpoint,
+                    pre_filtro=pre_filtro,
+                    prompt=prompt,
+                )
+            if batimento.perdido.is_set():
+                continue
+            fila.concluir(shard, classificadas=len(checkpoint.para_dataframe()))
+            concluidos += 1
+            logger.info(f"✅ Shard {shard.id} concluído por {worker}")
+        except LeasePerdido as e:
+            logger.warning(f"⚠️ {e}")
+        except Exception as e:
+            logger.error(f"❌ Erro no shard {shard.id}: {e}")
+            try:
+                fila.liberar(shard, f"{type(e).__name__}: {e}")
+            except LeasePerdido:
+                pass
+
+
+def mesclar_shards(fila: FilaJobs) -> pd.DataFrame:
+    """Junta os checkpoints dos shards: a última versão de cada música, ordenada por ``indice``.
+
+    Os checkpoints de um shard são lidos na ordem dos leases, então o
+    resultado de um lease mais novo prevalece.
+    """
+    partes = [CheckpointStore(path).para_dataframe(incluir_impressao=True) for path in fila.checkpoints()]
+    partes = [parte for parte in partes if not parte.empty]
+    if not partes:
+        return pd.DataFrame(columns=[*COLUNAS_RESULTADO, *COLUNAS_IMPRESSAO])
+    df = pd.concat(partes, ignore_index=True)
+    return df.drop_duplicates(subset="indice", keep="last").sort_values("indice").reset_index(drop=True)
+
+
+def _criar_analyzer(args: argparse.Namespace) -> OllamaAnalyzer:
+    analyzer = OllamaAnalyzer(
+        model=args.modelo,
+        reutilizar_contexto=args.reutilizar_contexto,
+        orcamento_exemplos=args.orcamento_exemplos or None,
+        cache=None if args.sem_cache else CacheRespostas(args.cache),
+        modo_estruturado=args.estruturado,
+        pool=PoolEndpoints([h.strip() for h in args.hosts.split(",") if h.strip()]) if args.hosts else None,
+        tamanho_lote=args.tamanho_lote,
+        normalizar_letras=not args.letra_bruta,
+        max_tokens_letra=args.max_tokens_letra,
+        agendador=Agendador(
+            limitador=LimitadorAIMD(maximo=args.concorrencia) if args.concorrencia > 1 else None,
+            orcamento=OrcamentoRetries(proporcao=0.5),
+        ),
+        modelo_triagem=args.modelo_triagem,
+        limiar_confianca=args.limiar_confianca,
+        taxa_calibracao=args.taxa_calibracao,
+    )
+    carregar_exemplos_manuais(analyzer, args.exemplos)
+    return analyzer
+
+
+def _executar_processo(args: argparse.Namespace, numero: int) -> int:
+    """Um processo worker (também usado com ``--processos 1``, no processo principal)."""
+    logging.basicConfig(level="INFO", format="%(asctime)s %(levelname)s %(message)s")
+    worker = args.worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    if args.processos > 1 and args.worker_id:
+        worker = f"{args.worker_id}-{numero}"
+    fila = FilaJobs(args.fila)
+    try:
+        prompt = Path(args.prompt).read_text(encoding="utf-8") if args.prompt else PROMPT_CLASSIFICACAO
+        return executar_worker(
+            fila,
+            _criar_analyzer(args),
+            worker,
+            concorrencia=args.concorrencia,
+            lease_s=args.lease,
+            pre_filtro=PreFiltro.carregar(args.pre_filtro, limiar=args.limiar_pre_filtro) if args.pre_filtro else None,
+            prompt=prompt,
+            esperar=not args.sem_esperar,
+        )
+    finally:
+        fila.fechar()
+
+
+def _imprimir_estado(fila: FilaJobs) -> None:
+    resumo = fila.resumo()
+    config = fila.config()
+    print(f"\n📋 Fila {fila.path}: {config.get('dataset')} ({config.get('total')} músicas, estratégia {config.get('estrategia')})")
+    print(f"→ Shards: {resumo['shards']}")
+    for estado, count in resumo["estados"].items():
+        print(f"   • {estado}: {count}")
+    print(f"→ Músicas classificadas nos shards concluídos: {resumo['classificadas']}")
+    if resumo["leases_expirados"]:
+        print(f"→ Leases expirados (serão reivindicados): {resumo['leases_expirados']}")
+    for worker, count in resumo["workers_ativos"].items():
+        print(f"→ Worker ativo {worker}: {count} shard(s)")
+    for shard_id, erro in resumo["falhas"]:
+        print(f"❌ Shard {shard_id}: {erro}")
+
+
+def _mesclar(args: argparse.Namespace, fila: FilaJobs) -> None:
+    if not fila.terminou() and not args.parcial:
+        _imprimir_estado(fila)
+        print("\n⚠️ Ainda há shards pendentes ou em andamento; use --parcial para mesclar assim mesmo.")
+        return
+
+    resultados_df = mesclar_shards(fila)
+    if resultados_df.empty:
+        print("Nenhum resultado nos checkpoints dos shards.")
+        return
+    impressoes = resultados_df["impressao"].dropna().unique() if "impressao" in resultados_df.columns else []
+    if len(impressoes) > 1:
+        print(f"⚠️ Os shards foram classificados com {len(impressoes)} configurações diferentes (ver planejador.py)")
+
+    base_path = args.saida or f"results/relacionamentos_toxicos_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    Path(base_path).parent.mkdir(parents=True, exist_ok=True)
+    formato = args.formato
+    if formato != "csv" and not pyarrow_disponivel():
+        print("⚠️ pyarrow não está instalado: resultados salvos em CSV/JSON")
+        formato = "csv"
+    csv_path, json_path = f"{base_path}.csv", f"{base_path}.json"
+    if formato == "csv":
+        resultados_path = csv_path
+        exportar_dataframe(resultados_df[[c for c in COLUNAS_RESULTADO if c in resultados_df.columns]], csv_path, json_path)
+        salvos = [f"→ CSV: {csv_path}", f"→ JSON: {json_path}"]
+    else:
+        resultados_path = f"{base_path}.{formato}"
+        salvar_resultados(resultados_df, resultados_path)
+        exportar_visoes(resultados_path, csv_path, json_path)
+        salvos = [f"→ {formato.capitalize()}: {resultados_path}", f"→ CSV: {csv_path}", f"→ JSON: {json_path}"]
+
+    agregados_path = salvar_agregados(agregar(resultados_df.drop(columns=COLUNAS_IMPRESSAO, errors="ignore")), resultados_path)
+    total = int(fila.config().get("total", 0))
+    print(f"\n✅ {len(resultados_df)} de {total} músicas mescladas de {len(fila.checkpoints())} checkpoints")
+    print("Resultados salvos em:\n" + "\n".join(salvos))
+    print(f"→ Agregados: {agregados_path}")
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Fila de jobs (SQLite) para classificar o corpus em shards com vários workers."
+    )
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    criar = comandos.add_parser("criar", help="Divide o dataset em shards.")
+    criar.add_argument("fila", help="Arquivo SQLite da fila.")
+    criar.add_argument("--dataset", default="../data/all_songs_data.csv", help="Dataset a classificar (CSV, JSONL ou Parquet).")
+    criar.add_argument("--estrategia", default="intervalo", choices=ESTRATEGIAS, help="Divisão por faixa de linhas ou por hash da letra.")
+    criar.add_argument("--tamanho-shard", type=int, default=500, help="Músicas por shard.")
+    criar.add_argument("--num-shards", type=int, default=None, help="Número de shards (tem prioridade sobre --tamanho-shard).")
+    criar.add_argument("--max-tentativas", type=int, default=3, help="Reivindicações de um shard antes de marcá-lo como falho.")
+    criar.add_argument("--tamanho-bloco", type=int, default=1000, help="Linhas lidas do dataset por vez.")
+
+    worker = comandos.add_parser("worker", help="Reivindica e classifica shards até a fila acabar.")
+    worker.add_argument("fila", help="Arquivo SQLite da fila.")
+    worker.add_argument("--processos", type=int, default=1, help="Processos worker nesta máquina.")
+    worker.add_argument("--worker-id", default=None, help="Nome do worker (padrão: máquina:pid).")
+    worker.add_argument("--lease", type=float, default=600.0, help="Duração (s) do lease; renovado a cada terço.")
+    worker.add_argument("--sem-esperar", action="store_true", help="Sai quando não há shard a reivindicar, sem esperar os em andamento.")
+    worker.add_argument("--modelo", default="mistral:instruct", help="Modelo do Ollama.")
+    worker.add_argument("--modelo-triagem", default=None, help="Modelo menor para a cascata (ver cascata.py).")
+    worker.add_argument("--limiar-confianca", type=float, default=0.8, help="Confiança mínima no nível para aceitar a triagem.")
+    worker.add_argument("--taxa-calibracao", type=float, default=0.05, help="Fração das músicas aceitas na triagem revistas pelo modelo principal.")
+    worker.add_argument("--prompt", default=None, help="Arquivo de texto com o prompt (padrão: PROMPT_CLASSIFICACAO).")
+    worker.add_argument("--exemplos", default=EXEMPLOS_PADRAO, help="CSV com os exemplos de classificação manual.")
+    worker.add_argument("--orcamento-exemplos", type=int, default=3000, help="Máximo de tokens de exemplos por música (0 envia todos).")
+    worker.add_argument("--estruturado", action="store_true", help="Restringe a resposta a um esquema JSON.")
+    worker.add_argument("--tamanho-lote", type=int, default=1, help="Máximo de músicas por chamada ao modelo.")
+    worker.add_argument("--letra-bruta", action="store_true", help="Não normaliza as letras antes do prompt.")
+    worker.add_argument("--max-tokens-letra", type=int, default=None, help="Tokens máximos de letra por chamada; letras maiores viram janelas.")
+    worker.add_argument("--reutilizar-contexto", action="store_true", help="Reaproveita o contexto do prefixo (instruções + exemplos) em cada música.")
+    worker.add_argument("-c", "--concorrencia", type=int, default=1, help="Músicas (ou lotes) em processamento simultâneo por processo.")
+    worker.add_argument("--hosts", default=None, help="Servidores Ollama separados por vírgula.")
+    worker.add_argument("--pre-filtro", default=None, help="Modelo do pré-filtro (gerado por pre_filtro.py).")
+    worker.add_argument("--limiar-pre-filtro", type=float, default=None, help="Probabilidade mínima de 'na' para pular o LLM (padrão: o do modelo).")
+    worker.add_argument("--cache", default="results/cache_respostas.sqlite", help="Arquivo SQLite do cache de respostas.")
+    worker.add_argument("--sem-cache", action="store_true", help="Ignora o cache de respostas.")
+
+    estado = comandos.add_parser("estado", help="Mostra o andamento dos shards.")
+    estado.add_argument("fila", help="Arquivo SQLite da fila.")
+    estado.add_argument("--reabrir-falhas", action="store_true", help="Volta os shards falhos para a fila.")
+
+    mesclar = comandos.add_parser("mesclar", help="Junta os resultados dos shards no CSV/JSON final.")
+    mesclar.add_argument("fila", help="Arquivo SQLite da fila.")
+    mesclar.add_argument("--saida", default=None, help="Caminho dos arquivos finais, sem extensão (padrão: results/relacionamentos_toxicos_<data>).")
+    mesclar.add_argument(
+        "--formato",
+        default="csv",
+        choices=["csv", "parquet", "feather"],
+        help="Formato principal; parquet e feather também geram as visões CSV/JSON.",
+    )
+    mesclar.add_argument("--parcial", action="store_true", help="Mescla mesmo com shards pendentes ou em andamento.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    logging.basicConfig(level="INFO", format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.comando == "worker":
+        if args.processos <= 1:
+            concluidos = _executar_processo(args, 0)
+            print(f"\n✅ Worker terminou: {concluidos} shards concluídos")
+            return
+        # "spawn": cada processo cria as próprias conexões (SQLite, HTTP)
+        contexto = multiprocessing.get_context("spawn")
+        processos = [contexto.Process(target=_executar_processo, args=(args, i)) for i in range(args.processos)]
+        for processo in processos:
+            processo.start()
+        for processo in processos:
+            processo.join()
+        print(f"\n✅ {args.processos} workers terminaram")
+        _imprimir_estado(FilaJobs(args.fila))
+        return
+
+    fila = FilaJobs(args.fila)
+    try:
+        if args.comando == "criar":
+            num_shards = fila.criar(
+                args.dataset,
+                tamanho_shard=args.tamanho_shard,
+                num_shards=args.num_shards,
+                estrategia=args.estrategia,
+                max_tentativas=args.max_tentativas,
+                tamanho_bloco=args.tamanho_bloco,
+            )
+            print(f"✅ Fila {args.fila}: {num_shards} shards")
+            _imprimir_estado(fila)
+        elif args.comando == "estado":
+            if args.reabrir_falhas:
+                print(f"↩️ {fila.reabrir_falhas()} shards falhos de volta à fila")
+            _imprimir_estado(fila)
+        elif args.comando == "mesclar":
+            _mesclar(args, fila)
+    finally:
+        fila.fechar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""Formato colunar (Parquet/Feather) dos resultados da classificação.
+
+Os resultados são gravados com tipos compactos: ``artista``,
+``nivel_toxicidade``, ``origem`` e ``justificativa`` com codificação por
+dicionário (cada texto repetido é guardado uma vez), as cinco flags como
+colunas booleanas (1 bit por música), ``ano`` como ``int16`` e o
+``hash_letra`` de cada música, que identifica letras repetidas, além da
+``impressao`` da configuração que gerou cada resultado.
+
+Parquet (com zstd) é o formato de arquivo; Feather sem compressão pode ser
+lido com memory map, sem copiar as colunas para a memória. O carregador lê só
+as colunas pedidas. CSV e JSON continuam disponíveis como visões geradas a
+partir do arquivo colunar (``exportar_visoes``).
+
+Requer ``pyarrow``. Para converter resultados antigos e comparar tamanho e
+tempo de leitura:
+
+    python formato_colunar.py results/relacionamentos_toxicos_20250615_031911.json \
+        --saida results/relacionamentos_toxicos_20250615_031911.parquet
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import pandas as pd
+
+from checkpoint_store import COLUNAS_IMPRESSAO, COLUNAS_RESULTADO, _json_default
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - dependência opcional
+    pa = None
+
+COLUNAS_COLUNAR = [*COLUNAS_RESULTADO, *COLUNAS_IMPRESSAO]
+
+FORMATOS = {
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+}
+
+
+def pyarrow_disponivel() -> bool:
+    """``True`` se o ``pyarrow`` estiver instalado."""
+    return pa is not None
+
+
+def _exigir_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("O formato colunar requer o pacote 'pyarrow' (pip install pyarrow)")
+
+
+def esquema():
+    """Esquema Arrow dos resultados."""
+    _exigir_pyarrow()
+    texto_repetido = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ("indice", pa.int64()),
+        ("titulo", pa.string()),
+        ("artista", texto_repetido),
+        ("ano", pa.int16()),
+        ("nivel_toxicidade", pa.dictionary(pa.int8(), pa.string())),
+        ("abuso_emocional", pa.bool_()),
+        ("ciume_possessividade", pa.bool_()),
+        ("dependencia", pa.bool_()),
+        ("objetificacao", pa.bool_()),
+        ("violencia_traicao", pa.bool_()),
+        ("justificativa", texto_repetido),
+        ("origem", pa.dictionary(pa.int8(), pa.string())),
+        ("hash_letra", pa.string()),
+        ("impressao", texto_repetido),
+    ])
+
+
+def detectar_formato(path: str | Path) -> str:
+    sufixo = Path(path).suffix.lower()
+    if sufixo not in FORMATOS:
+        raise ValueError(f"Extensão não suportada: {sufixo}. Use uma de: {', '.join(FORMATOS)}")
+    return FORMATOS[sufixo]
+
+
+def para_tabela(df: pd.DataFrame):
+    """Converte um DataFrame de resultados para uma tabela Arrow com o ``esquema()``.
+
+    Colunas ausentes (por exemplo ``hash_letra`` e ``impressao`` em
+    resultados antigos ou ``origem`` antes do pré-filtro) ficam nulas.
+    """
+    _exigir_pyarrow()
+    schema = esquema()
+    colunas = []
+    for campo in schema:
+        if campo.name not in df.columns:
+            colunas.append(pa.nulls(len(df), type=campo.type))
+            continue
+        serie = df[campo.name]
+        if campo.name == "ano":
+            serie = pd.to_numeric(serie, errors="coerce").round().astype("Int16")
+        elif pa.types.is_boolean(campo.type) and serie.dtype != bool:
+            serie = serie.astype(str).str.strip().str.lower().isin(("true", "1", "1.0"))
+        elif pa.types.is_dictionary(campo.type) or pa.types.is_string(campo.type):
+            serie = serie.astype("string")
+        colunas.append(pa.array(serie, from_pandas=True).cast(campo.type))
+    return pa.Table.from_arrays(colunas, schema=schema)
+
+
+def salvar_resultados(
+    df: pd.DataFrame,
+    path: str | Path,
+    formato: Optional[str] = None,
+    compressao: Optional[str] = None,
+) -> Path:
+    """Grava os resultados em Parquet ou Feather (detectado pela extensão).
+
+    Por padrão Parquet usa zstd e Feather fica sem compressão, para poder ser
+    lido com memory map.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    formato = formato or detectar_formato(path)
+    tabela = para_tabela(df)
+    temporario = path.with_name(path.name + ".tmp")
+    if formato == "parquet":
+        pq.write_table(tabela, temporario, compression=compressao or "zstd", use_dictionary=True)
+    else:
+        feather.write_feather(tabela, temporario, compression=compressao or "uncompressed")
+    temporario.replace(path)
+    return path
+
+
+def ler_tabela(
+    path: str | Path,
+    colunas: Optional[Sequence[str]] = None,
+    memory_map: bool = True,
+):
+    """Lê o arquivo como tabela Arrow, só com as ``colunas`` pedidas.
+
+    Com ``memory_map`` um Feather sem compressão é mapeado direto do disco:
+    as colunas só são lidas quando usadas.
+    """
+    _exigir_pyarrow()
+    colunas = list(colunas) if colunas is not None else None
+    if detectar_formato(path) == "parquet":
+        return pq.read_table(path, columns=colunas, memory_map=memory_map)
+    return feather.read_table(path, columns=colunas, memory_map=memory_map)
+
+
+def ler_em_blocos(
+    path: str | Path,
+    tamanho_bloco: int = 50_000,
+    colunas: Optional[Sequence[str]] = None,
+) -> Iterator[pd.DataFrame]:
+    """Lê o arquivo em blocos de até ``tamanho_bloco`` linhas.
+
+    Parquet é lido por lotes, sem carregar o arquivo inteiro; Feather é
+    mapeado em memória e fatiado. ``colunas`` ausentes no arquivo são
+    ignoradas.
+    """
+    _exigir_pyarrow()
+    if detectar_formato(path) == "parquet":
+        arquivo = pq.ParquetFile(path, memory_map=True)
+        if colunas is not None:
+            colunas = [c for c in colunas if c in arquivo.schema_arrow.names]
+        lotes = arquivo.iter_batches(batch_size=tamanho_bloco, columns=colunas)
+    else:
+        tabela = ler_tabela(path)
+        if colunas is not None:
+            tabela = tabela.select([c for c in colunas if c in tabela.column_names])
+        lotes = tabela.to_batches(max_chunksize=tamanho_bloco)
+    for lote in lotes:
+        yield lote.to_pandas()
+
+
+def carregar_resultados(
+    path: str | Path,
+    colunas: Optional[Sequence[str]] = None,
+    memory_map: bool = True,
+    letras_unicas: bool = False,
+) -> pd.DataFrame:
+    """Carrega os resultados em um DataFrame.
+
+    As colunas com dicionário viram ``category`` no pandas. Com
+    ``letras_unicas`` fica só a primeira música de cada ``hash_letra`` (letras
+    repetidas no corpus, como regravações, aparecem uma vez).
+    """
+    extras = ["hash_letra"] if letras_unicas and colunas is not None and "hash_letra" not in colunas else []
+    tabela = ler_tabela(path, [*colunas, *extras] if colunas is not None else None, memory_map)
+    df = tabela.to_pandas()
+    if letras_unicas:
+        df = df[df["hash_letra"].isna() | ~df["hash_letra"].duplicated()]
+        df = df.drop(columns=extras).reset_index(drop=True)
+    return df
+
+
+def exportar_visoes(
+    path: str | Path,
+    csv_path: Optional[str | Path] = None,
+    json_path: Optional[str | Path] = None,
+) -> List[Path]:
+    """Gera as visões CSV e/ou JSON (mesmas colunas de antes) a partir do arquivo colunar."""
+    df = carregar_resultados(path, colunas=COLUNAS_RESULTADO)
+    for coluna in df.select_dtypes("category").columns:
+        df[coluna] = df[coluna].astype(object)
+    # Sem ``ano`` o int16 nulo viraria float: mantém o mesmo formato do CSV antigo
+    df["ano"] = df["ano"].astype("float64")
+    return [gravar_arquivo_resultados(df, visao) for visao in (csv_path, json_path) if visao is not None]
+
+
+def ler_arquivo_resultados(path: str | Path) -> pd.DataFrame:
+    """Lê um arquivo de resultados inteiro (CSV, JSON, JSONL, Parquet ou Feather)."""
+    path = Path(path)
+    sufixo = path.suffix.lower()
+    if sufixo == ".json":
+        return pd.read_json(path, orient="records")
+    if sufixo in (".jsonl", ".ndjson"):
+        return pd.read_json(path, lines=True)
+    if sufixo in FORMATOS:
+        return carregar_resultados(path)
+    return pd.read_csv(path, keep_default_na=False, na_values=[""])
+
+
+def gravar_arquivo_resultados(df: pd.DataFrame, path: str | Path) -> Path:
+    """Grava ``df`` no formato indicado pela extensão de ``path``.
+
+    Parquet e Feather seguem o ``esquema()``; CSV e JSON mantêm todas as
+    colunas de ``df`` (inclusive ``hash_letra`` e ``impressao``, se houver).
+    """
+    path = Path(path)
+    sufixo = path.suffix.lower()
+    if sufixo in FORMATOS:
+        return salvar_resultados(df, path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporario = path.with_name(path.name + ".tmp")
+    if sufixo in (".json", ".jsonl", ".ndjson"):
+        registros = df.astype(object).where(df.notna(), None).to_dict(orient="records")
+        with open(temporario, "w", encoding="utf-8") as f:
+            if sufixo == ".json":
+                json.dump(registros, f, ensure_ascii=False, indent=2, default=_json_default)
+            else:
+                for registro in registros:
+                    f.write(json.dumps(registro, ensure_ascii=False, default=_json_default) + "\n")
+    else:
+        df.to_csv(temporario, index=False)
+    temporario.replace(path)
+    return path
+
+
+def _medir_leitura(funcao) -> float:
+    inicio = time.perf_counter()
+    funcao()
+    return time.perf_counter() - inicio
+
+
+def comparar_formatos(origem: Path, destino: Path) -> Dict[str, Any]:
+    """Tamanho em disco e tempo de leitura do arquivo original e do colunar."""
+    tempo_origem = _medir_leitura(lambda: ler_arquivo_resultados(origem))
+    tempo_destino = _medir_leitura(lambda: carregar_resultados(destino))
+    tempo_podado = _medir_leitura(lambda: carregar_resultados(destino, colunas=["ano", "nivel_toxicidade"]))
+    return {
+        "origem_mb": round(origem.stat().st_size / 1e6, 3),
+        "colunar_mb": round(destino.stat().st_size / 1e6, 3),
+        "leitura_origem_s": round(tempo_origem, 4),
+        "leitura_colunar_s": round(tempo_destino, 4),
+        "leitura_duas_colunas_s": round(tempo_podado, 4),
+    }
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Converte resultados (CSV, JSON ou JSONL) para Parquet/Feather e gera visões CSV/JSON."
+    )
+    parser.add_argument("resultados", help="Arquivo de resultados de origem.")
+    parser.add_argument("--saida", required=True, help="Arquivo colunar de destino (.parquet ou .feather).")
+    parser.add_argument(
+        "--letras",
+        default=None,
+        help="Dataset com as letras, para preencher o hash_letra de resultados antigos (junção por indice).",
+    )
+    parser.add_argument("--csv", default=None, help="Também gera a visão CSV neste caminho.")
+    parser.add_argument("--json", default=None, help="Também gera a visão JSON neste caminho.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    origem = Path(args.resultados)
+    df = ler_arquivo_resultados(origem)
+
+    if args.letras and "hash_letra" not in df.columns:
+        from ingestao import ler_musicas
+        from letras import hash_letra
+
+        hashes = {m.indice: hash_letra(m.letra) for m in ler_musicas(args.letras)}
+        df["hash_letra"] = df["indice"].map(hashes)
+
+    destino = salvar_resultados(df, args.saida)
+    print(f"✅ Resultados salvos em: {destino}")
+    for visao in exportar_visoes(destino, args.csv, args.json):
+        print(f"→ Visão gerada: {visao}")
+
+    comparacao = comparar_formatos(origem, destino)
+    print(f"\nTamanho: {comparacao['origem_mb']} MB → {comparacao['colunar_mb']} MB")
+    print(
+        f"Leitura: {comparacao['leitura_origem_s']}s → {comparacao['leitura_colunar_s']}s "
+        f"({comparacao['leitura_duas_colunas_s']}s lendo só ano e nivel_toxicidade)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Índice de similaridade para escolher os exemplos manuais de cada música.
+
+Os vetores TF-IDF dos exemplos são calculados uma única vez (com hashing de
+unigramas e bigramas, sem vocabulário), e para cada letra são escolhidos os
+exemplos mais parecidos que cabem no orçamento de tokens, cobrindo os níveis
+de toxicidade de forma equilibrada.
+"""
+
+import zlib
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from letras import estimar_tokens, tokenizar
+
+# Ordem usada para desempatar níveis com a mesma similaridade
+NIVEIS_TOXICIDADE = ['na', 'muito baixo', 'baixo', 'moderado', 'alto', 'muito alto']
+
+
+def formatar_exemplo(exemplo: Dict[str, Any]) -> str:
+    """Formata um exemplo manual do jeito que ele entra no prompt."""
+    texto = "\n---\nEXEMPLO DE CLASSIFICAÇÃO:\n"
+    texto += f"Letra:\n{exemplo['letra']}\n\n"
+    texto += f"Nivel de toxicidade: {exemplo['score']}\n"
+    texto += f"Justificativa: {exemplo['justificativa']}\n"
+    texto += "---\n"
+    return texto
+
+
+class IndiceExemplos:
+    """Seleciona os exemplos manuais mais relevantes para uma letra."""
+
+    def __init__(self, exemplos: Sequence[Dict[str, Any]], dimensoes: int = 2 ** 14):
+        self.exemplos = list(exemplos)
+        self.dimensoes = dimensoes
+        self.textos = [formatar_exemplo(e) for e in self.exemplos]
+        self.custos = np.array([estimar_tokens(t) for t in self.textos], dtype=np.int64)
+        self.niveis = [str(e['score']).strip().lower() for e in self.exemplos]
+
+        contagens = np.zeros((len(self.exemplos), dimensoes), dtype=np.float32)
+        for i, exemplo in enumerate(self.exemplos):
+            for coluna, valor in self._termos(exemplo['letra']).items():
+                contagens[i, coluna] = valor
+
+        # IDF suavizado calculado sobre os próprios exemplos
+        df = (contagens > 0).sum(axis=0)
+        self.idf = (np.log((1 + len(self.exemplos)) / (1 + df)) + 1).astype(np.float32)
+        self.matriz = self._normalizar(contagens * self.idf)
+
+    def _termos(self, texto: str) -> Dict[int, float]:
+        """Conta unigramas e bigramas, mapeados para colunas por hashing."""
+        palavras = tokenizar(texto)
+        termos = palavras + [f"{a} {b}" for a, b in zip(palavras, palavras[1:])]
+        contagens: Dict[int, float] = {}
+        for termo in termos:
+            coluna = zlib.crc32(termo.encode('utf-8')) % self.dimensoes
+            contagens[coluna] = contagens.get(coluna, 0.0) + 1.0
+        # TF sublinear para que refrões repetidos não dominem o vetor
+        return {c: 1.0 + np.log(v) for c, v in contagens.items()}
+
+    @staticmethod
+    def _normalizar(matriz: np.ndarray) -> np.ndarray:
+        normas = np.linalg.norm(matriz, axis=-1, keepdims=True)
+        normas[normas == 0] = 1.0
+        return matriz / normas
+
+    def vetorizar(self, texto: str) -> np.ndarray:
+        vetor = np.zeros(self.dimensoes, dtype=np.float32)
+        for coluna, valor in self._termos(texto).items():
+            vetor[coluna] = valor
+        return self._normalizar(vetor * self.idf)
+
+    def similaridades(self, texto: str) -> np.ndarray:
+        """Similaridade de cosseno entre ``texto`` e cada exemplo."""
+        if not self.exemplos:
+            return np.zeros(0, dtype=np.float32)
+        return self.matriz @ self.vetorizar(texto)
+
+    def selecionar(self, texto: str, orcamento_tokens: int) -> List[Dict[str, Any]]:
+        """Escolhe os exemplos para ``texto`` sem ultrapassar ``orcamento_tokens``.
+
+        A seleção é feita em rodadas: em cada rodada entra o exemplo mais
+        parecido de cada nível ainda disponível (níveis com maior similaridade
+        primeiro), de modo que um único nível não ocupe todo o orçamento.
+        """
+        if orcamento_tokens <= 0 or not self.exemplos:
+            return []
+
+        sims = self.similaridades(texto)
+        por_nivel: Dict[str, List[int]] = {}
+        for i in np.argsort(-sims, kind='stable'):
+            por_nivel.setdefault(self.niveis[i], []).append(int(i))
+
+        escolhidos: List[int] = []
+        restante = orcamento_tokens
+        while por_nivel:
+            ordem = sorted(
+                por_nivel,
+                key=lambda n: (-sims[por_nivel[n][0]],
+                               NIVEIS_TOXICIDADE.index(n) if n in NIVEIS_TOXICIDADE else len(NIVEIS_TOXICIDADE)),
+            )
+            adicionou = False
+            for nivel in ordem:
+                fila = por_nivel[nivel]
+                # Pula exemplos que não cabem, mas tenta os menores do mesmo nível
+                while fila and self.custos[fila[0]] > restante:
+                    fila.pop(0)
+                if fila:
+                    i = fila.pop(0)
+                    escolhidos.append(i)
+                    restante -= int(self.custos[i])
+                    adicionou = True
+                if not fila:
+                    del por_nivel[nivel]
+            if not adicionou:
+                break
+
+        # Mantém no prompt a ordem de relevância
+        escolhidos.sort(key=lambda i: -sims[i])
+        return [self.exemplos[i] for i in escolhidos]
@@ -0,0 +1,125 @@
+"""Leitura em fluxo das músicas a classificar.
+
+Em vez de carregar o dataset inteiro (com URLs, compositores, mídia...), lê
+apenas as colunas usadas pela análise, em blocos, e entrega registros leves
+(``Musica``) um a um. O uso de memória depende do tamanho do bloco, não do
+tamanho do corpus. Aceita CSV, JSONL e Parquet (este último requer
+``pyarrow``).
+"""
+
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+import pandas as pd
+
+# Colunas do dataset original (Genius / Kaggle) usadas pela análise
+COLUNA_TITULO = 'Song Title'
+COLUNA_ARTISTA = 'Artist'
+COLUNA_LETRA = 'Lyrics'
+COLUNA_ANO = 'Year'
+COLUNAS_ORIGEM = [COLUNA_TITULO, COLUNA_ARTISTA, COLUNA_LETRA, COLUNA_ANO]
+
+
+class Musica(NamedTuple):
+    indice: int
+    titulo: str
+    artista: str
+    letra: str
+    ano: Optional[float]
+
+
+def _musicas_do_bloco(bloco: pd.DataFrame, inicio: int) -> Iterator[Musica]:
+    anos = bloco[COLUNA_ANO] if COLUNA_ANO in bloco.columns else [None] * len(bloco)
+    for deslocamento, (titulo, artista, letra, ano) in enumerate(
+        zip(bloco[COLUNA_TITULO], bloco[COLUNA_ARTISTA], bloco[COLUNA_LETRA], anos)
+    ):
+        yield Musica(
+            indice=inicio + deslocamento,
+            titulo=titulo,
+            artista=artista,
+            letra=letra if isinstance(letra, str) else "",
+            ano=None if ano is None or pd.isna(ano) else float(ano),
+        )
+
+
+def musicas_de_dataframe(df: pd.DataFrame) -> Iterator[Musica]:
+    """Converte um DataFrame já carregado em registros ``Musica`` (índice = rótulo da linha)."""
+    anos = df[COLUNA_ANO] if COLUNA_ANO in df.columns else [None] * len(df)
+    for indice, titulo, artista, letra, ano in zip(
+        df.index, df[COLUNA_TITULO], df[COLUNA_ARTISTA], df[COLUNA_LETRA], anos
+    ):
+        yield Musica(
+            indice=int(indice),
+            titulo=titulo,
+            artista=artista,
+            letra=letra if isinstance(letra, str) else "",
+            ano=None if ano is None or pd.isna(ano) else float(ano),
+        )
+
+
+def _blocos_csv(path: Path, tamanho_bloco: int) -> Iterable[pd.DataFrame]:
+    return pd.read_csv(
+        path,
+        usecols=lambda coluna: coluna in COLUNAS_ORIGEM,
+        chunksize=tamanho_bloco,
+    )
+
+
+def _blocos_jsonl(path: Path, tamanho_bloco: int) -> Iterator[pd.DataFrame]:
+    for bloco in pd.read_json(path, lines=True, chunksize=tamanho_bloco):
+        yield bloco[[c for c in COLUNAS_ORIGEM if c in bloco.columns]]
+
+
+def _blocos_parquet(path: Path, tamanho_bloco: int) -> Iterator[pd.DataFrame]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Leitura de Parquet requer o pacote 'pyarrow' (pip install pyarrow)") from e
+
+    arquivo = pq.ParquetFile(path)
+    colunas = [c for c in COLUNAS_ORIGEM if c in arquivo.schema_arrow.names]
+    for lote in arquivo.iter_batches(batch_size=tamanho_bloco, columns=colunas):
+        yield lote.to_pandas()
+
+
+LEITORES = {
+    "csv": _blocos_csv,
+    "jsonl": _blocos_jsonl,
+    "parquet": _blocos_parquet,
+}
+
+
+def detectar_formato(path: str | Path) -> str:
+    sufixo = Path(path).suffix.lower()
+    if sufixo in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if sufixo in (".parquet", ".pq"):
+        return "parquet"
+    return "csv"
+
+
+def ler_musicas(
+    path: str | Path,
+    tamanho_bloco: int = 1000,
+    formato: Optional[str] = None,
+) -> Iterator[Musica]:
+    """Lê o dataset em blocos e devolve as músicas uma a uma.
+
+    ``indice`` é a posição da linha no arquivo, o mesmo valor que o índice
+    padrão do DataFrame teria se o arquivo fosse carregado inteiro.
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Dataset não encontrado: {path}")
+
+    formato = formato or detectar_formato(path)
+    if formato not in LEITORES:
+        raise ValueError(f"Formato não suportado: {formato}. Use um de: {', '.join(LEITORES)}")
+
+    inicio = 0
+    for bloco in LEITORES[formato](path, tamanho_bloco):
+        faltando = [c for c in (COLUNA_TITULO, COLUNA_ARTISTA, COLUNA_LETRA) if c not in bloco.columns]
+        if faltando:
+            raise KeyError(f"Colunas obrigatórias ausentes em {path}: {faltando}")
+        yield from _musicas_do_bloco(bloco, inicio)
+        inicio += len(bloco)
@@ -0,0 +1,86 @@
+"""Funções utilitárias para o tratamento das letras das músicas."""
+
+import hashlib
+import math
+import re
+from typing import List
+
+# Média aproximada de caracteres por token nos tokenizadores dos modelos
+# usados (letras em inglês e prompt em português).
+CARACTERES_POR_TOKEN = 3.5
+
+_RE_PALAVRA = re.compile(r"[a-zà-öø-ÿ0-9']+")
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estima quantos tokens o modelo vai consumir para ``texto``."""
+    if not texto:
+        return 0
+    return math.ceil(len(texto) / CARACTERES_POR_TOKEN)
+
+
+def tokenizar(texto: str) -> List[str]:
+    """Quebra o texto em palavras minúsculas (mantém acentos e apóstrofos)."""
+    return _RE_PALAVRA.findall(str(texto).lower())
+
+
+def hash_letra(texto: str) -> str:
+    """Hash estável da letra (ignora diferenças de espaços e de caixa)."""
+    normalizado = " ".join(str(texto).split()).lower()
+    return hashlib.sha256(normalizado.encode("utf-8")).hexdigest()[:16]
+
+
+# Marcadores de seção do Genius ({Intro}, [Verse 1], [Chorus ]...) e linhas em
+# branco separam as estrofes
+_RE_SECAO = re.compile(r"\{[^{}\n]{0,80}\}|\[[^\[\]\n]{0,80}\]|\n\s*\n")
+_RE_PEDACO = re.compile(r"\S+\s*")
+
+
+def normalizar_letra(texto: str) -> str:
+    """Remove da letra o que só gasta tokens sem mudar a classificação.
+
+    Tira os marcadores de seção, junta espaços repetidos, mantém só a primeira
+    ocorrência de cada estrofe repetida (o refrão aparece uma vez) e remove
+    linhas repetidas em sequência. As estrofes ficam separadas por uma linha
+    em branco.
+    """
+    estrofes: List[str] = []
+    vistas = set()
+    for secao in _RE_SECAO.split(str(texto or "")):
+        linhas: List[str] = []
+        for linha in secao.splitlines():
+            linha = " ".join(linha.split())
+            if linha and (not linhas or linha.lower() != linhas[-1].lower()):
+                linhas.append(linha)
+        chave = " ".join(linhas).lower()
+        if not chave or chave in vistas:
+            continue
+        vistas.add(chave)
+        estrofes.append("\n".join(linhas))
+    return "\n\n".join(estrofes)
+
+
+def dividir_em_janelas(texto: str, max_tokens: int, sobreposicao: float = 0.15) -> List[str]:
+    """Divide o texto em janelas de até ``max_tokens`` (estimados).
+
+    Janelas consecutivas repetem a fração ``sobreposicao`` das palavras do fim
+    da anterior, para que um verso cortado no limite apareça inteiro em uma
+    delas. Um texto que cabe em ``max_tokens`` volta como janela única.
+    """
+    if estimar_tokens(texto) <= max_tokens:
+        return [texto]
+
+    limite = max(int(max_tokens * CARACTERES_POR_TOKEN), 1)
+    pedacos = _RE_PEDACO.findall(texto)
+    janelas = []
+    inicio = 0
+    while inicio < len(pedacos):
+        fim, tamanho = inicio, 0
+        while fim < len(pedacos) and (fim == inicio or tamanho + len(pedacos[fim]) <= limite):
+            tamanho += len(pedacos[fim])
+            fim += 1
+        janelas.append("".join(pedacos[inicio:fim]).strip())
+        if fim >= len(pedacos):
+            break
+        inicio = max(fim - int((fim - inicio) * sobreposicao), inicio + 1)
+    return janelas
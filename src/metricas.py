@@ -0,0 +1,163 @@
+"""Instrumentação por etapa das chamadas ao modelo.
+
+Para cada música é registrado o tempo gasto em cada etapa (montagem do
+prompt, requisição, parse, validação), o número de tentativas e as
+contagens/durações devolvidas pelo Ollama (``prompt_eval_count``,
+``eval_count``, ``prompt_eval_duration``, ``eval_duration``). As métricas
+são gravadas em JSONL durante a execução e resumidas no final (p50/p95 de
+latência, tokens/s, tentativas por música, taxa de falha).
+"""
+
+import json
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+
+CAMPOS_OLLAMA = ("prompt_eval_count", "eval_count", "prompt_eval_duration", "eval_duration")
+
+
+class MetricasMusica:
+    """Métricas acumuladas de uma música (somadas entre as tentativas)."""
+
+    def __init__(self, indice: Optional[int] = None):
+        self.indice = indice
+        self.inicio = time.perf_counter()
+        self.etapas: Dict[str, float] = {}
+        self.tentativas = 0
+        self.ollama: Dict[str, int] = {campo: 0 for campo in CAMPOS_OLLAMA}
+        self.sucesso = False
+        self.cache = False
+        self.latencia = 0.0
+
+    @contextmanager
+    def etapa(self, nome: str) -> Iterator[None]:
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.etapas[nome] = self.etapas.get(nome, 0.0) + time.perf_counter() - inicio
+
+    def registrar_resposta(self, response: Any) -> None:
+        """Soma as contagens e durações que o Ollama devolve em cada geração."""
+        for campo in CAMPOS_OLLAMA:
+            valor = response.get(campo) if response is not None else None
+            if valor:
+                self.ollama[campo] += int(valor)
+
+    def somar_parcela(self, lote: "MetricasMusica", tamanho: int) -> None:
+        """Soma a parte que cabe a esta música de uma chamada feita em lote."""
+        for nome, valor in lote.etapas.items():
+            self.etapas[nome] = self.etapas.get(nome, 0.0) + valor / tamanho
+        for campo, valor in lote.ollama.items():
+            self.ollama[campo] += valor // tamanho
+        self.tentativas += 1
+
+    def finalizar(self, sucesso: bool) -> None:
+        self.sucesso = sucesso
+        self.latencia = time.perf_counter() - self.inicio
+
+    def para_dict(self) -> Dict[str, Any]:
+        return {
+            "indice": self.indice,
+            "sucesso": self.sucesso,
+            "cache": self.cache,
+            "tentativas": self.tentativas,
+            "latencia_s": round(self.latencia, 6),
+            "etapas_s": {k: round(v, 6) for k, v in self.etapas.items()},
+            **self.ollama,
+        }
+
+
+class ColetorMetricas:
+    """Recebe as métricas de cada música, grava em JSONL e gera o resumo.
+
+    Os registros vão para o JSONL assim que chegam; na memória ficam só as
+    somas do resumo e as latências usadas nos percentis (8 bytes por música
+    que chamou o modelo), não os registros inteiros.
+    """
+
+    def __init__(self, path: Optional[str | Path] = None):
+        self.path = Path(path) if path is not None else None
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.inicio = time.perf_counter()
+        self._musicas = 0
+        # Somas das músicas que chamaram o modelo (as respostas do cache ficam de fora)
+        self._latencias = array("d")
+        self._tentativas = 0
+        self._retries = 0
+        self._falhas = 0
+        self._ollama: Dict[str, int] = {campo: 0 for campo in CAMPOS_OLLAMA}
+        self._etapas: Dict[str, float] = {}
+
+    def registrar(self, metricas: MetricasMusica) -> None:
+        registro = metricas.para_dict()
+        with self._lock:
+            self._musicas += 1
+            if not registro["cache"]:
+                self._latencias.append(registro["latencia_s"])
+                self._tentativas += registro["tentativas"]
+                self._retries += max(registro["tentativas"] - 1, 0)
+                self._falhas += not registro["sucesso"]
+                for campo in CAMPOS_OLLAMA:
+                    self._ollama[campo] += registro[campo]
+                for nome, valor in registro["etapas_s"].items():
+                    self._etapas[nome] = self._etapas.get(nome, 0.0) + valor
+            if self.path is not None:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(registro) + "\n")
+
+    def resumo(self) -> Dict[str, Any]:
+        with self._lock:
+            musicas = self._musicas
+            latencias = np.frombuffer(self._latencias, dtype=np.float64).copy()
+            tentativas, retries, falhas = self._tentativas, self._retries, self._falhas
+            soma = dict(self._ollama)
+            etapas = dict(self._etapas)
+
+        chamadas = len(latencias)
+        duracao = time.perf_counter() - self.inicio
+        resumo: Dict[str, Any] = {
+            "musicas": musicas,
+            "respostas_do_cache": musicas - chamadas,
+            "duracao_s": round(duracao, 3),
+            "musicas_por_minuto": round(musicas / duracao * 60, 2) if duracao else 0.0,
+        }
+        if not chamadas:
+            return resumo
+
+        resumo.update({
+            "latencia_p50_s": round(float(np.percentile(latencias, 50)), 3),
+            "latencia_p95_s": round(float(np.percentile(latencias, 95)), 3),
+            "latencia_media_s": round(float(latencias.mean()), 3),
+            "tentativas_por_musica": round(tentativas / chamadas, 3),
+            "retries_por_musica": round(retries / chamadas, 3),
+            "taxa_falha": round(falhas / chamadas, 4),
+            "prompt_tokens_por_musica": round(soma["prompt_eval_count"] / chamadas, 1),
+            "tokens_gerados_por_musica": round(soma["eval_count"] / chamadas, 1),
+            "tempo_modelo_por_musica_s": round(
+                (soma["prompt_eval_duration"] + soma["eval_duration"]) / 1e9 / chamadas, 3
+            ),
+            "prompt_tokens_por_s": _taxa(soma["prompt_eval_count"], soma["prompt_eval_duration"]),
+            "tokens_gerados_por_s": _taxa(soma["eval_count"], soma["eval_duration"]),
+            "tempo_por_etapa_s": {k: round(v, 3) for k, v in sorted(etapas.items())},
+        })
+        return resumo
+
+    def salvar_resumo(self, path: str | Path, extras: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Grava o resumo em JSON; ``extras`` (configuração da execução) entram junto."""
+        resumo = {**(extras or {}), **self.resumo()}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(resumo, f, ensure_ascii=False, indent=2)
+        return resumo
+
+
+def _taxa(tokens: int, duracao_ns: int) -> float:
+    # As durações do Ollama vêm em nanossegundos
+    return round(tokens / (duracao_ns / 1e9), 2) if duracao_ns else 0.0
@@ -0,0 +1,432 @@
+"""Servidor HTTP local que imita a API de geração do Ollama.
+
+Serve para testar e medir o analisador (pool de endpoints, concorrência,
+parser) sem um modelo rodando. Responde ``POST /api/generate`` e
+``GET /api/tags`` (verificações de saúde).
+
+Por padrão devolve sempre a mesma classificação. Com ``--replay`` devolve
+classificações gravadas (ex.: ``results/relacionamentos_toxicos_*.json``),
+escolhidas de forma determinística pelo hash da letra, e ``--taxa-malformada``
+faz uma fração das respostas vir quebrada para exercitar as novas tentativas.
+Requisições com ``format`` (modo estruturado) não saem quebradas: a geração
+restrita pelo esquema não produz texto fora do formato.
+
+Prompts em lote (``OllamaAnalyzer.analyze_batch``) recebem um array JSON com
+uma classificação por letra; a mesma letra recebe a mesma classificação nos
+dois modos. A latência simula metade do tempo na avaliação do prompt e metade
+na geração de cada classificação, então um lote de N letras leva
+``latencia * (1 + N) / 2``.
+
+Com ``--capacidade`` o servidor atende um número limitado de gerações ao
+mesmo tempo, enfileira até ``--fila-maxima`` e recusa o resto com HTTP 503,
+para medir o comportamento do agendador sob sobrecarga.
+
+Com ``--modelo-triagem`` as requisições para esse modelo imitam um modelo
+menor: levam ``--fator-latencia`` vezes a latência e erram o nível de
+``--taxa-ruido`` das letras (um nível vizinho), quase sempre com baixa
+confiança. Requisições com ``logprobs`` recebem as log-probabilidades de cada
+token da resposta, com a confiança concentrada nos tokens do nível.
+
+Uso:
+    python mock_ollama.py --porta 11500 --latencia 0.2
+    python mock_ollama.py --replay results/relacionamentos_toxicos_20250615_031911.json \
+        --latencia 0.5 --taxa-malformada 0.05
+    python mock_ollama.py --replay results/relacionamentos_toxicos_20250615_031911.json \
+        --latencia 0.5 --modelo-triagem llama3.2:1b --taxa-ruido 0.15 --fator-latencia 0.2
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Marcador que separa a letra do restante do prompt (ver OllamaAnalyzer.montar_prompt)
+MARCADOR_LETRA = "AGORA ANALISE ESTA LETRA:\n"
+# Início da instrução do modo estruturado, que vem depois da letra
+INICIO_INSTRUCAO_JSON = "\n\nResponda somente com um objeto JSON"
+# Letras de um prompt em lote (ver OllamaAnalyzer.montar_prompt_lote)
+RE_LETRA_LOTE = re.compile(r"=== LETRA id=(\d+) ===\n(.*?)(?=\n\n=== LETRA id=|\Z)", re.DOTALL)
+
+CAMPOS_BOOLEANOS = (
+    "abuso_emocional",
+    "ciume_possessividade",
+    "dependencia",
+    "objetificacao",
+    "violencia_traicao",
+)
+
+NIVEIS = ("na", "muito baixo", "baixo", "moderado", "alto", "muito alto")
+# Posição do valor do nível nos dois formatos de resposta
+RE_NIVEL = re.compile(r'(?:Nivel de toxicidade: |"nivel_toxicidade": ")([a-z ]+)')
+# Confiança do modelo de triagem no nível (acertos, acertos com dúvida e erros)
+CONFIANCA_ACERTO = 0.97
+CONFIANCA_DUVIDA = 0.55
+CONFIANCA_ERRO = 0.35
+CONFIANCA_ERRO_CONFIANTE = 0.9
+
+RESPOSTA_PADRAO = (
+    "Nivel de toxicidade: na\n"
+    "abuso_emocional: false\n"
+    "ciume_possessividade: false\n"
+    "dependencia: false\n"
+    "objetificacao: false\n"
+    "violencia_traicao: false\n"
+    "justificativa: nenhum elemento tóxico identificado"
+)
+
+
+def formatar_resposta(registro: Dict[str, Any]) -> str:
+    """Escreve um resultado gravado no formato de texto pedido pelo prompt."""
+    linhas = [f"Nivel de toxicidade: {registro['nivel_toxicidade']}"]
+    for campo in CAMPOS_BOOLEANOS:
+        linhas.append(f"{campo}: {'true' if registro.get(campo) else 'false'}")
+    linhas.append(f"justificativa: {registro.get('justificativa', '')}")
+    return "\n".join(linhas)
+
+
+def corromper(texto: str, variante: int) -> str:
+    """Gera uma resposta malformada que não passa em ``is_valid_response``."""
+    if variante % 3 == 0:
+        return ""
+    if variante % 3 == 1:
+        return "Desculpe, não consigo classificar esta letra."
+    return texto.replace("Nivel de toxicidade:", "Nivel:", 1)
+
+
+def logprobs_resposta(texto: str, confianca: float) -> List[Dict[str, Any]]:
+    """Log-probabilidades por token (palavras com o espaço anterior).
+
+    Os tokens do nível dividem ``log(confianca)``; os demais saem quase certos.
+    """
+    match = RE_NIVEL.search(texto)
+    inicio, fim = match.span(1) if match else (-1, -1)
+    tokens = []
+    posicao = 0
+    for token in re.findall(r"\s*\S+", texto):
+        tokens.append((token, posicao < fim and posicao + len(token) > inicio))
+        posicao += len(token)
+    do_nivel = sum(nivel for _, nivel in tokens) or 1
+    itens = []
+    for token, nivel in tokens:
+        logprob = math.log(confianca) / do_nivel if nivel else -0.01
+        itens.append({"token": token, "logprob": logprob, "top_logprobs": [{"token": token, "logprob": logprob}]})
+    return itens
+
+
+def carregar_replay(path: str | Path) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _hash(texto: str) -> int:
+    return int.from_bytes(hashlib.sha256(texto.encode("utf-8")).digest()[:8], "big")
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    # Preenchidos pelo servidor (ver ``criar_servidor``)
+    latencia = 0.0
+    resposta = RESPOSTA_PADRAO
+    registros: Optional[List[Dict[str, Any]]] = None
+    taxa_malformada = 0.0
+    capacidade = 0
+    fila_maxima = 0
+    modelo_triagem: Optional[str] = None
+    taxa_ruido = 0.0
+    fator_latencia = 1.0
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _enviar_json(self, dados: Dict[str, Any], status: int = 200) -> None:
+        corpo = json.dumps(dados, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def do_GET(self) -> None:
+        if self.path == "/api/tags":
+            self._enviar_json({"models": []})
+        else:
+            self._enviar_json({"error": "not found"}, status=404)
+
+    def do_POST(self) -> None:
+        if self.path != "/api/generate":
+            self._enviar_json({"error": "not found"}, status=404)
+            return
+
+        tamanho = int(self.headers.get("Content-Length", 0))
+        requisicao = json.loads(self.rfile.read(tamanho) or b"{}")
+        with self.server.lock:
+            self.server.requisicoes += 1
+
+        if not self.capacidade:
+            self.gerar(requisicao)
+            return
+
+        # Como o Ollama com OLLAMA_NUM_PARALLEL e OLLAMA_MAX_QUEUE: no máximo
+        # ``capacidade`` gerações ao mesmo tempo e as demais esperam na fila;
+        # com a fila cheia a requisição é recusada com 503
+        with self.server.lock:
+            if self.server.na_fila >= self.fila_maxima:
+                self.server.recusadas += 1
+                recusada = True
+            else:
+                self.server.na_fila += 1
+                recusada = False
+        if recusada:
+            self._enviar_json({"error": "server busy, please try again.  maximum pending requests exceeded"}, status=503)
+            return
+        with self.server.vagas:
+            with self.server.lock:
+                self.server.na_fila -= 1
+            self.gerar(requisicao)
+
+    def gerar(self, requisicao: Dict[str, Any]) -> None:
+        prompt = requisicao.get("prompt") or ""
+        letras_lote = RE_LETRA_LOTE.findall(prompt)
+        confianca = CONFIANCA_ACERTO
+        if letras_lote:
+            texto = self.gerar_resposta_lote(requisicao, letras_lote)
+        else:
+            texto, confianca = self.gerar_resposta(requisicao)
+        classificacoes = max(len(letras_lote), 1)
+        latencia = self.latencia
+        if self.triagem(requisicao):
+            latencia *= self.fator_latencia
+        if latencia:
+            time.sleep(latencia * (1 + classificacoes) / 2)
+
+        extras = {"logprobs": logprobs_resposta(texto, confianca)} if requisicao.get("logprobs") else {}
+        self._enviar_json({
+            "model": requisicao.get("model", "mock"),
+            "created_at": "1970-01-01T00:00:00Z",
+            "response": texto,
+            "done": True,
+            "done_reason": "stop",
+            "context": [1, 2, 3],
+            "prompt_eval_count": len(prompt) // 4,
+            "prompt_eval_duration": int(latencia * 1e9 / 2),
+            "eval_count": len(texto) // 4,
+            "eval_duration": int(latencia * 1e9 / 2 * classificacoes),
+            "total_duration": int(latencia * 1e9 * (1 + classificacoes) / 2),
+            **extras,
+        })
+
+    def triagem(self, requisicao: Dict[str, Any]) -> bool:
+        return self.modelo_triagem is not None and requisicao.get("model") == self.modelo_triagem
+
+    def com_ruido(self, registro: Dict[str, Any], letra: str) -> Tuple[Dict[str, Any], float]:
+        """Classificação do modelo de triagem: ``(registro, confiança no nível)``.
+
+        Em ``taxa_ruido`` das letras o nível vira um vizinho, com baixa
+        confiança em 85% desses erros; outros 5% das letras acertam com
+        dúvida. O sorteio depende só da letra.
+        """
+        valor = _hash(f"triagem:{letra}") % 10_000
+        sorteio = valor / 10_000
+        if sorteio >= self.taxa_ruido:
+            confianca = CONFIANCA_DUVIDA if sorteio < self.taxa_ruido + 0.05 else CONFIANCA_ACERTO
+            return registro, confianca
+        nivel = str(registro.get("nivel_toxicidade", "na")).strip().lower()
+        posicao = NIVEIS.index(nivel) if nivel in NIVEIS else 0
+        posicao = min(max(posicao + (1 if posicao == 0 or valor % 2 else -1), 0), len(NIVEIS) - 1)
+        confianca = CONFIANCA_ERRO if sorteio < self.taxa_ruido * 0.85 else CONFIANCA_ERRO_CONFIANTE
+        return {**registro, "nivel_toxicidade": NIVEIS[posicao]}, confianca
+
+    def registro_para(self, letra: str) -> Dict[str, Any]:
+        if not self.registros:
+            return {
+                "nivel_toxicidade": "na",
+                **{campo: False for campo in CAMPOS_BOOLEANOS},
+                "justificativa": "nenhum elemento tóxico identificado",
+            }
+        return self.registros[_hash(letra) % len(self.registros)]
+
+    def malformada(self, prompt: str) -> Tuple[bool, int]:
+        """Decide se a resposta sai quebrada.
+
+        A decisão depende do prompt e de quantas vezes ele já foi recebido, e
+        não da ordem de chegada, então o resultado é o mesmo com qualquer
+        concorrência. Uma nova tentativa do mesmo prompt sorteia de novo.
+        """
+        if not self.taxa_malformada:
+            return False, 0
+        chave = _hash(prompt)
+        with self.server.lock:
+            vez = self.server.vistos.get(chave, 0)
+            self.server.vistos[chave] = vez + 1
+        sorteio = _hash(f"{chave}:{vez}")
+        return (sorteio % 10_000) / 10_000 < self.taxa_malformada, sorteio
+
+    def gerar_resposta(self, requisicao: Dict[str, Any]) -> Tuple[str, float]:
+        """Texto da resposta e a confiança do modelo no nível."""
+        prompt = requisicao.get("prompt") or ""
+        letra = prompt.rsplit(MARCADOR_LETRA, 1)[-1].split(INICIO_INSTRUCAO_JSON, 1)[0]
+        registro = self.registro_para(letra)
+        confianca = CONFIANCA_ACERTO
+        if self.triagem(requisicao):
+            registro, confianca = self.com_ruido(registro, letra)
+
+        if requisicao.get("format"):
+            texto = json.dumps(
+                {k: registro.get(k) for k in ("nivel_toxicidade", *CAMPOS_BOOLEANOS, "justificativa")},
+                ensure_ascii=False,
+            )
+        elif self.registros:
+            texto = formatar_resposta(registro)
+        else:
+            texto = self.resposta
+
+        if requisicao.get("format"):
+            return texto, confianca
+        quebrada, variante = self.malformada(prompt)
+        return (corromper(texto, variante) if quebrada else texto), confianca
+
+
+    def gerar_resposta_lote(self, requisicao: Dict[str, Any], letras: List[Tuple[str, str]]) -> str:
+        """Array JSON com uma classificação por letra do lote.
+
+        Com ``taxa_malformada`` cada entrada pode faltar ou vir com um nível
+        inválido; a decisão é feita por letra, como no modo de uma música.
+        """
+        itens = []
+        for id_letra, letra in letras:
+            registro = self.registro_para(letra)
+            item = {"id": int(id_letra), **{k: registro.get(k) for k in ("nivel_toxicidade", *CAMPOS_BOOLEANOS, "justificativa")}}
+            quebrada, variante = self.malformada(letra)
+            if quebrada:
+                if variante % 2 == 0:
+                    continue
+                item["nivel_toxicidade"] = "talvez"
+            itens.append(item)
+        return json.dumps(itens, ensure_ascii=False)
+
+
+def criar_servidor(
+    porta: int = 0,
+    latencia: float = 0.0,
+    handler: type = MockOllamaHandler,
+    registros: Optional[List[Dict[str, Any]]] = None,
+    taxa_malformada: float = 0.0,
+    capacidade: int = 0,
+    fila_maxima: int = 0,
+    modelo_triagem: Optional[str] = None,
+    taxa_ruido: float = 0.0,
+    fator_latencia: float = 1.0,
+) -> ThreadingHTTPServer:
+    """Cria o servidor (porta 0 escolhe uma porta livre).
+
+    Com ``capacidade`` > 0 o servidor atende no máximo esse número de gerações
+    ao mesmo tempo e mantém até ``fila_maxima`` esperando; o resto recebe 503.
+    As requisições para ``modelo_triagem`` são mais rápidas
+    (``fator_latencia``) e erram o nível de ``taxa_ruido`` das letras.
+    """
+    classe = type("Handler", (handler,), {
+        "latencia": latencia,
+        "registros": registros,
+        "taxa_malformada": taxa_malformada,
+        "capacidade": capacidade,
+        "fila_maxima": fila_maxima,
+        "modelo_triagem": modelo_triagem,
+        "taxa_ruido": taxa_ruido,
+        "fator_latencia": fator_latencia,
+    })
+    servidor = ThreadingHTTPServer(("127.0.0.1", porta), classe)
+    servidor.daemon_threads = True
+    servidor.requisicoes = 0
+    servidor.vistos = {}
+    servidor.lock = threading.Lock()
+    servidor.vagas = threading.BoundedSemaphore(max(capacidade, 1))
+    servidor.na_fila = 0
+    servidor.recusadas = 0
+    return servidor
+
+
+def iniciar_em_thread(servidor: ThreadingHTTPServer) -> Tuple[str, threading.Thread]:
+    """Inicia o servidor em segundo plano e devolve a URL base."""
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    host, porta = servidor.server_address[:2]
+    return f"http://{host}:{porta}", thread
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Servidor local que imita o /api/generate do Ollama.")
+    parser.add_argument("--porta", type=int, default=11500, help="Porta do servidor.")
+    parser.add_argument("--latencia", type=float, default=0.0, help="Atraso (s) em cada geração.")
+    parser.add_argument(
+        "--replay",
+        default=None,
+        help="JSON de resultados gravados cujas classificações serão devolvidas.",
+    )
+    parser.add_argument(
+        "--taxa-malformada",
+        type=float,
+        default=0.0,
+        help="Fração das respostas que sai malformada (0 a 1).",
+    )
+    parser.add_argument(
+        "--capacidade",
+        type=int,
+        default=0,
+        help="Gerações simultâneas atendidas (0: sem limite), como OLLAMA_NUM_PARALLEL.",
+    )
+    parser.add_argument(
+        "--fila-maxima",
+        type=int,
+        default=0,
+        help="Requisições esperando além da capacidade antes de responder 503, como OLLAMA_MAX_QUEUE.",
+    )
+    parser.add_argument(
+        "--modelo-triagem",
+        default=None,
+        help="Nome do modelo que imita um modelo menor (mais rápido e com ruído no nível).",
+    )
+    parser.add_argument(
+        "--taxa-ruido",
+        type=float,
+        default=0.15,
+        help="Fração das letras em que o modelo de triagem erra o nível.",
+    )
+    parser.add_argument(
+        "--fator-latencia",
+        type=float,
+        default=0.2,
+        help="Latência do modelo de triagem como fração de --latencia.",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    registros = carregar_replay(args.replay) if args.replay else None
+    servidor = criar_servidor(
+        args.porta,
+        args.latencia,
+        registros=registros,
+        taxa_malformada=args.taxa_malformada,
+        capacidade=args.capacidade,
+        fila_maxima=args.fila_maxima,
+        modelo_triagem=args.modelo_triagem,
+        taxa_ruido=args.taxa_ruido,
+        fator_latencia=args.fator_latencia,
+    )
+    print(f"Mock do Ollama em http://127.0.0.1:{args.porta}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,218 +1,108 @@
+import argparse
+import json
+import logging
 import pandas as pd
 import ollama
-import json
-from typing import Dict, Any, Optional
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Any, Deque, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 import os
+import threading
 from datetime import datetime
 
-class OllamaAnalyzer:
-    def __init__(self, model: str = "mistral:instruct"):
-        self.model = model
-        self.exemplos_manuais = []
+from agendador import TRANSPORTE, Agendador, LimitadorAIMD, OrcamentoRetries, tipo_erro
+from cascata import CALIBRACAO, EstatisticasCascata, confianca_nivel, motivo_escalada
+from checkpoint_store import COLUNAS_IMPRESSAO, CheckpointStore, checkpoint_padrao, exportar_dataframe
+from formato_colunar import exportar_visoes, pyarrow_disponivel, salvar_resultados
+from indice_exemplos import IndiceExemplos, formatar_exemplo
+from ingestao import Musica, ler_musicas, musicas_de_dataframe
+from letras import dividir_em_janelas, estimar_tokens, hash_letra, normalizar_letra
+from metricas import ColetorMetricas, MetricasMusica
+from parser_resposta import CAMPOS_BOOLEANOS, parsear_lote, parsear_resposta
+from pool_endpoints import PoolEndpoints
+from pos_processamento import NIVEL_NUMERICO, agregar, salvar_agregados
+from pre_filtro import RESULTADO_PRE_FILTRO, PreFiltro
+from response_cache import CacheRespostas, chave_cache
 
-    def add_exemplo_manual(self, letra: str, score: str, justificativa: str):
-        """Adiciona um exemplo de classificação manual para aprendizado"""
-        self.exemplos_manuais.append({
-            "letra": letra,
-            "score": score,
-            "justificativa": justificativa
-        })
+logger = logging.getLogger(__name__)
 
-    def gerar_prompt_com_exemplos(self, prompt_base: str) -> str:
-        """Gera o prompt completo incluindo os exemplos de classificação manual"""
-        prompt_completo = prompt_base + "\n\n=== EXEMPLOS DE REFERÊNCIA ===\n"
-        prompt_completo += "Analise cuidadosamente os seguintes exemplos já classificados. Eles devem servir como base para suas próximas classificações.\n"
+# Opções de geração usadas em todas as chamadas ao modelo
+OPCOES_GERACAO = {
+    'temperature': 0.3,  # Consistência
+    'num_ctx': 8192,     # Contexto maior
+    'num_predict': 800,        # Redução para respostas mais focadas
+    'top_p': 0.7,              # Mais foco nas opções mais relevantes
+    'repeat_penalty': 1.2,     # Penalidade maior contra repetições
+    'top_k': 40,               # Novo parâmetro para limitar escolhas léxicas
+    'seed': 42                 # Reprodutibilidade
+}
 
-        for exemplo in self.exemplos_manuais:
-            prompt_completo += "\n---\nEXEMPLO DE CLASSIFICAÇÃO:\n"
-            prompt_completo += f"Letra:\n{exemplo['letra']}\n\n"
-            prompt_completo += f"Nivel de toxicidade: {exemplo['score']}\n"
-            prompt_completo += f"Justificativa: {exemplo['justificativa']}\n"
-            prompt_completo += "---\n"
-        
-        prompt_completo += "\nAgora, use esses exemplos como referência para classificar a próxima música de forma similar.\n"
-        return prompt_completo
+# Esquema JSON imposto ao modelo no modo estruturado (parâmetro ``format``)
+SCHEMA_RESPOSTA = {
+    "type": "object",
+    "properties": {
+        "nivel_toxicidade": {
+            "type": "string",
+            "enum": ["na", "muito baixo", "baixo", "moderado", "alto", "muito alto"],
+        },
+        "abuso_emocional": {"type": "boolean"},
+        "ciume_possessividade": {"type": "boolean"},
+        "dependencia": {"type": "boolean"},
+        "objetificacao": {"type": "boolean"},
+        "violencia_traicao": {"type": "boolean"},
+        "justificativa": {"type": "string", "minLength": 1, "maxLength": 600},
+    },
+    "required": [
+        "nivel_toxicidade",
+        "abuso_emocional",
+        "ciume_possessividade",
+        "dependencia",
+        "objetificacao",
+        "violencia_traicao",
+        "justificativa",
+    ],
+}
 
-    def parse_response(self, response: str) -> Dict[str, Any]:
-        """Tenta converter a resposta do modelo em um dicionário estruturado"""
-        print(f"Resposta recebida: {response[:200]}...")  # Debug
-        
-        try:
-            # Primeiro tenta parsear como JSON direto
-            return json.loads(response)
-        except json.JSONDecodeError:
-            # Se falhar, tenta extrair os campos do texto
-            result = {
-                "nivel_toxicidade": "na",
-                "abuso_emocional": False,
-                "ciume_possessividade": False,
-                "dependencia": False,
-                "objetificacao": False,
-                "violencia_traicao": False,
-                "justificativa": ""
-            }
-            
-            # Procura por JSON embeddado na resposta
-            json_start = response.find('{')
-            json_end = response.rfind('}')
-            if json_start != -1 and json_end != -1 and json_end > json_start:
-                try:
-                    json_part = response[json_start:json_end+1]
-                    return json.loads(json_part)
-                except json.JSONDecodeError:
-                    pass
-            
-            # Parse manual mais robusto
-            lines = response.split('\n')
-            justificativa_lines = []
-            capturing_justificativa = False
-            
-            for line in lines:
-                line_clean = line.strip()
-                line_lower = line_clean.lower()
-                
-                if line_lower.startswith('nivel de toxicidade:') or line_lower.startswith('nível de toxicidade:'):
-                    nivel = line_clean.split(':', 1)[1].strip().lower()
-                    if 'muito alto' in nivel:
-                        result['nivel_toxicidade'] = 'muito alto'
-                    elif 'muito baixo' in nivel:
-                        result['nivel_toxicidade'] = 'muito baixo'
-                    elif 'alto' in nivel:
-                        result['nivel_toxicidade'] = 'alto'
-                    elif 'baixo' in nivel:
-                        result['nivel_toxicidade'] = 'baixo'
-                    elif 'moderado' in nivel:
-                        result['nivel_toxicidade'] = 'moderado'
-                    elif 'na' in nivel or 'não aplicável' in nivel:
-                        result['nivel_toxicidade'] = 'na'
-                        
-                elif line_lower.startswith('abuso_emocional:'):
-                    val = line_clean.split(':', 1)[1].strip().lower()
-                    result['abuso_emocional'] = 'true' in val or 'yes' in val or 'sim' in val
-                    
-                elif line_lower.startswith('ciume_possessividade:'):
-                    val = line_clean.split(':', 1)[1].strip().lower()
-                    result['ciume_possessividade'] = 'true' in val or 'yes' in val or 'sim' in val
-                    
-                elif line_lower.startswith('dependencia:') or line_lower.startswith('dependência:'):
-                    val = line_clean.split(':', 1)[1].strip().lower()
-                    result['dependencia'] = 'yes' in val or 'sim' in val or 'true' in val
-                    
-                elif line_lower.startswith('objetificacao:') or line_lower.startswith('objetificação:'):
-                    val = line_clean.split(':', 1)[1].strip().lower()
-                    result['objetificacao'] = 'yes' in val or 'sim' in val or 'true' in val
-                    
-                elif line_lower.startswith('violencia_traicao:') or line_lower.startswith('violência_traição:'):
-                    val = line_clean.split(':', 1)[1].strip().lower()
-                    result['violencia_traicao'] = 'yes' in val or 'sim' in val or 'true' in val
-                    
-                elif line_lower.startswith('justificativa:'):
-                    capturing_justificativa = True
-                    just_content = line_clean.split(':', 1)[1].strip()
-                    if just_content:
-                        justificativa_lines.append(just_content)
-                        
-                elif capturing_justificativa and line_clean:
-                    justificativa_lines.append(line_clean)
-            
-            if justificativa_lines:
-                result['justificativa'] = ' '.join(justificativa_lines)
-                
-            print(f"Resultado parseado: {result}")  # Debug
-            return result
+# Tokens suficientes para o objeto do esquema com uma justificativa de até
+# 600 caracteres; o modo texto livre usa ``num_predict`` de OPCOES_GERACAO.
+NUM_PREDICT_ESTRUTURADO = 300
 
-    def is_valid_response(self, result: Dict[str, Any]) -> bool:
-        """Valida se a resposta contém os campos necessários e não está vazia"""
-        if not result:
-            return False
-            
-        # Verifica se tem nível de toxicidade válido
-        valid_levels = ['na', 'muito baixo', 'baixo', 'moderado', 'alto', 'muito alto']
-        if result.get('nivel_toxicidade', '').lower() not in valid_levels:
-            return False
-            
-        # Se o nível não é 'na', deve ter justificativa
-        if result.get('nivel_toxicidade', '').lower() != 'na' and not result.get('justificativa', '').strip():
-            return False
-            
-        return True
+# Tokens reservados para o cabeçalho da letra ("AGORA ANALISE ESTA LETRA", a
+# instrução do modo estruturado) ao calcular o espaço disponível para ela
+MARGEM_LETRA = 64
 
-    def analyze_text(self, text: str, prompt: str, max_retries: int = 3) -> Optional[Dict[str, Any]]:
-        """Analisa texto com retry automático em caso de resposta inválida"""
-        for attempt in range(max_retries):
-            try:
-                print(f"Tentativa {attempt + 1}/{max_retries}")
-                
-                full_prompt = f"{self.gerar_prompt_com_exemplos(prompt)}\n\nAGORA ANALISE ESTA LETRA:\n{text}"
+# Versão do pré-processamento das letras (``normalizar_letra`` e janelas);
+# mudar o algoritmo exige incrementar, pois entra na impressão dos resultados
+VERSAO_PREPROCESSAMENTO = 1
 
-                response = ollama.generate(
-                    model=self.model,
-                    prompt=full_prompt,
-                    options={
-                        'temperature': 0.3,  # Consistência
-                        'num_ctx': 8192,     # Contexto maior
-                        'num_predict': 800,        # Redução para respostas mais focadas
-                        'top_p': 0.7,              # Mais foco nas opções mais relevantes
-                        'repeat_penalty': 1.2,     # Penalidade maior contra repetições
-                        'top_k': 40,               # Novo parâmetro para limitar escolhas léxicas
-                        'seed': 42                 # Reprodutibilidade
-                    }
-                )
-                
-                if response and response.get('response'):
-                    result = self.parse_response(response['response'].strip())
-                    
-                    if self.is_valid_response(result):
-                        print(f"✅ Resposta válida obtida na tentativa {attempt + 1}")
-                        return result
-                    else:
-                        print(f"⚠️ Resposta inválida na tentativa {attempt + 1}: {result}")
-                        
-                else:
-                    print(f"⚠️ Resposta vazia na tentativa {attempt + 1}")
-                    
-            except Exception as e:
-                print(f"❌ Erro na tentativa {attempt + 1}: {e}")
-                
-        print(f"❌ Falha após {max_retries} tentativas")
-        return None
+# Alternativas mais prováveis pedidas por token na triagem da cascata
+TOP_LOGPROBS_TRIAGEM = 3
 
-def carregar_exemplos_manuais(analyzer: OllamaAnalyzer, csv_path: str):
-    """Carrega os exemplos de classificação manual para o analisador"""
-    try:
-        df_manual = pd.read_csv(csv_path)
-        print(f"\nCarregando {len(df_manual)} exemplos de classificação manual...")
-        
-        for idx, row in df_manual.iterrows():
-            try:
-                letra = row['Letra'] if 'Letra' in df_manual.columns else None
-                nivel = row['Pontuacao_manual'] if 'Pontuacao_manual' in df_manual.columns else None
-                justificativa = row['Justificativa'] if 'Justificativa' in df_manual.columns else None
-                
-                if letra is not None and nivel is not None:
-                    analyzer.add_exemplo_manual(
-                        letra=letra,
-                        score=nivel,
-                        justificativa=str(justificativa) if justificativa is not None else ""
-                    )
-            except Exception as e:
-                print(f"⚠️ Erro ao processar exemplo {idx}: {e}")
-                continue
-        
-        print("✅ Exemplos manuais carregados com sucesso!")
-    except Exception as e:
-        print(f"⚠️ Erro ao carregar exemplos manuais: {e}")
+# Instrução adicionada depois da letra no modo estruturado
+INSTRUCAO_JSON = (
+    "\n\nResponda somente com um objeto JSON com os campos nivel_toxicidade, "
+    "abuso_emocional, ciume_possessividade, dependencia, objetificacao, "
+    "violencia_traicao e justificativa."
+)
 
-def analise_conteudo_toxico(df: pd.DataFrame) -> pd.DataFrame:
-    print("\nColunas disponíveis no dataset:")
-    print(df.columns.tolist())
+# Modo lote: cada letra vai identificada por este marcador e o seu id no lote
+MARCADOR_LOTE = "=== LETRA id="
 
-    coluna_titulo = 'Song Title'
-    coluna_artista = 'Artist'
-    coluna_letra = 'Lyrics'
-    coluna_ano = 'Year'
+# No modo lote o modelo devolve um array com um objeto por letra
+SCHEMA_LOTE = {
+    "type": "array",
+    "items": {
+        **SCHEMA_RESPOSTA,
+        "properties": {"id": {"type": "integer"}, **SCHEMA_RESPOSTA["properties"]},
+        "required": ["id", *SCHEMA_RESPOSTA["required"]],
+    },
+}
 
-    prompt = """
+# Instruções de classificação enviadas antes dos exemplos e da letra. O texto
+# (com a indentação) entra na impressão digital dos resultados e na chave do
+# cache: qualquer mudança aqui marca os resultados como desatualizados (ver
+# planejador.py).
+PROMPT_CLASSIFICACAO = """
     Você é um crítico especializado em análise de letras de músicas, focado em identificar e classificar elementos tóxicos em relacionamentos amorosos descritos nas letras.
     Sua tarefa é analisar a letra fornecida e responder EXATAMENTE no formato especificado abaixo, sem adicionar, omitir ou alterar campos, e seguindo rigorosamente as regras.
     
@@ -318,101 +208,1281 @@ def analise_conteudo_toxico(df: pd.DataFrame) -> pd.DataFrame:
     LEMBRE-SE A CLASSIFICAÇÃO DEVE SER FEITA COM BASE NO RELACIONAMENTO AMOROSO, SE A MUSICA NAO TRATAR DE RELACIONAMENTO AMOROSO, O NIVEL DE TOXICIDADE DEVE SER "NA" E CASO TENHA ALGO RELACIONADO A RELACIONAMENTO TOXICO OS NIVEIS DE TOXICIDADE DEVE SER "MUITO BAIXO", "BAIXO", "MODERADO", "ALTO" OU "MUITO ALTO".
     """
 
-    analyzer = OllamaAnalyzer()
+# Exemplos de classificação manual carregados quando o analisador não tem nenhum
+EXEMPLOS_PADRAO = '../data/30-musicas-Mozart.csv'
+
+class OllamaAnalyzer:
+    def __init__(
+        self,
+        model: str = "mistral:instruct",
+        reutilizar_contexto: bool = False,
+        keep_alive: str = "30m",
+        orcamento_exemplos: Optional[int] = 3000,
+        cache: Optional[CacheRespostas] = None,
+        modo_estruturado: bool = False,
+        pool: Optional[PoolEndpoints] = None,
+        metricas: Optional[ColetorMetricas] = None,
+        tamanho_lote: int = 1,
+        normalizar_letras: bool = True,
+        max_tokens_letra: Optional[int] = None,
+        sobreposicao_janelas: float = 0.15,
+        agendador: Optional[Agendador] = None,
+        modelo_triagem: Optional[str] = None,
+        limiar_confianca: float = 0.8,
+        taxa_calibracao: float = 0.05,
+    ):
+        self.model = model
+        # Cascata: ``modelo_triagem`` (menor e mais rápido) classifica primeiro
+        # e só as músicas com resposta inválida, contraditória ou com
+        # confiança no nível abaixo de ``limiar_confianca`` (mais a amostra de
+        # calibração) vão para ``model``. Ver cascata.py.
+        if modelo_triagem is not None and tamanho_lote > 1:
+            raise ValueError("A cascata de modelos não funciona no modo lote (tamanho_lote > 1)")
+        self.modelo_triagem = modelo_triagem
+        self.limiar_confianca = limiar_confianca
+        self.cascata = EstatisticasCascata(taxa_calibracao) if modelo_triagem is not None else None
+        # Backoff das falhas de transporte, limite adaptativo de requisições
+        # em voo e orçamento de retries (``None`` chama o servidor direto e
+        # repete qualquer falha imediatamente)
+        self.agendador = agendador
+        # Coletor das métricas por música (``None`` não registra)
+        self.metricas = metricas
+        # Servidores Ollama usados nas chamadas (``None`` usa o servidor padrão)
+        self.pool = pool
+        # Cache persistente de respostas válidas (``None`` desativa)
+        self.cache = cache
+        self.exemplos_manuais = []
+        # Limite de tokens para os exemplos de cada música. Com ``None`` todos
+        # os exemplos manuais são enviados em todas as chamadas.
+        self.orcamento_exemplos = orcamento_exemplos
+        self._indice_exemplos: Optional[IndiceExemplos] = None
+        self._hash_exemplos: Optional[str] = None
+        self.options = dict(OPCOES_GERACAO)
+        # Restringe a saída ao SCHEMA_RESPOSTA: o modelo sempre devolve o JSON
+        # com os campos exatos, sem depender do parser de texto livre.
+        self.modo_estruturado = modo_estruturado
+        # Máximo de músicas por chamada em ``analyze_batch`` (1 desativa o
+        # modo lote). O número efetivo diminui quando as letras não cabem no
+        # ``num_ctx``.
+        self.tamanho_lote = max(tamanho_lote, 1)
+        # Pré-processamento das letras antes do prompt: ``normalizar_letra``
+        # remove marcações e repetições; letras maiores que o espaço livre no
+        # ``num_ctx`` (ou que ``max_tokens_letra``) são divididas em janelas
+        # sobrepostas, classificadas separadamente e mescladas.
+        self.normalizar_letras = normalizar_letras
+        self.max_tokens_letra = max_tokens_letra
+        self.sobreposicao_janelas = sobreposicao_janelas
+        if modo_estruturado:
+            self.options['num_predict'] = min(self.options['num_predict'], NUM_PREDICT_ESTRUTURADO)
+        # Contadores da execução (músicas, tentativas e respostas inválidas)
+        self.estatisticas = {
+            "musicas": 0,
+            "tentativas": 0,
+            "respostas_invalidas": 0,
+            "erros": 0,
+            "falhas": 0,
+        }
+        self._lock_estatisticas = threading.Lock()
+        # Mantém o modelo carregado entre as chamadas: enquanto ele estiver na
+        # memória o servidor reaproveita o KV cache do prefixo idêntico.
+        self.keep_alive = keep_alive
+        # Avalia o prefixo (instruções + exemplos) uma única vez e envia apenas
+        # a letra junto com os tokens de contexto devolvidos pelo Ollama.
+        self.reutilizar_contexto = reutilizar_contexto
+        self._prefixos: Dict[str, str] = {}
+        self._contextos: Dict[str, List[int]] = {}
+        self._lock_contexto = threading.Lock()
+
+    def add_exemplo_manual(self, letra: str, score: str, justificativa: str):
+        """Adiciona um exemplo de classificação manual para aprendizado"""
+        self.exemplos_manuais.append({
+            "letra": letra,
+            "score": score,
+            "justificativa": justificativa
+        })
+        # Os exemplos fazem parte do prefixo: invalida o que já foi montado
+        self._prefixos.clear()
+        self._contextos.clear()
+        self._indice_exemplos = None
+        self._hash_exemplos = None
+
+    def hash_exemplos(self) -> str:
+        """Hash do conjunto de exemplos manuais carregados."""
+        if self._hash_exemplos is None:
+            self._hash_exemplos = chave_cache(exemplos=self.exemplos_manuais)
+        return self._hash_exemplos
+
+    def chave_cache(self, prompt_base: str, text: str) -> str:
+        """Chave de cache da classificação de ``text`` com a configuração atual."""
+        return chave_cache(
+            modelo=self.model,
+            opcoes=self.options,
+            prompt=prompt_base,
+            exemplos=self.hash_exemplos(),
+            orcamento_exemplos=self.orcamento_exemplos,
+            reutilizar_contexto=self.reutilizar_contexto,
+            formato=SCHEMA_RESPOSTA if self.modo_estruturado else None,
+            letra=hash_letra(text),
+            # Só entra na chave no modo lote, para não invalidar o cache existente
+            **({"lote": self.tamanho_lote} if self.tamanho_lote > 1 else {}),
+        )
+
+    def impressao(self, prompt_base: str) -> str:
+        """Impressão digital da configuração que produz as classificações.
+
+        Guarda, em JSON compacto, a versão do prompt, o modelo, as opções de
+        geração, o conjunto de exemplos e o pré-processamento das letras (o
+        hash da letra fica em
+        ``hash_letra``). Um resultado com impressão diferente da atual está
+        desatualizado; ``planejador.py`` compara as partes para dizer o que
+        mudou.
+        """
+        return json.dumps(
+            {
+                "prompt": chave_cache(prompt=prompt_base)[:12],
+                "modelo": self.model if self.modelo_triagem is None else f"{self.modelo_triagem}>{self.model}",
+                "opcoes": chave_cache(
+                    opcoes=self.options,
+                    orcamento_exemplos=self.orcamento_exemplos,
+                    formato=SCHEMA_RESPOSTA if self.modo_estruturado else None,
+                    lote=self.tamanho_lote,
+                    # Só entra com a cascata, para não invalidar as impressões existentes
+                    **({"limiar_confianca": self.limiar_confianca} if self.modelo_triagem is not None else {}),
+                )[:12],
+                "exemplos": self.hash_exemplos()[:12],
+                "preprocessamento": chave_cache(
+                    versao=VERSAO_PREPROCESSAMENTO,
+                    normalizar=self.normalizar_letras,
+                    janela=self.limite_tokens_letra(prompt_base),
+                    sobreposicao=self.sobreposicao_janelas,
+                )[:12],
+            },
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+
+    def limite_tokens_letra(self, prompt_base: str) -> int:
+        """Máximo de tokens de letra por chamada sem truncar o prompt.
+
+        É o que sobra do ``num_ctx`` depois das instruções, da resposta
+        esperada e, quando não há orçamento de exemplos, de todos os exemplos
+        (com orçamento eles diminuem para dar lugar à letra).
+        """
+        fixo = prompt_base
+        if self.orcamento_exemplos is None and self.exemplos_manuais:
+            fixo = self.gerar_prompt_com_exemplos(prompt_base)
+        disponivel = self.options['num_ctx'] - self.options['num_predict'] - estimar_tokens(fixo) - MARGEM_LETRA
+        if self.max_tokens_letra is not None:
+            disponivel = min(disponivel, self.max_tokens_letra)
+        return max(disponivel, 1)
+
+    def preparar_letra(self, prompt_base: str, text: str) -> List[str]:
+        """Normaliza a letra e a divide nas janelas que serão classificadas."""
+        if self.normalizar_letras:
+            # Letras só com marcações continuam como vieram
+            text = normalizar_letra(text) or text
+        return dividir_em_janelas(text, self.limite_tokens_letra(prompt_base), self.sobreposicao_janelas)
+
+    def _contar(self, campo: str) -> None:
+        with self._lock_estatisticas:
+            self.estatisticas[campo] += 1
+
+    def retries(self) -> int:
+        """Tentativas além da primeira, somadas em todas as músicas."""
+        return self.estatisticas["tentativas"] - self.estatisticas["musicas"]
+
+    def gerar_prompt_com_exemplos(self, prompt_base: str) -> str:
+        """Gera o prompt completo incluindo os exemplos de classificação manual.
+
+        O prefixo é montado uma única vez por ``prompt_base`` e reaproveitado
+        nas chamadas seguintes (e nas novas tentativas).
+        """
+        prefixo = self._prefixos.get(prompt_base)
+        if prefixo is None:
+            prefixo = self._montar_prefixo(prompt_base)
+            self._prefixos[prompt_base] = prefixo
+        return prefixo
+
+    def _montar_prefixo(self, prompt_base: str) -> str:
+        return prompt_base + "\n\n" + self._formatar_exemplos(self.exemplos_manuais)
+
+    @staticmethod
+    def _formatar_exemplos(exemplos: List[Dict[str, Any]]) -> str:
+        prompt_completo = "=== EXEMPLOS DE REFERÊNCIA ===\n"
+        prompt_completo += "Analise cuidadosamente os seguintes exemplos já classificados. Eles devem servir como base para suas próximas classificações.\n"
+
+        for exemplo in exemplos:
+            prompt_completo += formatar_exemplo(exemplo)
+        
+        prompt_completo += "\nAgora, use esses exemplos como referência para classificar a próxima música de forma similar.\n"
+        return prompt_completo
+
+    def selecionar_exemplos(self, prompt_base: str, text: str) -> List[Dict[str, Any]]:
+        """Escolhe os exemplos mais parecidos com a letra dentro do orçamento.
+
+        O orçamento efetivo também respeita o ``num_ctx``: o que sobra depois
+        das instruções, da letra e da resposta esperada é o máximo disponível
+        para os exemplos, de modo que a letra nunca seja truncada.
+        """
+        if self._indice_exemplos is None:
+            with self._lock_contexto:
+                if self._indice_exemplos is None:
+                    self._indice_exemplos = IndiceExemplos(self.exemplos_manuais)
+
+        disponivel = (
+            self.options['num_ctx']
+            - estimar_tokens(prompt_base)
+            - estimar_tokens(text)
+            - self.options['num_predict']
+        )
+        return self._indice_exemplos.selecionar(text, min(self.orcamento_exemplos, disponivel))
+
+    def montar_prompt(self, prompt_base: str, text: str) -> Tuple[str, str]:
+        """Monta o prompt de uma música como ``(prefixo fixo, parte variável)``.
+
+        O prefixo fixo é idêntico entre as músicas e pode ter seu contexto
+        reaproveitado; a parte variável contém a letra e, quando há orçamento
+        de exemplos, os exemplos escolhidos para ela.
+        """
+        letra = f"AGORA ANALISE ESTA LETRA:\n{text}"
+        if self.modo_estruturado:
+            letra += INSTRUCAO_JSON
+        if self.orcamento_exemplos is None or not self.exemplos_manuais:
+            return self.gerar_prompt_com_exemplos(prompt_base), letra
+
+        exemplos = self.selecionar_exemplos(prompt_base, text)
+        if not exemplos:
+            return prompt_base, letra
+        return prompt_base, f"{self._formatar_exemplos(exemplos)}\n{letra}"
+
+    def obter_contexto_prefixo(self, prefixo: str) -> List[int]:
+        """Avalia o prefixo no modelo uma vez e guarda os tokens de contexto.
+
+        As chamadas seguintes enviam esse ``context`` e só a parte variável do
+        prompt, então o servidor não reprocessa as instruções fixas.
+        """
+        contexto = self._contextos.get(prefixo)
+        if contexto is not None:
+            return contexto
+
+        with self._lock_contexto:
+            contexto = self._contextos.get(prefixo)
+            if contexto is None:
+                logger.info("Avaliando prefixo do prompt para reutilização de contexto...")
+                response = self._chamar(
+                    model=self.model,
+                    prompt=prefixo,
+                    options={**self.options, 'num_predict': 1},
+                    keep_alive=self.keep_alive,
+                )
+                contexto = list(response.get('context') or [])
+                if not contexto:
+                    raise RuntimeError("O servidor Ollama não retornou tokens de contexto para o prefixo")
+                self._contextos[prefixo] = contexto
+        return contexto
+
+    def parse_response(self, response: str) -> Dict[str, Any]:
+        """Converte a resposta do modelo em um dicionário estruturado"""
+        logger.debug(f"Resposta recebida: {response[:200]}...")
+        result = parsear_resposta(response).para_dict()
+        logger.debug(f"Resultado parseado: {result}")
+        return result
+
+    def is_valid_response(self, result: Dict[str, Any]) -> bool:
+        """Valida se a resposta contém os campos necessários e não está vazia"""
+        if not result:
+            return False
+            
+        # Verifica se tem nível de toxicidade válido
+        valid_levels = ['na', 'muito baixo', 'baixo', 'moderado', 'alto', 'muito alto']
+        if result.get('nivel_toxicidade', '').lower() not in valid_levels:
+            return False
+            
+        # Se o nível não é 'na', deve ter justificativa
+        if result.get('nivel_toxicidade', '').lower() != 'na' and not result.get('justificativa', '').strip():
+            return False
+            
+        return True
+
+    def analyze_text(
+        self,
+        text: str,
+        prompt: str,
+        max_retries: int = 3,
+        indice: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Analisa texto com retry automático em caso de resposta inválida.
+
+        A letra passa antes por ``preparar_letra``; letras longas são
+        classificadas por janela e os resultados mesclados com
+        ``mesclar_janelas``.
+        """
+        metricas = MetricasMusica(indice)
+        result = None
+        try:
+            with metricas.etapa("preprocessamento"):
+                janelas = self.preparar_letra(prompt, text)
+            if len(janelas) > 1:
+                logger.debug(f"Letra dividida em {len(janelas)} janelas")
+            analisar = self._analisar if self.modelo_triagem is None else self._analisar_cascata
+            result = mesclar_janelas([analisar(janela, prompt, max_retries, metricas) for janela in janelas])
+            return result
+        finally:
+            metricas.finalizar(result is not None)
+            if self.metricas is not None:
+                self.metricas.registrar(metricas)
+
+    def _analisar(
+        self,
+        text: str,
+        prompt: str,
+        max_retries: int,
+        metricas: MetricasMusica,
+    ) -> Optional[Dict[str, Any]]:
+        chave = None
+        if self.cache is not None:
+            with metricas.etapa("cache"):
+                chave = self.chave_cache(prompt, text)
+                result = self.cache.obter(chave)
+            if result is not None:
+                metricas.cache = True
+                logger.debug("✅ Resposta obtida do cache")
+                return result
+
+        with metricas.etapa("montagem_prompt"):
+            prefixo, variavel = self.montar_prompt(prompt, text)
+        self._contar("musicas")
+
+        for attempt in range(max_retries):
+            if attempt and not self._permitir_retry():
+                logger.warning("⚠️ Orçamento de retries da execução esgotado")
+                break
+            try:
+                logger.debug(f"Tentativa {attempt + 1}/{max_retries}")
+                self._contar("tentativas")
+                metricas.tentativas += 1
+                
+                with metricas.etapa("requisicao"):
+                    if self.reutilizar_contexto:
+                        response = self._gerar(variavel, context=self.obter_contexto_prefixo(prefixo))
+                    else:
+                        response = self._gerar(f"{prefixo}\n\n{variavel}")
+                metricas.registrar_resposta(response)
+                if self.cascata is not None:
+                    self.cascata.registrar_chamada(self.model, response)
+                
+                if response and response.get('response'):
+                    with metricas.etapa("parse"):
+                        parseada = parsear_resposta(response['response'])
+                        result = parseada.para_dict()
+                    
+                    with metricas.etapa("validacao"):
+                        # Um nível que não veio na resposta não conta como "na"
+                        valido = parseada.parseado('nivel_toxicidade') and self.is_valid_response(result)
+                    if valido:
+                        logger.debug(f"✅ Resposta válida obtida na tentativa {attempt + 1}")
+                        if chave is not None:
+                            self.cache.guardar(chave, result)
+                        return result
+                    else:
+                        self._contar("respostas_invalidas")
+                        logger.debug(f"⚠️ Resposta inválida na tentativa {attempt + 1}: {result}")
+                        
+                else:
+                    self._contar("respostas_invalidas")
+                    logger.debug(f"⚠️ Resposta vazia na tentativa {attempt + 1}")
+                    
+            except Exception as e:
+                self._contar("erros")
+                logger.warning(f"❌ Erro de {tipo_erro(e)} na tentativa {attempt + 1}: {e}")
+                if self.agendador is not None and tipo_erro(e) == TRANSPORTE:
+                    # O agendador já repetiu as falhas de transporte com
+                    # backoff; repetir aqui só aumentaria a carga no servidor.
+                    # Erros de saída seguem usando as tentativas restantes
+                    break
+                
+        self._contar("falhas")
+        logger.warning(f"❌ Falha após {metricas.tentativas} tentativas")
+        return None
+
+    def _analisar_cascata(
+        self,
+        text: str,
+        prompt: str,
+        max_retries: int,
+        metricas: MetricasMusica,
+    ) -> Optional[Dict[str, Any]]:
+        """Classifica com o modelo de triagem e escala ao modelo principal se houver dúvida."""
+        if self.cache is not None:
+            # Uma classificação do modelo principal já guardada dispensa a triagem
+            with metricas.etapa("cache"):
+                result = self.cache.obter(self.chave_cache(prompt, text))
+            if result is not None:
+                metricas.cache = True
+                return result
+
+        triagem, confianca = self._triar(text, prompt, metricas)
+        motivo = motivo_escalada(triagem, confianca, self.limiar_confianca)
+        self.cascata.registrar_triagem(motivo, confianca)
+        if motivo is None and not self.cascata.na_amostra(text):
+            return triagem
+
+        logger.debug(f"Escalando para {self.model}: {motivo or CALIBRACAO} (confiança {confianca})")
+        result = self._analisar(text, prompt, max_retries, metricas)
+        if motivo is None:
+            if result is not None:
+                self.cascata.registrar_calibracao(triagem, result)
+            # Na calibração vale a classificação do modelo principal
+            return result or triagem
+        return result
+
+    def _triar(
+        self,
+        text: str,
+        prompt: str,
+        metricas: MetricasMusica,
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[float]]:
+        """Uma chamada ao modelo de triagem: ``(resultado válido ou None, confiança no nível)``.
+
+        Não passa pelo cache nem repete respostas inválidas: na dúvida a
+        música vai para o modelo principal.
+        """
+        with metricas.etapa("montagem_prompt"):
+            prefixo, variavel = self.montar_prompt(prompt, text)
+        try:
+            with metricas.etapa("triagem"):
+                # Os tokens de contexto são do modelo principal: a triagem
+                # sempre envia o prompt completo
+                response = self._gerar(f"{prefixo}\n\n{variavel}", modelo=self.modelo_triagem, logprobs=True)
+        except Exception as e:
+            logger.warning(f"❌ Erro de {tipo_erro(e)} na triagem: {e}")
+            return None, None
+        metricas.registrar_resposta(response)
+        self.cascata.registrar_chamada(self.modelo_triagem, response)
+
+        texto = (response or {}).get('response') or ""
+        parseada = parsear_resposta(texto)
+        result = parseada.para_dict()
+        if not (parseada.parseado('nivel_toxicidade') and self.is_valid_response(result)):
+            return None, None
+        return result, confianca_nivel(texto, response.get('logprobs'))
+
+    def analyze_batch(
+        self,
+        musicas: Sequence[Tuple[int, str]],
+        prompt: str,
+        max_retries: int = 3,
+    ) -> Dict[int, Optional[Dict[str, Any]]]:
+        """Classifica várias músicas ``(indice, letra)`` em chamadas em lote.
+
+        Cada chamada leva até ``tamanho_lote`` letras, identificadas por id, e
+        pede um array JSON com uma classificação por letra; assim as instruções
+        e os exemplos são enviados uma vez por lote e não uma vez por música.
+        As músicas cuja entrada falta ou é inválida voltam para a fila e seguem
+        em um próximo lote; depois de ``max_retries`` tentativas a música falha
+        (resultado ``None``). Devolve os resultados por ``indice``.
+        """
+        # Letras que precisam de mais de uma janela seguem uma a uma
+        preparadas = []
+        resultados: Dict[int, Optional[Dict[str, Any]]] = {}
+        for indice, text in musicas:
+            janelas = self.preparar_letra(prompt, text)
+            if len(janelas) > 1:
+                resultados[indice] = self.analyze_text(text, prompt, max_retries, indice=indice)
+            else:
+                preparadas.append((indice, janelas[0]))
+
+        metricas = {indice: MetricasMusica(indice) for indice, _ in preparadas}
+        pendentes: Deque[Tuple[int, str]] = deque()
+        for indice, text in preparadas:
+            if self.cache is not None:
+                with metricas[indice].etapa("cache"):
+                    result = self.cache.obter(self.chave_cache(prompt, text))
+                if result is not None:
+                    metricas[indice].cache = True
+                    resultados[indice] = result
+                    continue
+            self._contar("musicas")
+            pendentes.append((indice, text))
+
+        tentativas: Dict[int, int] = {}
+        while pendentes:
+            lote = self._proximo_lote(pendentes, prompt)
+            validos = self._analisar_lote(lote, prompt, metricas)
+            for indice, text in lote:
+                result = validos.get(indice)
+                if result is not None:
+                    resultados[indice] = result
+                    if self.cache is not None:
+                        self.cache.guardar(self.chave_cache(prompt, text), result)
+                    continue
+                tentativas[indice] = tentativas.get(indice, 0) + 1
+                if tentativas[indice] < max_retries and self._permitir_retry():
+                    pendentes.append((indice, text))
+                else:
+                    self._contar("falhas")
+                    logger.warning(f"❌ Falha após {max_retries} tentativas em lote: música {indice}")
+                    resultados[indice] = None
+
+        for indice, metricas_musica in metricas.items():
+            metricas_musica.finalizar(resultados.get(indice) is not None)
+            if self.metricas is not None:
+                self.metricas.registrar(metricas_musica)
+        return resultados
+
+    def _reserva_exemplos(self, prompt_base: str) -> int:
+        """Tokens reservados para os exemplos no prompt de um lote."""
+        if self.orcamento_exemplos is None or not self.exemplos_manuais:
+            return estimar_tokens(self.gerar_prompt_com_exemplos(prompt_base)) - estimar_tokens(prompt_base)
+        return self.orcamento_exemplos
+
+    def _proximo_lote(self, pendentes: Deque[Tuple[int, str]], prompt_base: str) -> List[Tuple[int, str]]:
+        """Retira da fila as próximas músicas que cabem juntas no ``num_ctx``.
+
+        Cada música ocupa os tokens da letra mais ``NUM_PREDICT_ESTRUTURADO``
+        para a sua resposta. O lote tem ao menos uma música, mesmo que ela
+        sozinha não caiba (o mesmo que acontece no modo de uma música).
+        """
+        disponivel = (
+            self.options['num_ctx']
+            - estimar_tokens(prompt_base)
+            - self._reserva_exemplos(prompt_base)
+        )
+        lote = [pendentes.popleft()]
+        usado = estimar_tokens(lote[0][1]) + NUM_PREDICT_ESTRUTURADO
+        while pendentes and len(lote) < self.tamanho_lote:
+            custo = estimar_tokens(pendentes[0][1]) + NUM_PREDICT_ESTRUTURADO
+            if usado + custo > disponivel:
+                break
+            lote.append(pendentes.popleft())
+            usado += custo
+        return lote
+
+    def montar_prompt_lote(self, prompt_base: str, lote: Sequence[Tuple[int, str]]) -> Tuple[str, str]:
+        """Monta o prompt de um lote como ``(prefixo fixo, parte variável)``.
+
+        As letras recebem ids de 1 a N na ordem do lote. Com orçamento de
+        exemplos, os exemplos são escolhidos pela semelhança com o conjunto das
+        letras do lote.
+        """
+        letras = "\n\n".join(f"{MARCADOR_LOTE}{i} ===\n{text}" for i, (_, text) in enumerate(lote, start=1))
+        variavel = (
+            f"AGORA ANALISE AS {len(lote)} LETRAS ABAIXO, cada uma identificada pelo seu id.\n"
+            f"Responda somente com um array JSON com exatamente {len(lote)} objetos, um por letra, "
+            "cada um com os campos id, nivel_toxicidade, abuso_emocional, ciume_possessividade, "
+            "dependencia, objetificacao, violencia_traicao e justificativa.\n\n"
+            f"{letras}"
+        )
+        if self.orcamento_exemplos is None or not self.exemplos_manuais:
+            return self.gerar_prompt_com_exemplos(prompt_base), variavel
+
+        exemplos = self.selecionar_exemplos(prompt_base, "\n".join(text for _, text in lote))
+        if not exemplos:
+            return prompt_base, variavel
+        return prompt_base, f"{self._formatar_exemplos(exemplos)}\n{variavel}"
+
+    def _analisar_lote(
+        self,
+        lote: List[Tuple[int, str]],
+        prompt: str,
+        metricas: Dict[int, MetricasMusica],
+    ) -> Dict[int, Dict[str, Any]]:
+        """Faz uma chamada para o lote e devolve os resultados válidos por ``indice``."""
+        # As etapas e contagens da chamada são divididas entre as músicas do lote
+        metricas_lote = MetricasMusica()
+        validos: Dict[int, Dict[str, Any]] = {}
+        try:
+            with metricas_lote.etapa("montagem_prompt"):
+                prefixo, variavel = self.montar_prompt_lote(prompt, lote)
+            for _ in lote:
+                self._contar("tentativas")
+
+            with metricas_lote.etapa("requisicao"):
+                if self.reutilizar_contexto:
+                    response = self._gerar(variavel, context=self.obter_contexto_prefixo(prefixo), lote=len(lote))
+                else:
+                    response = self._gerar(f"{prefixo}\n\n{variavel}", lote=len(lote))
+            metricas_lote.registrar_resposta(response)
+
+            with metricas_lote.etapa("parse"):
+                parseadas = parsear_lote((response or {}).get('response') or "")
+
+            with metricas_lote.etapa("validacao"):
+                for posicao, (indice, _) in enumerate(lote, start=1):
+                    parseada = parseadas.get(posicao)
+                    result = parseada.para_dict() if parseada is not None else None
+                    if result is not None and parseada.parseado('nivel_toxicidade') and self.is_valid_response(result):
+                        validos[indice] = result
+                    else:
+                        self._contar("respostas_invalidas")
+            logger.debug(f"Lote de {len(lote)} músicas: {len(validos)} respostas válidas")
+        except Exception as e:
+            self._contar("erros")
+            logger.warning(f"❌ Erro de {tipo_erro(e)} no lote de {len(lote)} músicas: {e}")
+        finally:
+            for indice, _ in lote:
+                metricas[indice].somar_parcela(metricas_lote, len(lote))
+        return validos
+
+    def _gerar(
+        self,
+        prompt: str,
+        context: Optional[List[int]] = None,
+        lote: int = 0,
+        modelo: Optional[str] = None,
+        logprobs: bool = False,
+    ):
+        """Faz uma chamada de geração com as opções do analisador.
+
+        Com ``lote`` > 0 a chamada pede um array com esse número de
+        classificações e o limite de tokens gerados cresce na mesma proporção.
+        ``modelo`` substitui o modelo principal e ``logprobs`` pede as
+        log-probabilidades dos tokens gerados (usadas na triagem).
+        """
+        if lote:
+            formato = SCHEMA_LOTE if self.modo_estruturado else None
+            options = {**self.options, 'num_predict': NUM_PREDICT_ESTRUTURADO * lote}
+        else:
+            formato = SCHEMA_RESPOSTA if self.modo_estruturado else None
+            options = self.options
+        extras = {'logprobs': True, 'top_logprobs': TOP_LOGPROBS_TRIAGEM} if logprobs else {}
+        return self._chamar(
+            model=modelo or self.model,
+            prompt=prompt,
+            context=context,
+            format=formato,
+            options=options,
+            keep_alive=self.keep_alive,
+            **extras,
+        )
+
+    def _chamar(self, **kwargs: Any):
+        gerar = self.pool.generate if self.pool is not None else ollama.generate
+        if self.agendador is not None:
+            return self.agendador.executar(gerar, **kwargs)
+        return gerar(**kwargs)
+
+    def _permitir_retry(self) -> bool:
+        return self.agendador is None or self.agendador.permitir_retry()
+
+def mesclar_janelas(resultados: Sequence[Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """Junta as classificações das janelas de uma letra.
+
+    Vale o maior nível, cada flag é o OU das janelas e as justificativas das
+    janelas com elementos tóxicos são concatenadas. Se alguma janela falhou a
+    música inteira falha (``None``), para não subestimar a toxicidade.
+    """
+    if any(result is None for result in resultados):
+        return None
+    if len(resultados) == 1:
+        return resultados[0]
+
+    niveis = [str(r.get("nivel_toxicidade", "na")).strip().lower() for r in resultados]
+    mesclado: Dict[str, Any] = {"nivel_toxicidade": max(niveis, key=lambda n: NIVEL_NUMERICO.get(n, 0.0))}
+    for campo in CAMPOS_BOOLEANOS:
+        mesclado[campo] = any(bool(r.get(campo)) for r in resultados)
+
+    justificativas = []
+    for nivel, result in zip(niveis, resultados):
+        texto = str(result.get("justificativa", "")).strip()
+        if nivel != "na" and texto and texto not in justificativas:
+            justificativas.append(texto)
+    mesclado["justificativa"] = " | ".join(justificativas) or resultados[0].get("justificativa", "")
+    return mesclado
+
+def carregar_exemplos_manuais(analyzer: OllamaAnalyzer, csv_path: str):
+    """Carrega os exemplos de classificação manual para o analisador"""
+    try:
+        # O nível "NA" (sem toxicidade) não deve ser lido como valor ausente
+        df_manual = pd.read_csv(csv_path, keep_default_na=False)
+        print(f"\nCarregando {len(df_manual)} exemplos de classificação manual...")
+        
+        for idx, row in df_manual.iterrows():
+            try:
+                letra = row['Letra'] if 'Letra' in df_manual.columns else None
+                if 'Pontuacao_manual' in df_manual.columns:
+                    nivel = row['Pontuacao_manual']
+                elif 'Nivel_de_toxicidade' in df_manual.columns:
+                    nivel = row['Nivel_de_toxicidade']
+                else:
+                    nivel = None
+                justificativa = row['Justificativa'] if 'Justificativa' in df_manual.columns else None
+                
+                if letra and nivel:
+                    analyzer.add_exemplo_manual(
+                        letra=letra,
+                        score=str(nivel).strip().lower(),
+                        justificativa=str(justificativa) if justificativa is not None else ""
+                    )
+            except Exception as e:
+                print(f"⚠️ Erro ao processar exemplo {idx}: {e}")
+                continue
+        
+        print("✅ Exemplos manuais carregados com sucesso!")
+    except Exception as e:
+        print(f"⚠️ Erro ao carregar exemplos manuais: {e}")
+
+def _classificar_linhas(
+    analyzer: OllamaAnalyzer,
+    musicas: Iterable[Musica],
+    prompt: str,
+    concorrencia: int = 1,
+    pre_filtro: Optional[PreFiltro] = None,
+) -> Iterator[Tuple[Musica, Optional[Dict[str, Any]]]]:
+    """Classifica as músicas e devolve ``(musica, resultado)`` conforme terminam.
+
+    Mantém no máximo ``concorrencia`` unidades de trabalho em voo: novas
+    músicas só são consumidas do iterador quando uma das anteriores termina,
+    então a memória não cresce com o tamanho do corpus. Cada música passa pelo
+    mesmo ``analyze_text`` (com suas tentativas) do modo sequencial; com
+    ``analyzer.tamanho_lote > 1`` a unidade é um grupo de músicas enviado ao
+    ``analyze_batch``. Músicas que o ``pre_filtro`` descarta saem direto como
+    ``"na"``, sem chamar o modelo.
+    """
+    def grupos() -> Iterator[Tuple[List[Musica], bool]]:
+        # Devolve ``(músicas, descartadas)``; as descartadas saem uma a uma
+        grupo: List[Musica] = []
+        for musica in musicas:
+            if pre_filtro is not None and pre_filtro.descartar(musica.letra):
+                yield [musica], True
+                continue
+            grupo.append(musica)
+            if len(grupo) >= analyzer.tamanho_lote:
+                yield grupo, False
+                grupo = []
+        if grupo:
+            yield grupo, False
+
+    def classificar(grupo: List[Musica]) -> List[Tuple[Musica, Optional[Dict[str, Any]]]]:
+        if analyzer.tamanho_lote <= 1:
+            return [(musica, analyzer.analyze_text(musica.letra, prompt, indice=musica.indice)) for musica in grupo]
+        resultados = analyzer.analyze_batch([(musica.indice, musica.letra) for musica in grupo], prompt)
+        return [(musica, resultados.get(musica.indice)) for musica in grupo]
+
+    if concorrencia <= 1:
+        for grupo, descartado in grupos():
+            if descartado:
+                yield grupo[0], dict(RESULTADO_PRE_FILTRO)
+                continue
+            yield from classificar(grupo)
+        return
+
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        em_voo = {}
+        pendentes = grupos()
+        esgotado = False
+        while em_voo or not esgotado:
+            while not esgotado and len(em_voo) < concorrencia:
+                try:
+                    grupo, descartado = next(pendentes)
+                except StopIteration:
+                    esgotado = True
+                    break
+                if descartado:
+                    yield grupo[0], dict(RESULTADO_PRE_FILTRO)
+                    continue
+                futuro = executor.submit(classificar, grupo)
+                em_voo[futuro] = grupo
+
+            if not em_voo:
+                break
+
+            prontos, _ = wait(em_voo, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                grupo = em_voo.pop(futuro)
+                try:
+                    yield from futuro.result()
+                except Exception as e:
+                    for musica in grupo:
+                        logger.error(f"❌ Erro ao analisar {musica.indice}: {e}")
+                        yield musica, None
+
+def analise_conteudo_toxico(
+    df: Union[pd.DataFrame, Iterable[Musica]],
+    concorrencia: int = 1,
+    analyzer: Optional[OllamaAnalyzer] = None,
+    checkpoint: Optional[CheckpointStore] = None,
+    pre_filtro: Optional[PreFiltro] = None,
+    prompt: str = PROMPT_CLASSIFICACAO,
+) -> pd.DataFrame:
+    """Classifica as letras do DataFrame ou de um fluxo de ``Musica``.
+
+    Um iterador (por exemplo ``ingestao.ler_musicas``) é consumido aos poucos,
+    sem carregar o corpus inteiro na memória.
+
+    Com ``concorrencia > 1`` até esse número de músicas fica em processamento
+    simultâneo no servidor Ollama (configure ``OLLAMA_NUM_PARALLEL`` no servidor
+    para que ele atenda as requisições em paralelo). O resultado continua
+    ordenado por ``indice``. Um ``analyzer`` já configurado pode ser passado;
+    se ele ainda não tiver exemplos manuais, os exemplos padrão são carregados.
+
+    Com um ``checkpoint`` cada resultado é gravado em disco assim que fica
+    pronto, as músicas já presentes nele (mesmo ``indice``, mesma letra e
+    mesma ``impressao``) são puladas e o DataFrame devolvido é gerado a
+    partir do armazenamento, só com as músicas lidas nesta execução.
+
+    Com ``analyzer.tamanho_lote > 1`` as músicas são enviadas em lotes
+    (``OllamaAnalyzer.analyze_batch``) e ``concorrencia`` passa a contar lotes.
+
+    Com um ``pre_filtro`` as músicas que ele considera sem relacionamento
+    amoroso são registradas como ``"na"`` sem chamar o LLM; a coluna
+    ``origem`` indica se o resultado veio do ``"llm"`` ou do ``"pre_filtro"``.
+
+    Os registros gravados no ``checkpoint`` levam a ``impressao`` da
+    configuração (``OllamaAnalyzer.impressao``), usada pelo ``planejador.py``
+    para reclassificar só o que ficou desatualizado.
+    """
+    if isinstance(df, pd.DataFrame):
+        print("\nColunas disponíveis no dataset:")
+        print(df.columns.tolist())
+        total = len(df)
+        musicas = musicas_de_dataframe(df)
+    else:
+        total = len(df) if hasattr(df, "__len__") else None
+        musicas = iter(df)
+
+    if analyzer is None:
+        analyzer = OllamaAnalyzer()
     
     # Carrega exemplos de classificação manual
-    carregar_exemplos_manuais(analyzer, '../data/30-musicas-Mozart.csv')
+    if not analyzer.exemplos_manuais:
+        carregar_exemplos_manuais(analyzer, EXEMPLOS_PADRAO)
 
     resultados = []
     os.makedirs("results", exist_ok=True)
 
-    # TESTE: Limita a 3 músicas para validar melhorias
-    total = len(df)
-    print(f"🧪 MODO TESTE: Analisando apenas {total} músicas para validar melhorias")
-    
-    for idx, row in df.head(total).iterrows():
-        print(f"\nAnalisando {idx + 1}/{total} - {row[coluna_titulo]}")
+    if total is not None:
+        print(f"Analisando {total} músicas")
+    if concorrencia > 1:
+        print(f"⚡ Modo concorrente: até {concorrencia} músicas em paralelo")
+    if analyzer.tamanho_lote > 1:
+        print(f"📦 Modo lote: até {analyzer.tamanho_lote} músicas por chamada")
+
+    impressao = analyzer.impressao(prompt)
+    concluidas_antes = checkpoint.chaves_concluidas() if checkpoint is not None else set()
+    atuais = sum(1 for chave in concluidas_antes if chave[2] == impressao)
+    if atuais:
+        print(f"↩️ Retomando execução: {atuais} músicas já classificadas em {checkpoint.path}")
+    if len(concluidas_antes) > atuais:
+        print(f"🔁 {len(concluidas_antes) - atuais} resultados com outra configuração serão reclassificados")
+
+    # Índices lidos nesta execução, inclusive os pulados por já estarem no checkpoint
+    lidos = set()
+
+    def pendentes():
+        for musica in musicas:
+            lidos.add(musica.indice)
+            if (musica.indice, hash_letra(musica.letra), impressao) not in concluidas_antes:
+                yield musica
+
+    concluidas = 0
+    for musica, result in _classificar_linhas(
+        analyzer, pendentes(), prompt, concorrencia, pre_filtro
+    ):
+        concluidas += 1
+        progresso = f"{concluidas}/{total}" if total is not None else str(concluidas)
+        logger.debug(f"Analisada {progresso} - {musica.titulo}")
+        if concluidas % 100 == 0:
+            logger.info(f"Progresso: {progresso} músicas analisadas")
 
-        result = analyzer.analyze_text(row[coluna_letra], prompt)
         if result:
             try:
-                resultados.append({
-                    "indice": idx,
-                    "titulo": row[coluna_titulo],
-                    "artista": row[coluna_artista],
-                    "ano": row[coluna_ano] if coluna_ano in df.columns else None,
+                registro = {
+                    "indice": musica.indice,
+                    "titulo": musica.titulo,
+                    "artista": musica.artista,
+                    "ano": musica.ano,
                     "nivel_toxicidade": result.get("nivel_toxicidade", "NA"),
                     "abuso_emocional": result.get("abuso_emocional", False),
                     "ciume_possessividade": result.get("ciume_possessividade", False),
                     "dependencia": result.get("dependencia", False),
                     "objetificacao": result.get("objetificacao", False),
                     "violencia_traicao": result.get("violencia_traicao", False),
-                    "justificativa": result.get("justificativa", "")
-                })
-
-                print(f"→ Nível de toxicidade: {result.get('nivel_toxicidade', 'NA')}")
+                    "justificativa": result.get("justificativa", ""),
+                    "origem": result.get("origem", "llm"),
+                }
+                if checkpoint is not None:
+                    checkpoint.registrar({**registro, "hash_letra": hash_letra(musica.letra), "impressao": impressao})
+                else:
+                    resultados.append(registro)
 
-                # Salva a cada 100 análises
-                if (idx + 1) % 100 == 0:
-                    parcial_path = f"results/parcial_{idx + 1}.csv"
-                    pd.DataFrame(resultados).to_csv(parcial_path, index=False)
-                    print(f"[Salvo parcial em: {parcial_path}]")
+                logger.debug(f"→ Nível de toxicidade: {result.get('nivel_toxicidade', 'NA')}")
 
             except Exception as e:
-                print(f"Erro ao processar resultado: {e}")
+                logger.error(f"Erro ao processar resultado: {e}")
         else:
-            print("Resposta nula do modelo.")
+            logger.warning(f"Resposta nula do modelo para {musica.indice} - {musica.titulo}")
+
+    if checkpoint is not None:
+        return checkpoint.para_dataframe(indices=lidos)
 
+    # No modo concorrente as músicas terminam fora de ordem
+    resultados.sort(key=lambda r: r["indice"])
     return pd.DataFrame(resultados)
 
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Classifica letras de músicas quanto a relacionamentos tóxicos usando Ollama."
+    )
+    parser.add_argument(
+        "dataset",
+        nargs="?",
+        default="../data/all_songs_data.csv",
+        help="Arquivo com as músicas a classificar (CSV, JSONL ou Parquet com Song Title, Artist, Lyrics e Year).",
+    )
+    parser.add_argument(
+        "--tamanho-bloco",
+        type=int,
+        default=1000,
+        help="Número de linhas lidas do dataset por vez.",
+    )
+    parser.add_argument(
+        "-c",
+        "--concorrencia",
+        type=int,
+        default=1,
+        help="Número máximo de músicas em processamento simultâneo no servidor Ollama.",
+    )
+    parser.add_argument(
+        "--reutilizar-contexto",
+        action="store_true",
+        help="Avalia o prefixo (instruções + exemplos) uma vez e reaproveita o contexto do modelo em cada música.",
+    )
+    parser.add_argument(
+        "--orcamento-exemplos",
+        type=int,
+        default=3000,
+        help="Máximo de tokens de exemplos manuais por música (os mais parecidos com a letra). Use 0 para enviar todos.",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="Arquivo JSONL onde cada resultado é gravado assim que fica pronto; permite retomar execuções interrompidas (padrão: results/checkpoint_<nome do dataset>.jsonl).",
+    )
+    parser.add_argument(
+        "--cache",
+        default="results/cache_respostas.sqlite",
+        help="Arquivo SQLite do cache de respostas (chave: modelo, opções, prompt, exemplos e letra).",
+    )
+    parser.add_argument(
+        "--cache-max-entradas",
+        type=int,
+        default=100_000,
+        help="Número máximo de respostas no cache; as menos usadas recentemente são descartadas.",
+    )
+    parser.add_argument(
+        "--sem-cache",
+        action="store_true",
+        help="Ignora o cache de respostas e sempre consulta o modelo.",
+    )
+    parser.add_argument(
+        "--limpar-cache",
+        action="store_true",
+        help="Apaga todas as respostas do cache antes de começar.",
+    )
+    parser.add_argument(
+        "--concorrencia-fixa",
+        action="store_true",
+        help="Mantém sempre --concorrencia requisições em voo (sem o ajuste adaptativo pela latência e pelos erros).",
+    )
+    parser.add_argument(
+        "--max-retries-execucao",
+        type=int,
+        default=None,
+        help="Máximo de novas tentativas somadas em toda a execução.",
+    )
+    parser.add_argument(
+        "--proporcao-retries",
+        type=float,
+        default=0.5,
+        help="Novas tentativas permitidas como fração das chamadas ao modelo (orçamento da execução).",
+    )
+    parser.add_argument(
+        "--estruturado",
+        action="store_true",
+        help="Restringe a resposta do modelo a um esquema JSON (menos tentativas e respostas mais curtas).",
+    )
+    parser.add_argument(
+        "--referencia-retries",
+        default=None,
+        help="Resumo de métricas (metricas_<data>_resumo.json) de outra execução, por exemplo sem --estruturado, para comparar os retries por música.",
+    )
+    parser.add_argument(
+        "--tamanho-lote",
+        type=int,
+        default=1,
+        help="Máximo de músicas por chamada ao modelo (resposta em array JSON); 1 classifica uma música por vez.",
+    )
+    parser.add_argument(
+        "--letra-bruta",
+        action="store_true",
+        help="Envia a letra como veio do dataset, sem remover marcações de seção e refrões repetidos.",
+    )
+    parser.add_argument(
+        "--max-tokens-letra",
+        type=int,
+        default=None,
+        help="Tokens máximos de letra por chamada; letras maiores são divididas em janelas (padrão: o que cabe no num_ctx).",
+    )
+    parser.add_argument(
+        "--modelo-triagem",
+        default=None,
+        help="Modelo menor que classifica primeiro; só as músicas em que ele tem dúvida vão para o modelo principal.",
+    )
+    parser.add_argument(
+        "--limiar-confianca",
+        type=float,
+        default=0.8,
+        help="Probabilidade mínima do nível dada pelo modelo de triagem para aceitar a classificação dele.",
+    )
+    parser.add_argument(
+        "--taxa-calibracao",
+        type=float,
+        default=0.05,
+        help="Fração das músicas aceitas na triagem que também vão ao modelo principal para medir a concordância.",
+    )
+    parser.add_argument(
+        "--pre-filtro",
+        default=None,
+        help="Modelo do pré-filtro (gerado por pre_filtro.py); músicas claramente sem relacionamento vão direto para 'na'.",
+    )
+    parser.add_argument(
+        "--limiar-pre-filtro",
+        type=float,
+        default=None,
+        help="Probabilidade mínima de 'na' para pular o LLM (padrão: limiar salvo no modelo).",
+    )
+    parser.add_argument(
+        "--hosts",
+        default=None,
+        help="Lista de servidores Ollama separados por vírgula (ex.: http://gpu1:11434,http://gpu2:11434).",
+    )
+    parser.add_argument(
+        "--formato",
+        default="parquet",
+        choices=["parquet", "feather", "csv"],
+        help="Formato do arquivo final de resultados (parquet e feather requerem pyarrow; csv também gera o JSON).",
+    )
+    parser.add_argument(
+        "--exportar-csv",
+        action="store_true",
+        help="Também gera a visão CSV dos resultados (formatos parquet e feather).",
+    )
+    parser.add_argument(
+        "--exportar-json",
+        action="store_true",
+        help="Também gera a visão JSON dos resultados (formatos parquet e feather).",
+    )
+    parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Nível de log; DEBUG mostra cada tentativa e a resposta bruta do modelo.",
+    )
+    return parser.parse_args()
+
 def main():
-    try:
-        print("\n📊 Carregando dataset de músicas classificadas...")
-        df_manual = pd.read_csv("../data/30-musicas-Mozart.csv")
-        
-        print("\n📊 Carregando dataset de músicas para análise...")
-        df = pd.read_csv("../data/all_songs_data.csv")
-    except Exception as e:
-        print(f"Erro ao carregar o dataset: {e}")
+    args = _parse_args()
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(message)s")
+
+    if not os.path.exists(args.dataset):
+        print(f"Erro ao carregar o dataset: arquivo não encontrado: {args.dataset}")
         return
 
+    print(f"\n📊 Lendo músicas para análise em blocos de {args.tamanho_bloco}: {args.dataset}")
+    musicas = ler_musicas(args.dataset, tamanho_bloco=args.tamanho_bloco)
+
     print("\nAnalisando músicas para conteúdo tóxico em relacionamentos")
     print("=" * 60)
-    print("Modelo em uso: mistral:instruct")
+    cache = None
+    if not args.sem_cache:
+        cache = CacheRespostas(args.cache, max_entradas=args.cache_max_entradas)
+        if args.limpar_cache:
+            cache.invalidar()
+
+    pool = None
+    if args.hosts:
+        pool = PoolEndpoints([h.strip() for h in args.hosts.split(",") if h.strip()])
+        for host, ok in pool.verificar_saude().items():
+            print(f"{'✅' if ok else '❌'} Endpoint {host}")
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    metricas_path = f'results/metricas_{timestamp}.jsonl'
+    coletor = ColetorMetricas(metricas_path)
+
+    # Com concorrência, o número de requisições em voo começa em 1 e cresce
+    # até --concorrencia enquanto a latência e os erros permitirem
+    limitador = None
+    if args.concorrencia > 1 and not args.concorrencia_fixa:
+        limitador = LimitadorAIMD(maximo=args.concorrencia)
+    agendador = Agendador(
+        limitador=limitador,
+        orcamento=OrcamentoRetries(maximo=args.max_retries_execucao, proporcao=args.proporcao_retries),
+    )
+
+    analyzer = OllamaAnalyzer(
+        reutilizar_contexto=args.reutilizar_contexto,
+        orcamento_exemplos=args.orcamento_exemplos or None,
+        cache=cache,
+        modo_estruturado=args.estruturado,
+        pool=pool,
+        metricas=coletor,
+        tamanho_lote=args.tamanho_lote,
+        normalizar_letras=not args.letra_bruta,
+        max_tokens_letra=args.max_tokens_letra,
+        agendador=agendador,
+        modelo_triagem=args.modelo_triagem,
+        limiar_confianca=args.limiar_confianca,
+        taxa_calibracao=args.taxa_calibracao,
+    )
+    print(f"Modelo em uso: {analyzer.model}")
+    if analyzer.modelo_triagem is not None:
+        print(f"Modelo de triagem: {analyzer.modelo_triagem} (limiar de confiança {analyzer.limiar_confianca})")
     print("=" * 60)
 
-    resultados_df = analise_conteudo_toxico(df)
+    pre_filtro = None
+    if args.pre_filtro:
+        pre_filtro = PreFiltro.carregar(args.pre_filtro, limiar=args.limiar_pre_filtro)
+        print(f"Pré-filtro: {args.pre_filtro} (limiar {pre_filtro.limiar})")
+
+    checkpoint = CheckpointStore(args.checkpoint or checkpoint_padrao(args.dataset))
+    resultados_df = analise_conteudo_toxico(
+        musicas,
+        concorrencia=args.concorrencia,
+        analyzer=analyzer,
+        checkpoint=checkpoint,
+        pre_filtro=pre_filtro,
+    )
 
     if resultados_df.empty:
         print("Nenhum resultado retornado.")
         return
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    csv_path = f'results/relacionamentos_toxicos_{timestamp}.csv'
-    json_path = f'results/relacionamentos_toxicos_{timestamp}.json'
+    base_path = f'results/relacionamentos_toxicos_{timestamp}'
+    resumo_path = f'results/metricas_{timestamp}_resumo.json'
+
+    formato = args.formato
+    if formato != "csv" and not pyarrow_disponivel():
+        print("⚠️ pyarrow não está instalado: resultados salvos em CSV/JSON")
+        formato = "csv"
 
-    resultados_df.to_csv(csv_path, index=False)
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump(resultados_df.to_dict(orient='records'), f, ensure_ascii=False, indent=2)
+    if formato == "csv":
+        resultados_path = csv_path = f'{base_path}.csv'
+        json_path = f'{base_path}.json'
+        resultados_df = exportar_dataframe(resultados_df, csv_path, json_path)
+        salvos = [f"→ CSV: {csv_path}", f"→ JSON: {json_path}"]
+    else:
+        # Arquivo colunar com o hash e a impressão de cada resultado; CSV/JSON só se pedidos
+        resultados_path = f'{base_path}.{formato}'
+        csv_path = f'{base_path}.csv' if args.exportar_csv else None
+        json_path = f'{base_path}.json' if args.exportar_json else None
+        resultados_df = checkpoint.para_dataframe(incluir_impressao=True, indices=resultados_df["indice"])
+        salvar_resultados(resultados_df, resultados_path)
+        exportar_visoes(resultados_path, csv_path, json_path)
+        resultados_df = resultados_df.drop(columns=COLUNAS_IMPRESSAO, errors="ignore")
+        salvos = [f"→ {formato.capitalize()}: {resultados_path}"]
+        salvos += [f"→ CSV: {csv_path}"] if csv_path else []
+        salvos += [f"→ JSON: {json_path}"] if json_path else []
+    resumo = coletor.salvar_resumo(
+        resumo_path, extras={"modelo": analyzer.model, "modo_estruturado": analyzer.modo_estruturado}
+    )
 
     print(f"\n✅ Análise completa!")
-    print(f"Resultados salvos em:\n→ CSV: {csv_path}\n→ JSON: {json_path}")
+    print("Resultados salvos em:\n" + "\n".join(salvos))
+    print(f"→ Métricas: {metricas_path}\n→ Resumo das métricas: {resumo_path}")
+    # Níveis, flags e origem saem de uma única passada, já gravada no cache
+    # de agregados que o notebook lê (ver pos_processamento.py)
+    agregados = agregar(resultados_df)
+    agregados_path = salvar_agregados(agregados, resultados_path)
+    total = agregados["geral"]["total"]
+
+    print(f"→ Agregados: {agregados_path}")
     print(f"\nEstatísticas:")
-    print(f"→ Total analisado: {len(resultados_df)}")
+    print(f"→ Total analisado: {total}")
     
     # Contagem por nível de toxicidade
-    niveis = resultados_df['nivel_toxicidade'].value_counts()
+    niveis = agregados["niveis"]
     print("\nDistribuição por nível de toxicidade:")
-    for nivel, count in niveis.items():
-        print(f"→ {nivel}: {count} músicas ({(count/len(resultados_df)*100):.1f}%)")
+    for nivel, count in niveis[niveis > 0].sort_values(ascending=False).items():
+        print(f"→ {nivel}: {count} músicas ({(count/total*100):.1f}%)")
     
     # Contagem de elementos tóxicos
+    flags = agregados["flags"]
     print("\nPrevalência de elementos tóxicos:")
-    print(f"→ Abuso emocional: {resultados_df['abuso_emocional'].sum()} músicas")
-    print(f"→ Ciúme/possessividade: {resultados_df['ciume_possessividade'].sum()} músicas")
-    print(f"→ Dependência: {resultados_df['dependencia'].sum()} músicas")
-    print(f"→ Objetificação: {resultados_df['objetificacao'].sum()} músicas")
-    print(f"→ Violência/traição: {resultados_df['violencia_traicao'].sum()} músicas")
+    print(f"→ Abuso emocional: {flags['abuso_emocional']} músicas")
+    print(f"→ Ciúme/possessividade: {flags['ciume_possessividade']} músicas")
+    print(f"→ Dependência: {flags['dependencia']} músicas")
+    print(f"→ Objetificação: {flags['objetificacao']} músicas")
+    print(f"→ Violência/traição: {flags['violencia_traicao']} músicas")
+
+    if not agregados["origem"].empty:
+        print("\nOrigem das classificações:")
+        for origem, count in agregados["origem"].items():
+            print(f"→ {origem}: {count} músicas ({(count/total*100):.1f}%)")
+
+    stats = analyzer.estatisticas
+    print("\nChamadas ao modelo:")
+    print(f"→ Músicas enviadas ao modelo: {stats['musicas']} | Tentativas: {stats['tentativas']}")
+    print(f"→ Retries: {analyzer.retries()} ({stats['respostas_invalidas']} respostas inválidas, {stats['erros']} erros)")
+    if args.referencia_retries:
+        with open(args.referencia_retries, encoding="utf-8") as f:
+            referencia = json.load(f)
+        atual, anterior = resumo.get("retries_por_musica"), referencia.get("retries_por_musica")
+        if atual is None or anterior is None:
+            print(f"⚠️ Sem retries por música para comparar com {args.referencia_retries}")
+        else:
+            def modo(r: Dict[str, Any]) -> str:
+                if "modo_estruturado" not in r:
+                    return "modo não registrado"
+                return "estruturado" if r["modo_estruturado"] else "texto livre"
+
+            chamadas = resumo["musicas"] - resumo["respostas_do_cache"]
+            print(f"→ Retries por música: {atual:.3f} ({modo(resumo)}) contra {anterior:.3f} na referência ({modo(referencia)})")
+            print(f"→ Retries economizados nesta execução: {(anterior - atual) * chamadas:.0f} em {chamadas} músicas")
+
+    if analyzer.cascata is not None:
+        cascata = analyzer.cascata.resumo()
+        print("\nCascata de modelos:")
+        print(f"→ Escaladas para {analyzer.model}: {cascata['escaladas']} de {cascata['musicas']} "
+              f"({cascata['taxa_escalada']*100:.1f}%)")
+        for motivo, count in cascata["motivos"].items():
+            print(f"→ {motivo}: {count} músicas")
+        if cascata["sem_logprobs"]:
+            print(f"→ Sem logprobs na triagem: {cascata['sem_logprobs']} músicas (só validade e contradição contam)")
+        if cascata["calibradas"]:
+            print(f"→ Calibração ({cascata['calibradas']} músicas): nível igual em {cascata['concordancia_nivel']*100:.1f}% "
+                  f"| flags iguais em {cascata['concordancia_flags']*100:.1f}% "
+                  f"| distância média de nível {cascata['distancia_media_nivel']}")
+        tempos = " | ".join(f"{m} {t}s" for m, t in cascata["tempo_modelo_s"].items())
+        print(f"→ Tempo de modelo: {tempos} ({cascata['tempo_modelo_por_musica_s']}s por música)")
+
+    agendamento = agendador.estatisticas()
+    print("\nAgendamento:")
+    print(f"→ Erros de transporte: {agendamento['erros_transporte']} | de saída: {agendamento['erros_saida']} "
+          f"| Tempo em backoff: {agendamento['tempo_em_backoff_s']}s")
+    print(f"→ Retries do orçamento: {agendamento['retries_usados']} usados, {agendamento['retries_negados']} negados")
+    if limitador is not None:
+        print(f"→ Requisições em voo: média {agendamento['limite_medio']} | final {agendamento['limite_atual']} "
+              f"(máximo {args.concorrencia}, {agendamento['reducoes']} reduções)")
+
+    if 'latencia_p50_s' in resumo:
+        print("\nDesempenho:")
+        print(f"→ Latência por música: p50 {resumo['latencia_p50_s']}s | p95 {resumo['latencia_p95_s']}s")
+        print(f"→ Tokens/s: prompt {resumo['prompt_tokens_por_s']} | geração {resumo['tokens_gerados_por_s']}")
+        print(f"→ Tokens por música: prompt {resumo['prompt_tokens_por_musica']} | geração {resumo['tokens_gerados_por_musica']}")
+        print(f"→ Tempo de modelo por música: {resumo['tempo_modelo_por_musica_s']}s")
+        print(f"→ Retries por música: {resumo['retries_por_musica']} | Taxa de falha: {resumo['taxa_falha']*100:.1f}%")
+
+    if pool is not None:
+        print("\nEndpoints:")
+        for endpoint in pool.estatisticas():
+            print(f"→ {endpoint['host']}: {endpoint['requisicoes']} requisições, {endpoint['erros']} erros")
+
+    if cache is not None:
+        stats = cache.estatisticas()
+        print("\nCache de respostas:")
+        print(f"→ Hits: {stats['hits']} | Misses: {stats['misses']} ({stats['taxa_acerto']*100:.1f}% de acerto)")
+        print(f"→ Entradas armazenadas: {stats['entradas']}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,246 @@
+"""Parser de passada única das respostas do modelo.
+
+Uma única expressão regular pré-compilada localiza os campos da resposta,
+seja ela JSON, JSON no meio de texto ou linhas ``campo: valor``, com ou sem
+acentos nos nomes dos campos. O valor de cada campo vai do fim do seu nome
+até o início do campo seguinte. O resultado é tipado e informa, campo a
+campo, se o valor foi lido da resposta (``"parseado"``) ou se ficou com o
+valor padrão (``"padrao"``).
+"""
+
+import json
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+CAMPOS_BOOLEANOS = (
+    'abuso_emocional',
+    'ciume_possessividade',
+    'dependencia',
+    'objetificacao',
+    'violencia_traicao',
+)
+
+PARSEADO = "parseado"
+PADRAO = "padrao"
+
+# Nomes aceitos para cada campo (a comparação ignora acentos e caixa)
+_RE_CAMPO = re.compile(
+    r"""["']?\b(?:
+        (?P<nivel_toxicidade>n[ií]vel(?:[ _]de[ _]|[ _])toxicidade)
+      | (?P<abuso_emocional>abuso[ _]emocional)
+      | (?P<ciume_possessividade>ci[uú]mes?[ _/]possessividade)
+      | (?P<dependencia>depend[eê]ncia)
+      | (?P<objetificacao>objetifica[cç][aã]o)
+      | (?P<violencia_traicao>viol[eê]ncia[ _/]trai[cç][aã]o)
+      | (?P<justificativa>justificativa)
+    )["']?[ \t]*[:=][ \t]*""",
+    re.IGNORECASE | re.VERBOSE,
+)
+
+_RE_NIVEL = re.compile(r"\b(muito alto|muito baixo|moderado|alto|baixo|na|n/a|nao aplicavel)(?![a-z])")
+# Depois de uma string JSON vem o fim do objeto ou a próxima chave entre aspas
+_RE_FIM_VALOR = re.compile(r'\s*(?:\}|,\s*"[^"\n]*"\s*:)')
+_RE_PRIMEIRA_PALAVRA = re.compile(r"[a-z0-9]+")
+
+# Só palavras inteiras: letras soltas e dígitos ("s", "n", "1") aparecem no
+# começo de frases e números comuns nas respostas e virariam flags falsas
+_VERDADEIRO = frozenset({"true", "sim", "yes", "verdadeiro"})
+_FALSO = frozenset({"false", "nao", "no", "falso"})
+
+_RE_OBJETO = re.compile(r"\{[^{}]*\}")
+_RE_ID = re.compile(r"[\"']?\bid[\"']?\s*[:=]\s*[\"']?(\d+)")
+
+_DECODER = json.JSONDecoder()
+
+
+@dataclass
+class RespostaParseada:
+    """Classificação extraída de uma resposta, com a origem de cada campo."""
+
+    nivel_toxicidade: str = "na"
+    abuso_emocional: bool = False
+    ciume_possessividade: bool = False
+    dependencia: bool = False
+    objetificacao: bool = False
+    violencia_traicao: bool = False
+    justificativa: str = ""
+    origem: Dict[str, str] = field(default_factory=lambda: {
+        campo: PADRAO for campo in ('nivel_toxicidade', *CAMPOS_BOOLEANOS, 'justificativa')
+    })
+
+    def parseado(self, campo: str) -> bool:
+        return self.origem.get(campo) == PARSEADO
+
+    @property
+    def completa(self) -> bool:
+        """Todos os campos foram lidos da resposta."""
+        return all(valor == PARSEADO for valor in self.origem.values())
+
+    def para_dict(self) -> Dict[str, Any]:
+        return {
+            "nivel_toxicidade": self.nivel_toxicidade,
+            "abuso_emocional": self.abuso_emocional,
+            "ciume_possessividade": self.ciume_possessividade,
+            "dependencia": self.dependencia,
+            "objetificacao": self.objetificacao,
+            "violencia_traicao": self.violencia_traicao,
+            "justificativa": self.justificativa,
+        }
+
+
+def _sem_acentos(texto: str) -> str:
+    if texto.isascii():
+        return texto.lower()
+    decomposto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).lower()
+
+
+def _ler_booleano(valor: str) -> Optional[bool]:
+    if '|' in valor:
+        # O modelo repetiu o formato pedido: "[true|false]"
+        return None
+    palavra = _RE_PRIMEIRA_PALAVRA.search(_sem_acentos(valor))
+    if palavra is None:
+        return None
+    token = palavra.group(0)
+    if token in _VERDADEIRO:
+        return True
+    if token in _FALSO:
+        return False
+    return None
+
+
+def _ler_nivel(valor: str) -> Optional[str]:
+    if '|' in valor:
+        return None
+    nivel = _RE_NIVEL.search(_sem_acentos(valor))
+    if nivel is None:
+        return None
+    encontrado = nivel.group(1)
+    return 'na' if encontrado in ('n/a', 'nao aplicavel') else encontrado
+
+
+def _ler_texto(valor: str) -> str:
+    # Linhas "campo: valor": junta as linhas e remove o fechamento do JSON
+    texto = " ".join(linha.strip() for linha in valor.splitlines() if linha.strip())
+    # As aspas ficam: uma justificativa que começa e termina com uma citação
+    # da letra não é uma string JSON
+    return texto.rstrip('},').strip()
+
+
+def _atribuir(resultado: RespostaParseada, campo: str, valor: str, decodificado: bool) -> None:
+    if campo == 'justificativa':
+        texto = valor.strip() if decodificado else _ler_texto(valor)
+        if texto:
+            resultado.justificativa = texto
+            resultado.origem[campo] = PARSEADO
+        return
+
+    valor = valor.strip().strip('"\'')
+    if campo == 'nivel_toxicidade':
+        nivel = _ler_nivel(valor)
+        if nivel is not None:
+            resultado.nivel_toxicidade = nivel
+            resultado.origem[campo] = PARSEADO
+    else:
+        booleano = _ler_booleano(valor)
+        if booleano is not None:
+            setattr(resultado, campo, booleano)
+            resultado.origem[campo] = PARSEADO
+
+
+def parsear_resposta(resposta: str) -> RespostaParseada:
+    """Extrai a classificação de ``resposta`` em uma única passada.
+
+    Dentro de um objeto JSON (nome do campo entre aspas, ou valor seguido do
+    fim do objeto ou de outra chave entre aspas) o valor entre aspas é lido
+    como string JSON, então um nome de campo citado dentro da justificativa
+    não é confundido com um campo. Fora disso o valor vai até o próximo campo,
+    mesmo que comece com uma citação. Se o modelo repetir um campo, vale a
+    primeira ocorrência.
+    """
+    resultado = RespostaParseada()
+    if not resposta:
+        return resultado
+
+    match = _RE_CAMPO.search(resposta)
+    while match is not None:
+        campo = match.lastgroup
+        inicio = match.end()
+        valor = None
+        if resposta.startswith('"', inicio):
+            try:
+                valor, fim = _DECODER.raw_decode(resposta, inicio)
+            except json.JSONDecodeError:
+                valor = None
+        if isinstance(valor, str):
+            citado = resposta[match.start()] in "\"'"
+            if not citado and not _RE_FIM_VALOR.match(resposta, fim):
+                # Linha "campo: valor" que começa com uma citação da letra
+                valor = None
+        if isinstance(valor, str):
+            proximo = _RE_CAMPO.search(resposta, fim)
+            decodificado = True
+        else:
+            proximo = _RE_CAMPO.search(resposta, inicio)
+            valor = resposta[inicio:proximo.start() if proximo else len(resposta)]
+            decodificado = False
+
+        if resultado.origem[campo] != PARSEADO:
+            _atribuir(resultado, campo, valor, decodificado)
+        match = proximo
+    return resultado
+
+
+def trecho_nivel(resposta: str) -> Optional[Tuple[int, int]]:
+    """Posição ``(inicio, fim)`` do valor de ``nivel_toxicidade`` na resposta.
+
+    Usa a primeira ocorrência do campo, como ``parsear_resposta``. Devolve
+    ``None`` se o campo não aparece ou se o valor não é um nível conhecido.
+    """
+    for match in _RE_CAMPO.finditer(resposta or ""):
+        if match.lastgroup != 'nivel_toxicidade':
+            continue
+        inicio = match.end()
+        if resposta.startswith('"', inicio):
+            inicio += 1
+        nivel = _RE_NIVEL.match(_sem_acentos(resposta[inicio:inicio + 20]))
+        if nivel is None:
+            return None
+        return inicio, inicio + len(nivel.group(1))
+    return None
+
+
+def parsear_lote(resposta: str) -> Dict[int, RespostaParseada]:
+    """Extrai as classificações de uma resposta em lote, indexadas pelo ``id``.
+
+    Espera um array JSON de objetos com ``id``. Se o array estiver truncado ou
+    malformado, aproveita os objetos completos que houver; entradas sem ``id``
+    são ignoradas (a música correspondente volta para a fila).
+    """
+    itens: Dict[int, RespostaParseada] = {}
+    inicio = resposta.find('[')
+    if inicio != -1:
+        try:
+            dados, _ = _DECODER.raw_decode(resposta, inicio)
+        except json.JSONDecodeError:
+            dados = None
+        if isinstance(dados, list):
+            for item in dados:
+                if not isinstance(item, dict):
+                    continue
+                try:
+                    id_item = int(item.get("id"))
+                except (TypeError, ValueError):
+                    continue
+                itens.setdefault(id_item, parsear_resposta(json.dumps(item, ensure_ascii=False)))
+            return itens
+
+    for match in _RE_OBJETO.finditer(resposta):
+        objeto = match.group(0)
+        id_item = _RE_ID.search(objeto)
+        if id_item is not None:
+            itens.setdefault(int(id_item.group(1)), parsear_resposta(objeto))
+    return itens
@@ -0,0 +1,286 @@
+"""Reclassificação incremental: só as músicas afetadas por mudanças na configuração.
+
+Cada resultado gravado leva a ``impressao`` da configuração que o gerou
+(versão do prompt, modelo, opções de geração, conjunto de exemplos e
+pré-processamento das letras, ver ``OllamaAnalyzer.impressao``) e o
+``hash_letra`` da letra. O planejador
+compara esses valores com a configuração atual e com o dataset e separa as
+músicas desatualizadas, com o motivo de cada uma:
+
+- ``nova``: a música não está nos resultados;
+- ``letra``: a letra mudou no dataset;
+- ``sem_impressao``: resultado antigo, gravado antes da impressão digital;
+- ``prompt``, ``modelo``, ``opcoes``, ``exemplos``, ``preprocessamento``: a
+  parte da configuração que mudou.
+
+Só essas músicas (ou uma amostra delas, para comparar a configuração nova
+com a antiga) são reclassificadas, e os resultados novos substituem os
+antigos no arquivo de resultados. Uma amostra não é mesclada, a não ser com
+``--mesclar``: o arquivo ficaria com parte das músicas em cada configuração.
+
+Uso:
+    python planejador.py results/relacionamentos_toxicos_20250615_031911.parquet --plano
+    python planejador.py results/relacionamentos_toxicos_20250615_031911.parquet \\
+        --prompt prompts/prompt_v2.txt --amostra 200 --comparacao results/ab_prompt_v2.csv
+"""
+
+import argparse
+import json
+import logging
+import random
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from agendador import Agendador, LimitadorAIMD, OrcamentoRetries
+from checkpoint_store import CheckpointStore
+from formato_colunar import gravar_arquivo_resultados, ler_arquivo_resultados
+from ingestao import Musica, ler_musicas
+from letras import hash_letra
+from ollama_analysis import (
+    EXEMPLOS_PADRAO,
+    PROMPT_CLASSIFICACAO,
+    OllamaAnalyzer,
+    analise_conteudo_toxico,
+    carregar_exemplos_manuais,
+)
+from parser_resposta import CAMPOS_BOOLEANOS
+from pool_endpoints import PoolEndpoints
+from pre_filtro import PreFiltro
+from response_cache import CacheRespostas
+
+PARTES_IMPRESSAO = ("prompt", "modelo", "opcoes", "exemplos", "preprocessamento")
+
+
+@dataclass
+class Plano:
+    """Músicas desatualizadas (``indice`` → motivos) e quantas estão em dia."""
+
+    desatualizadas: Dict[int, List[str]] = field(default_factory=dict)
+    em_dia: int = 0
+
+    def motivos(self) -> Counter:
+        return Counter(motivo for motivos in self.desatualizadas.values() for motivo in motivos)
+
+
+def motivos_desatualizacao(
+    atual: Dict[str, Any],
+    impressao: Optional[str],
+    hash_atual: str,
+    hash_armazenado: Optional[str],
+) -> List[str]:
+    """Motivos pelos quais um resultado não corresponde à configuração ``atual``.
+
+    Resultados sem ``hash_letra`` não têm a letra conferida; sem
+    ``impressao`` eles são sempre considerados desatualizados.
+    """
+    motivos = []
+    if isinstance(hash_armazenado, str) and hash_armazenado != hash_atual:
+        motivos.append("letra")
+    if not isinstance(impressao, str) or not impressao:
+        return motivos + ["sem_impressao"]
+    try:
+        partes = json.loads(impressao)
+    except json.JSONDecodeError:
+        return motivos + ["sem_impressao"]
+    return motivos + [parte for parte in PARTES_IMPRESSAO if partes.get(parte) != atual.get(parte)]
+
+
+def planejar(resultados: pd.DataFrame, musicas: Iterable[Musica], impressao_atual: str) -> Plano:
+    """Compara os resultados gravados com o dataset e a configuração atual."""
+    atual = json.loads(impressao_atual)
+    colunas = [c for c in ("indice", "hash_letra", "impressao") if c in resultados.columns]
+    armazenados = {
+        int(registro["indice"]): registro
+        for registro in resultados[colunas].to_dict(orient="records")
+    }
+
+    plano = Plano()
+    for musica in musicas:
+        registro = armazenados.get(musica.indice)
+        if registro is None:
+            plano.desatualizadas[musica.indice] = ["nova"]
+            continue
+        motivos = motivos_desatualizacao(
+            atual, registro.get("impressao"), hash_letra(musica.letra), registro.get("hash_letra")
+        )
+        if motivos:
+            plano.desatualizadas[musica.indice] = motivos
+        else:
+            plano.em_dia += 1
+    return plano
+
+
+def amostrar(indices: Iterable[int], amostra: Optional[float], seed: int = 42) -> List[int]:
+    """Sorteia ``amostra`` músicas (fração se < 1, quantidade se >= 1)."""
+    indices = sorted(indices)
+    if amostra is None:
+        return indices
+    quantidade = round(len(indices) * amostra) if amostra < 1 else int(amostra)
+    return sorted(random.Random(seed).sample(indices, min(quantidade, len(indices))))
+
+
+def mesclar(resultados: pd.DataFrame, novos: pd.DataFrame) -> pd.DataFrame:
+    """Substitui em ``resultados`` as músicas reclassificadas em ``novos``."""
+    # Categorias de arquivos colunares não se misturam no concat
+    antigos = resultados.astype({c: object for c in resultados.select_dtypes("category").columns})
+    colunas = list(dict.fromkeys([*antigos.columns, *novos.columns]))
+    mesclado = pd.concat([antigos, novos], ignore_index=True)
+    mesclado = mesclado.drop_duplicates(subset="indice", keep="last").sort_values("indice")
+    return mesclado[colunas].reset_index(drop=True)
+
+
+def comparar(resultados: pd.DataFrame, novos: pd.DataFrame) -> pd.DataFrame:
+    """Resultado antigo e novo lado a lado, para as músicas que tinham os dois."""
+    campos = ["nivel_toxicidade", *CAMPOS_BOOLEANOS]
+    if novos.empty or not set(campos) <= set(resultados.columns):
+        return pd.DataFrame()
+    antigos = resultados[["indice", *campos]].astype({"nivel_toxicidade": str})
+    lado_a_lado = antigos.merge(
+        novos[["indice", "titulo", *campos]].astype({"nivel_toxicidade": str}),
+        on="indice",
+        suffixes=("_antigo", "_novo"),
+    )
+    lado_a_lado["mesmo_nivel"] = lado_a_lado["nivel_toxicidade_antigo"] == lado_a_lado["nivel_toxicidade_novo"]
+    lado_a_lado["mesmas_flags"] = pd.concat(
+        [lado_a_lado[f"{campo}_antigo"].astype(bool) == lado_a_lado[f"{campo}_novo"].astype(bool) for campo in CAMPOS_BOOLEANOS],
+        axis=1,
+    ).all(axis=1)
+    return lado_a_lado
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Reclassifica só as músicas com resultado desatualizado em relação ao prompt, modelo e exemplos atuais."
+    )
+    parser.add_argument("resultados", help="Arquivo de resultados (Parquet, Feather, CSV, JSON ou JSONL).")
+    parser.add_argument(
+        "--dataset",
+        default="../data/all_songs_data.csv",
+        help="Dataset com as letras (o mesmo usado na classificação).",
+    )
+    parser.add_argument("--plano", action="store_true", help="Só mostra o que seria reclassificado.")
+    parser.add_argument(
+        "--amostra",
+        type=float,
+        default=None,
+        help="Reclassifica só uma amostra das desatualizadas (fração se < 1, quantidade se >= 1) para comparar com o resultado atual.",
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Semente do sorteio da amostra.")
+    parser.add_argument("--comparacao", default=None, help="CSV com o resultado antigo e o novo de cada música reclassificada.")
+    parser.add_argument("--sem-mesclar", action="store_true", help="Não grava os resultados novos no arquivo de resultados.")
+    parser.add_argument("--mesclar", action="store_true", help="Grava os resultados novos no arquivo de resultados mesmo com --amostra.")
+    parser.add_argument("--saida", default=None, help="Arquivo de resultados mesclado (padrão: sobrescreve o de entrada).")
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="JSONL dos resultados novos (padrão: results/replanejamento_<data>.jsonl); repita para retomar.",
+    )
+    parser.add_argument("--modelo", default="mistral:instruct", help="Modelo do Ollama.")
+    parser.add_argument("--modelo-triagem", default=None, help="Modelo menor para a cascata (ver cascata.py).")
+    parser.add_argument("--limiar-confianca", type=float, default=0.8, help="Confiança mínima no nível para aceitar a triagem.")
+    parser.add_argument("--taxa-calibracao", type=float, default=0.05, help="Fração das músicas aceitas na triagem revistas pelo modelo principal.")
+    parser.add_argument("--prompt", default=None, help="Arquivo de texto com o prompt (padrão: PROMPT_CLASSIFICACAO).")
+    parser.add_argument("--exemplos", default=EXEMPLOS_PADRAO, help="CSV com os exemplos de classificação manual.")
+    parser.add_argument("--orcamento-exemplos", type=int, default=3000, help="Máximo de tokens de exemplos por música (0 envia todos).")
+    parser.add_argument("--estruturado", action="store_true", help="Restringe a resposta a um esquema JSON.")
+    parser.add_argument("--tamanho-lote", type=int, default=1, help="Máximo de músicas por chamada ao modelo.")
+    parser.add_argument("--letra-bruta", action="store_true", help="Não normaliza as letras antes do prompt.")
+    parser.add_argument("--max-tokens-letra", type=int, default=None, help="Tokens máximos de letra por chamada (janelas).")
+    parser.add_argument("--reutilizar-contexto", action="store_true", help="Reaproveita o contexto do prefixo (instruções + exemplos) em cada música.")
+    parser.add_argument("-c", "--concorrencia", type=int, default=1, help="Músicas (ou lotes) em processamento simultâneo.")
+    parser.add_argument("--hosts", default=None, help="Servidores Ollama separados por vírgula.")
+    parser.add_argument("--pre-filtro", default=None, help="Modelo do pré-filtro (gerado por pre_filtro.py).")
+    parser.add_argument("--limiar-pre-filtro", type=float, default=None, help="Probabilidade mínima de 'na' para pular o LLM (padrão: o do modelo).")
+    parser.add_argument("--cache", default="results/cache_respostas.sqlite", help="Arquivo SQLite do cache de respostas.")
+    parser.add_argument("--sem-cache", action="store_true", help="Ignora o cache de respostas.")
+    parser.add_argument("--tamanho-bloco", type=int, default=1000, help="Linhas lidas do dataset por vez.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    logging.basicConfig(level="INFO", format="%(asctime)s %(levelname)s %(message)s")
+
+    prompt = Path(args.prompt).read_text(encoding="utf-8") if args.prompt else PROMPT_CLASSIFICACAO
+    analyzer = OllamaAnalyzer(
+        model=args.modelo,
+        reutilizar_contexto=args.reutilizar_contexto,
+        orcamento_exemplos=args.orcamento_exemplos or None,
+        cache=None if args.sem_cache else CacheRespostas(args.cache),
+        modo_estruturado=args.estruturado,
+        pool=PoolEndpoints([h.strip() for h in args.hosts.split(",") if h.strip()]) if args.hosts else None,
+        tamanho_lote=args.tamanho_lote,
+        normalizar_letras=not args.letra_bruta,
+        max_tokens_letra=args.max_tokens_letra,
+        agendador=Agendador(
+            limitador=LimitadorAIMD(maximo=args.concorrencia) if args.concorrencia > 1 else None,
+            orcamento=OrcamentoRetries(proporcao=0.5),
+        ),
+        modelo_triagem=args.modelo_triagem,
+        limiar_confianca=args.limiar_confianca,
+        taxa_calibracao=args.taxa_calibracao,
+    )
+    carregar_exemplos_manuais(analyzer, args.exemplos)
+    impressao = analyzer.impressao(prompt)
+
+    resultados = ler_arquivo_resultados(args.resultados)
+    plano = planejar(resultados, ler_musicas(args.dataset, tamanho_bloco=args.tamanho_bloco), impressao)
+
+    print(f"\n📋 Configuração atual: {impressao}")
+    print(f"→ Em dia: {plano.em_dia} músicas")
+    print(f"→ Desatualizadas: {len(plano.desatualizadas)} músicas")
+    for motivo, count in plano.motivos().most_common():
+        print(f"   • {motivo}: {count}")
+
+    selecionadas = set(amostrar(plano.desatualizadas, args.amostra, args.seed))
+    if not selecionadas:
+        print("\n✅ Nada a reclassificar.")
+        return
+    if args.amostra is not None:
+        print(f"→ Amostra: {len(selecionadas)} músicas")
+    if args.plano:
+        return
+
+    checkpoint_path = args.checkpoint or f"results/replanejamento_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+    checkpoint = CheckpointStore(checkpoint_path)
+    musicas = (m for m in ler_musicas(args.dataset, tamanho_bloco=args.tamanho_bloco) if m.indice in selecionadas)
+    analise_conteudo_toxico(
+        musicas,
+        concorrencia=args.concorrencia,
+        analyzer=analyzer,
+        checkpoint=checkpoint,
+        pre_filtro=PreFiltro.carregar(args.pre_filtro, limiar=args.limiar_pre_filtro) if args.pre_filtro else None,
+        prompt=prompt,
+    )
+    novos = checkpoint.para_dataframe(incluir_impressao=True)
+    novos = novos[novos["indice"].isin(selecionadas)]
+    print(f"\n✅ Reclassificadas: {len(novos)} de {len(selecionadas)} músicas (checkpoint: {checkpoint_path})")
+
+    lado_a_lado = comparar(resultados, novos)
+    if not lado_a_lado.empty:
+        print(f"→ Mesmo nível que antes: {lado_a_lado['mesmo_nivel'].mean():.1%}")
+        print(f"→ Mesmas flags que antes: {lado_a_lado['mesmas_flags'].mean():.1%}")
+        mudancas = Counter(zip(lado_a_lado["nivel_toxicidade_antigo"], lado_a_lado["nivel_toxicidade_novo"]))
+        for (antigo, novo), count in mudancas.most_common(5):
+            if antigo != novo:
+                print(f"   • {antigo} → {novo}: {count}")
+    if args.comparacao:
+        lado_a_lado.to_csv(args.comparacao, index=False)
+        print(f"→ Comparação: {args.comparacao}")
+
+    if args.sem_mesclar:
+        return
+    if args.amostra is not None and not args.mesclar:
+        print("→ Amostra não mesclada aos resultados (use --mesclar para gravá-la)")
+        return
+    saida = gravar_arquivo_resultados(mesclar(resultados, novos), args.saida or args.resultados)
+    print(f"→ Resultados mesclados em: {saida}")
+
+
+if __name__ == "__main__":
+    main()
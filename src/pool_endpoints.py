@@ -0,0 +1,165 @@
+"""Balanceamento das chamadas entre vários servidores Ollama.
+
+Cada endpoint tem o seu ``ollama.Client`` (conexões HTTP reaproveitadas pelo
+httpx). As requisições vão para o endpoint saudável com menos requisições em
+andamento; se a chamada falhar por transporte (conexão, timeout, 429/5xx), a
+música é reenviada a outro endpoint; erros da própria requisição (4xx, como
+modelo inexistente) sobem direto, sem contar contra o endpoint. Um
+endpoint com falhas seguidas sai do pool e só volta depois de passar em uma
+verificação de saúde (``GET /api/tags``), feita em segundo plano no máximo
+uma vez a cada ``espera_reativacao`` segundos.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import ollama
+
+from agendador import TRANSPORTE, tipo_erro
+
+logger = logging.getLogger(__name__)
+
+
+class Endpoint:
+    """Um servidor Ollama e o seu estado no pool."""
+
+    def __init__(self, host: str, timeout: float):
+        self.host = host
+        self.client = ollama.Client(host=host, timeout=timeout)
+        self.em_andamento = 0
+        self.falhas_consecutivas = 0
+        self.saudavel = True
+        self.indisponivel_ate = 0.0
+        # Verificação de saúde em andamento (em segundo plano)
+        self.verificando = False
+        self.requisicoes = 0
+        self.erros = 0
+
+    def verificar_saude(self) -> bool:
+        try:
+            self.client.list()
+        except Exception:
+            return False
+        return True
+
+
+class PoolEndpoints:
+    """Distribui chamadas de geração entre vários hosts Ollama."""
+
+    def __init__(
+        self,
+        hosts: Sequence[str],
+        timeout: float = 300.0,
+        max_falhas: int = 3,
+        espera_reativacao: float = 30.0,
+    ):
+        if not hosts:
+            raise ValueError("Informe ao menos um host Ollama")
+        self.endpoints = [Endpoint(host, timeout) for host in hosts]
+        self.max_falhas = max_falhas
+        self.espera_reativacao = espera_reativacao
+        self._lock = threading.Lock()
+
+    def verificar_saude(self) -> Dict[str, bool]:
+        """Verifica todos os endpoints e atualiza quais podem receber requisições."""
+        status = {}
+        for endpoint in self.endpoints:
+            ok = endpoint.verificar_saude()
+            with self._lock:
+                self._marcar(endpoint, ok)
+            status[endpoint.host] = ok
+        return status
+
+    def _marcar(self, endpoint: Endpoint, saudavel: bool) -> None:
+        endpoint.saudavel = saudavel
+        if saudavel:
+            endpoint.falhas_consecutivas = 0
+        else:
+            endpoint.indisponivel_ate = time.monotonic() + self.espera_reativacao
+
+    def _reativar_expirados(self) -> None:
+        """Dispara em segundo plano a verificação dos endpoints cuja espera acabou.
+
+        A marcação é feita sob o lock, então cada endpoint é verificado por
+        uma única thread, e a chamada de geração não espera a verificação.
+        """
+        agora = time.monotonic()
+        with self._lock:
+            expirados = [
+                e for e in self.endpoints
+                if not e.saudavel and not e.verificando and e.indisponivel_ate <= agora
+            ]
+            for endpoint in expirados:
+                endpoint.verificando = True
+                endpoint.indisponivel_ate = agora + self.espera_reativacao
+        for endpoint in expirados:
+            threading.Thread(target=self._verificar_em_segundo_plano, args=(endpoint,), daemon=True).start()
+
+    def _verificar_em_segundo_plano(self, endpoint: Endpoint) -> None:
+        ok = endpoint.verificar_saude()
+        with self._lock:
+            self._marcar(endpoint, ok)
+            endpoint.verificando = False
+        if ok:
+            logger.info(f"✅ Endpoint {endpoint.host} de volta ao pool")
+
+    def _escolher(self, excluir: Sequence[Endpoint]) -> Optional[Endpoint]:
+        with self._lock:
+            candidatos = [e for e in self.endpoints if e.saudavel and e not in excluir]
+            if not candidatos:
+                # Sem endpoints saudáveis ainda não tentados: tenta os demais
+                candidatos = [e for e in self.endpoints if e not in excluir]
+            if not candidatos:
+                return None
+            endpoint = min(candidatos, key=lambda e: (e.em_andamento, e.requisicoes))
+            endpoint.em_andamento += 1
+            endpoint.requisicoes += 1
+            return endpoint
+
+    def generate(self, **kwargs: Any) -> Any:
+        """Mesma interface de ``ollama.generate``, com failover entre endpoints."""
+        self._reativar_expirados()
+        tentados: List[Endpoint] = []
+        ultimo_erro: Optional[Exception] = None
+        while True:
+            endpoint = self._escolher(tentados)
+            if endpoint is None:
+                break
+            tentados.append(endpoint)
+            try:
+                response = endpoint.client.generate(**kwargs)
+            except Exception as e:
+                if tipo_erro(e) != TRANSPORTE:
+                    # A requisição falharia em qualquer host: não é culpa do endpoint
+                    with self._lock:
+                        endpoint.em_andamento -= 1
+                    raise
+                ultimo_erro = e
+                with self._lock:
+                    endpoint.em_andamento -= 1
+                    endpoint.erros += 1
+                    endpoint.falhas_consecutivas += 1
+                    if endpoint.falhas_consecutivas >= self.max_falhas:
+                        self._marcar(endpoint, False)
+                logger.warning(f"⚠️ Falha no endpoint {endpoint.host}: {e}")
+                continue
+            with self._lock:
+                endpoint.em_andamento -= 1
+                endpoint.falhas_consecutivas = 0
+            return response
+
+        raise RuntimeError(f"Todos os endpoints Ollama falharam: {ultimo_erro}") from ultimo_erro
+
+    def estatisticas(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "host": e.host,
+                    "requisicoes": e.requisicoes,
+                    "erros": e.erros,
+                    "saudavel": e.saudavel,
+                }
+                for e in self.endpoints
+            ]
@@ -0,0 +1,421 @@
+"""Pós-processamento dos arquivos de resultados em uma única passada.
+
+O arquivo de resultados (CSV, JSON, JSONL, Parquet ou Feather) é lido em blocos. Em cada bloco
+``nivel_toxicidade`` é validado e convertido para uma categoria ordenada (e
+para o valor numérico de ``NIVEL_NUMERICO``), ``artista`` vira categoria e as
+cinco flags viram ``bool``. Na mesma passada são acumulados os agregados por
+ano, por artista e por categoria e as somas da matriz de correlação. O arquivo
+convertido, se pedido, é escrito também na mesma passada.
+
+Os agregados ficam em um cache compacto (pickle) ao lado dos resultados
+(``<nome>_agregados.pkl``), e o notebook e o ``main()`` do analisador leem as
+tabelas prontas em vez de recalcular a partir do CSV. O cache é refeito
+quando o arquivo de resultados muda.
+
+Uso:
+    python pos_processamento.py results/relacionamentos_toxicos_20250615_031911.csv
+    python pos_processamento.py results/relacionamentos_toxicos_20250615_031911.csv \
+        --converter-para results/relacionamentos_toxicos_converted.csv --nova-coluna
+"""
+
+import argparse
+import json
+import os
+import pickle
+import re
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from formato_colunar import FORMATOS as FORMATOS_COLUNARES, ler_em_blocos
+from parser_resposta import CAMPOS_BOOLEANOS
+
+# Valor numérico de cada nível de toxicidade (também define a ordem dos níveis)
+NIVEL_NUMERICO = {
+    "na": 0.0,
+    "muito baixo": 0.1,
+    "baixo": 0.2,
+    "moderado": 0.3,
+    "alto": 0.8,
+    "muito alto": 1.0,
+}
+
+TIPO_NIVEL = pd.CategoricalDtype(list(NIVEL_NUMERICO), ordered=True)
+_VALORES_NIVEL = np.array(list(NIVEL_NUMERICO.values()))
+
+# Variáveis da matriz de correlação
+COLUNAS_CORRELACAO = [*CAMPOS_BOOLEANOS, "nivel_numerico"]
+
+# Somas acumuladas por ano/artista; as médias e desvios saem delas no final
+_SOMAS = ["num_musicas", "soma_nivel", "soma_nivel2", "soma_score", *CAMPOS_BOOLEANOS, "alguma_toxicidade"]
+
+VERSAO_CACHE = 1
+
+# Colunas calculadas por ``normalizar`` (não existem no arquivo)
+COLUNAS_DERIVADAS = ("nivel_numerico", "score_medio")
+
+_RE_SEPARADOR_JSON = re.compile(r"[\s,]*")
+
+
+def _registros_lista_json(path: Path, tamanho_leitura: int = 1 << 20) -> Iterator[Dict[str, Any]]:
+    """Objetos de um arquivo com uma lista JSON, decodificados aos poucos."""
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as f:
+        buffer = f.read(tamanho_leitura).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"O arquivo {path} não contém uma lista JSON")
+        posicao = 1
+        fim_arquivo = False
+        while True:
+            posicao = _RE_SEPARADOR_JSON.match(buffer, posicao).end()
+            if buffer.startswith("]", posicao):
+                return
+            try:
+                registro, posicao = decoder.raw_decode(buffer, posicao)
+            except json.JSONDecodeError:
+                # Objeto cortado no fim do buffer: lê mais um pedaço
+                if fim_arquivo:
+                    raise
+                leitura = f.read(tamanho_leitura)
+                fim_arquivo = not leitura
+                buffer, posicao = buffer[posicao:] + leitura, 0
+                continue
+            yield registro
+
+
+def _blocos_lista_json(path: Path, tamanho_bloco: int) -> Iterator[pd.DataFrame]:
+    bloco: List[Dict[str, Any]] = []
+    for registro in _registros_lista_json(path):
+        bloco.append(registro)
+        if len(bloco) == tamanho_bloco:
+            yield pd.DataFrame(bloco)
+            bloco = []
+    if bloco:
+        yield pd.DataFrame(bloco)
+
+
+def ler_blocos(
+    path: str | Path,
+    tamanho_bloco: int = 50_000,
+    colunas: Optional[Sequence[str]] = None,
+) -> Iterator[pd.DataFrame]:
+    """Lê o arquivo de resultados em blocos de ``tamanho_bloco`` linhas.
+
+    Com ``colunas`` só essas colunas (as que existirem no arquivo) são lidas.
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Arquivo de resultados não encontrado: {path}")
+
+    sufixo = path.suffix.lower()
+    if sufixo in FORMATOS_COLUNARES:
+        yield from ler_em_blocos(path, tamanho_bloco, colunas)
+        return
+
+    if sufixo == ".json":
+        leitor = _blocos_lista_json(path, tamanho_bloco)
+    elif sufixo in (".jsonl", ".ndjson"):
+        leitor = pd.read_json(path, lines=True, chunksize=tamanho_bloco)
+    else:
+        # Só o campo vazio conta como ausente: o nível "NA" não é valor faltante
+        leitor = pd.read_csv(
+            path,
+            chunksize=tamanho_bloco,
+            keep_default_na=False,
+            na_values=[""],
+            usecols=(lambda coluna: coluna in colunas) if colunas is not None else None,
+        )
+    with closing(leitor):
+        for bloco in leitor:
+            yield bloco[[c for c in colunas if c in bloco.columns]] if colunas is not None else bloco
+
+
+def normalizar(bloco: pd.DataFrame, coluna: str = "nivel_toxicidade") -> pd.DataFrame:
+    """Valida e converte os tipos de um bloco de resultados.
+
+    ``coluna`` vira a categoria ordenada ``TIPO_NIVEL`` (com o valor numérico
+    em ``nivel_numerico``), as flags viram ``bool`` (ausentes contam como
+    ``False``), ``artista`` vira categoria e ``ano`` inteiro. Níveis fora de
+    ``NIVEL_NUMERICO`` geram ``ValueError``.
+    """
+    if coluna not in bloco.columns:
+        raise KeyError(
+            f"A coluna '{coluna}' não foi encontrada nos resultados. Colunas disponíveis: {list(bloco.columns)}"
+        )
+
+    normalizado = bloco.copy()
+    nivel = bloco[coluna].astype(str).str.strip().str.lower()
+    invalidos = ~nivel.isin(TIPO_NIVEL.categories)
+    if invalidos.any():
+        raise ValueError(
+            "Foram encontrados valores de toxicidade sem mapeamento: "
+            + ", ".join(map(str, bloco.loc[invalidos, coluna].dropna().unique().tolist()))
+        )
+    normalizado[coluna] = nivel.astype(TIPO_NIVEL)
+    normalizado["nivel_numerico"] = _VALORES_NIVEL[normalizado[coluna].cat.codes.to_numpy()]
+
+    for campo in CAMPOS_BOOLEANOS:
+        if campo not in bloco.columns:
+            normalizado[campo] = False
+        elif bloco[campo].dtype != bool:
+            texto = bloco[campo].astype(str).str.strip().str.lower()
+            normalizado[campo] = texto.isin(("true", "1", "1.0", "sim"))
+    normalizado["score_medio"] = normalizado[list(CAMPOS_BOOLEANOS)].mean(axis=1).astype(np.float32)
+
+    if "artista" in bloco.columns:
+        normalizado["artista"] = bloco["artista"].astype("category")
+    if "ano" in bloco.columns:
+        normalizado["ano"] = pd.to_numeric(bloco["ano"], errors="coerce").round().astype("Int16")
+    return normalizado
+
+
+def _finalizar(somas: pd.DataFrame) -> pd.DataFrame:
+    """Acrescenta médias e desvios às somas por grupo."""
+    n = somas["num_musicas"]
+    tabela = somas.copy()
+    tabela["nivel_medio"] = somas["soma_nivel"] / n
+    # Desvio padrão amostral, como o ``std`` do pandas (NaN para uma música)
+    variancia = (somas["soma_nivel2"] - somas["soma_nivel"] ** 2 / n) / (n - 1)
+    tabela["nivel_std"] = np.sqrt(variancia.clip(lower=0)).where(n > 1)
+    tabela["score_medio"] = somas["soma_score"] / n
+    return tabela
+
+
+def agrupar_periodos(por_ano: pd.DataFrame, anos: int = 10) -> pd.DataFrame:
+    """Reagrupa a tabela por ano em períodos de ``anos`` anos (padrão: décadas)."""
+    periodo = (por_ano.index.to_series() // anos) * anos
+    somas = por_ano[_SOMAS].groupby(periodo.to_numpy()).sum()
+    somas.index.name = "decada" if anos == 10 else "periodo"
+    return _finalizar(somas)
+
+
+class Agregador:
+    """Acumula os agregados dos blocos normalizados."""
+
+    def __init__(self, coluna: str = "nivel_toxicidade"):
+        self.coluna = coluna
+        self.total = 0
+        self._por_ano: List[pd.DataFrame] = []
+        self._por_artista: List[pd.DataFrame] = []
+        self._niveis = pd.Series(0, index=TIPO_NIVEL.categories, dtype=np.int64)
+        self._origem: Dict[str, int] = {}
+        self._alguma = 0
+        self._soma = np.zeros(len(COLUNAS_CORRELACAO))
+        self._produtos = np.zeros((len(COLUNAS_CORRELACAO), len(COLUNAS_CORRELACAO)))
+
+    def adicionar(self, bloco: pd.DataFrame) -> None:
+        if bloco.empty:
+            return
+        self.total += len(bloco)
+
+        variaveis = bloco[COLUNAS_CORRELACAO].to_numpy(dtype=np.float64)
+        self._soma += variaveis.sum(axis=0)
+        self._produtos += variaveis.T @ variaveis
+
+        flags = bloco[list(CAMPOS_BOOLEANOS)]
+        somas = pd.DataFrame({
+            "num_musicas": 1,
+            "soma_nivel": bloco["nivel_numerico"].astype(np.float64),
+            "soma_nivel2": bloco["nivel_numerico"].astype(np.float64) ** 2,
+            "soma_score": bloco["score_medio"].astype(np.float64),
+            **{campo: flags[campo].astype(np.int64) for campo in CAMPOS_BOOLEANOS},
+            "alguma_toxicidade": flags.any(axis=1).astype(np.int64),
+        }, index=bloco.index)
+        self._alguma += int(somas["alguma_toxicidade"].sum())
+        if "ano" in bloco.columns:
+            self._por_ano.append(somas.groupby(bloco["ano"], observed=True).sum())
+        if "artista" in bloco.columns:
+            self._por_artista.append(somas.groupby(bloco["artista"], observed=True).sum())
+
+        self._niveis += bloco[self.coluna].value_counts().reindex(self._niveis.index, fill_value=0)
+        if "origem" in bloco.columns:
+            for origem, quantidade in bloco["origem"].value_counts().items():
+                self._origem[origem] = self._origem.get(origem, 0) + int(quantidade)
+
+    def _tabela(self, partes: List[pd.DataFrame], nome: str) -> pd.DataFrame:
+        if not partes:
+            return _finalizar(pd.DataFrame(columns=_SOMAS, dtype=np.float64).rename_axis(nome))
+        somas = pd.concat(partes).groupby(level=0, observed=True).sum()
+        somas.index.name = nome
+        return _finalizar(somas)
+
+    def correlacao(self) -> pd.DataFrame:
+        """Matriz de correlação de Pearson calculada a partir das somas."""
+        n = max(self.total, 1)
+        media = self._soma / n
+        covariancia = self._produtos / n - np.outer(media, media)
+        desvio = np.sqrt(np.clip(np.diag(covariancia), 0, None))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            matriz = covariancia / np.outer(desvio, desvio)
+        matriz[np.outer(desvio, desvio) == 0] = np.nan
+        return pd.DataFrame(matriz, index=COLUNAS_CORRELACAO, columns=COLUNAS_CORRELACAO)
+
+    def resultado(self) -> Dict[str, Any]:
+        por_ano = self._tabela(self._por_ano, "ano")
+        por_artista = self._tabela(self._por_artista, "artista")
+        # Com flags 0/1 a soma de x*x é a contagem de músicas com a flag
+        flags = pd.Series(
+            self._produtos.diagonal()[:len(CAMPOS_BOOLEANOS)].round().astype(np.int64),
+            index=list(CAMPOS_BOOLEANOS),
+        )
+        total = self.total
+        return {
+            "versao": VERSAO_CACHE,
+            "por_ano": por_ano,
+            "por_artista": por_artista,
+            "niveis": self._niveis.copy(),
+            "flags": flags,
+            "origem": pd.Series(self._origem, dtype=np.int64),
+            "correlacao": self.correlacao(),
+            "geral": {
+                "total": total,
+                "ano_min": int(por_ano.index.min()) if not por_ano.empty else None,
+                "ano_max": int(por_ano.index.max()) if not por_ano.empty else None,
+                "artistas": len(por_artista),
+                "alguma_toxicidade": self._alguma,
+                "nivel_medio": float(self._soma[-1] / total) if total else 0.0,
+            },
+        }
+
+
+def agregar(df: pd.DataFrame, coluna: str = "nivel_toxicidade") -> Dict[str, Any]:
+    """Agregados de um DataFrame de resultados que já está na memória."""
+    agregador = Agregador(coluna)
+    agregador.adicionar(normalizar(df, coluna))
+    return agregador.resultado()
+
+
+def processar_resultados(
+    path: str | Path,
+    saida_convertida: Optional[str | Path] = None,
+    *,
+    nova_coluna: bool = False,
+    coluna: str = "nivel_toxicidade",
+    tamanho_bloco: int = 50_000,
+) -> Dict[str, Any]:
+    """Valida, agrega e (opcionalmente) converte um arquivo de resultados.
+
+    Tudo acontece em uma única passada em blocos. Com ``saida_convertida`` é
+    escrito um CSV igual ao original, com ``coluna`` substituída pelo valor
+    numérico (ou, com ``nova_coluna``, acrescida de ``<coluna>_num``).
+    """
+    agregador = Agregador(coluna)
+    primeiro = True
+    for bloco in ler_blocos(path, tamanho_bloco):
+        normalizado = normalizar(bloco, coluna)
+        agregador.adicionar(normalizado)
+        if saida_convertida is not None:
+            convertido = bloco.copy()
+            convertido[f"{coluna}_num" if nova_coluna else coluna] = normalizado["nivel_numerico"]
+            convertido.to_csv(saida_convertida, mode="w" if primeiro else "a", header=primeiro, index=False)
+        primeiro = False
+    return agregador.resultado()
+
+
+def caminho_cache(path: str | Path) -> Path:
+    path = Path(path)
+    return path.with_name(f"{path.stem}_agregados.pkl")
+
+
+def _assinatura(path: str | Path) -> Dict[str, Any]:
+    info = os.stat(path)
+    return {"arquivo": Path(path).name, "tamanho": info.st_size, "mtime_ns": info.st_mtime_ns}
+
+
+def salvar_agregados(agregados: Dict[str, Any], fonte: str | Path, destino: Optional[str | Path] = None) -> Path:
+    """Grava os agregados de ``fonte`` no cache (padrão: ``caminho_cache(fonte)``)."""
+    destino = Path(destino) if destino is not None else caminho_cache(fonte)
+    temporario = destino.with_suffix(destino.suffix + ".tmp")
+    with open(temporario, "wb") as f:
+        pickle.dump({**agregados, "fonte": _assinatura(fonte)}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporario, destino)
+    return destino
+
+
+def carregar_agregados(path: str | Path, recalcular: bool = False) -> Dict[str, Any]:
+    """Agregados de um arquivo de resultados, do cache quando ele está em dia."""
+    cache = caminho_cache(path)
+    if not recalcular and cache.exists():
+        try:
+            with open(cache, "rb") as f:
+                agregados = pickle.load(f)
+            if agregados.get("versao") == VERSAO_CACHE and agregados.get("fonte") == _assinatura(path):
+                return agregados
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass
+    agregados = processar_resultados(path)
+    salvar_agregados(agregados, path, cache)
+    return agregados
+
+
+def ler_resultados(path: str | Path, colunas: Optional[List[str]] = None, tamanho_bloco: int = 50_000) -> pd.DataFrame:
+    """Lê os resultados já normalizados (categorias, bool e ``nivel_numerico``).
+
+    O arquivo é lido em blocos e cada bloco é normalizado (e reduzido às
+    ``colunas``, se pedidas) antes de juntar: o pico de memória é o do
+    resultado compacto, não o do arquivo com todas as colunas em texto.
+    """
+    fonte = None
+    if colunas is not None:
+        # O nível e as flags são lidos sempre: deles saem as colunas derivadas
+        fonte = list(dict.fromkeys(
+            [c for c in colunas if c not in COLUNAS_DERIVADAS] + ["nivel_toxicidade", *CAMPOS_BOOLEANOS]
+        ))
+    blocos = []
+    for bloco in ler_blocos(path, tamanho_bloco, fonte):
+        normalizado = normalizar(bloco)
+        blocos.append(normalizado[colunas] if colunas is not None else normalizado)
+    df = pd.concat(blocos, ignore_index=True) if blocos else pd.DataFrame()
+    if "artista" in df.columns:
+        df["artista"] = df["artista"].astype("category")
+    return df
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Valida, converte e agrega arquivos de resultados em uma única passada."
+    )
+    parser.add_argument("resultados", help="Arquivo de resultados (CSV, JSON, JSONL, Parquet ou Feather).")
+    parser.add_argument(
+        "--converter-para",
+        default=None,
+        help="Também grava um CSV com o nível de toxicidade convertido para valor numérico.",
+    )
+    parser.add_argument(
+        "--nova-coluna",
+        action="store_true",
+        help="Na conversão, mantém a coluna original e cria <coluna>_num.",
+    )
+    parser.add_argument("--coluna", default="nivel_toxicidade", help="Coluna com o nível de toxicidade.")
+    parser.add_argument("--tamanho-bloco", type=int, default=50_000, help="Linhas lidas por vez.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    agregados = processar_resultados(
+        args.resultados,
+        args.converter_para,
+        nova_coluna=args.nova_coluna,
+        coluna=args.coluna,
+        tamanho_bloco=args.tamanho_bloco,
+    )
+    cache = salvar_agregados(agregados, args.resultados)
+
+    geral = agregados["geral"]
+    print(f"Total de músicas: {geral['total']:,}")
+    if geral["ano_min"] is not None:
+        print(f"Período: {geral['ano_min']} - {geral['ano_max']} | Artistas: {geral['artistas']:,}")
+    print("\nDistribuição por nível de toxicidade:")
+    for nivel, count in agregados["niveis"].items():
+        print(f"→ {nivel}: {count} músicas (valor numérico: {NIVEL_NUMERICO[nivel]:.1f})")
+    print(f"\n✅ Agregados salvos em: {cache}")
+    if args.converter_para:
+        print(f"✅ Arquivo convertido salvo em: {args.converter_para}")
+
+
+if __name__ == "__main__":
+    main()
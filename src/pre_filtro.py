@@ -0,0 +1,212 @@
+"""Pré-classificador local que evita chamar o LLM para músicas sem relacionamento.
+
+Metade do corpus volta do modelo como ``"na"`` ("nenhum elemento tóxico
+identificado"). Este módulo treina uma regressão logística (NumPy) sobre
+palavras com hashing e um léxico de termos românticos, usando como rótulo os
+resultados já produzidos pelo LLM, e só marca como ``"na"`` as músicas em que
+a probabilidade passa de um limiar calibrado pela precisão.
+
+Uso:
+    python pre_filtro.py results/relacionamentos_toxicos_20250615_031911.csv \\
+        ../data/all_songs_data.csv -o results/pre_filtro.npz
+"""
+
+import argparse
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from letras import tokenizar
+
+# Termos que indicam que a letra fala de relacionamento amoroso
+LEXICO_RELACIONAMENTO = frozenset({
+    "love", "lover", "loving", "loved", "baby", "babe", "darling", "honey", "sweetheart",
+    "heart", "kiss", "kisses", "girl", "boy", "girlfriend", "boyfriend", "romance",
+    "together", "hold", "touch", "miss", "need", "want", "mine", "yours", "forever",
+    "leave", "left", "goodbye", "cheat", "cheating", "lie", "lies", "jealous", "bed",
+    "body", "sexy", "desire", "marry", "wedding", "ring", "break", "breakup", "lonely",
+    "amor", "coração", "beijo", "paixão", "saudade",
+})
+
+RESULTADO_PRE_FILTRO = {
+    "nivel_toxicidade": "na",
+    "abuso_emocional": False,
+    "ciume_possessividade": False,
+    "dependencia": False,
+    "objetificacao": False,
+    "violencia_traicao": False,
+    "justificativa": "nenhum elemento tóxico identificado",
+    "origem": "pre_filtro",
+}
+
+
+class PreFiltro:
+    """Regressão logística que estima a probabilidade de a música ser ``"na"``."""
+
+    def __init__(self, dimensoes: int = 2 ** 11, limiar: float = 0.9):
+        self.dimensoes = dimensoes
+        self.limiar = limiar
+        self.pesos = np.zeros(dimensoes + 3, dtype=np.float32)
+        self.vies = 0.0
+
+    def vetorizar(self, texto: str) -> np.ndarray:
+        palavras = tokenizar(texto)
+        vetor = np.zeros(self.dimensoes + 3, dtype=np.float32)
+        for palavra in palavras:
+            vetor[zlib.crc32(palavra.encode("utf-8")) % self.dimensoes] += 1.0
+        hashed = vetor[:self.dimensoes]
+        np.log1p(hashed, out=hashed)
+        norma = np.linalg.norm(hashed)
+        if norma > 0:
+            hashed /= norma
+
+        # Atributos do léxico: presença, densidade e tamanho da letra
+        romanticas = sum(1 for p in palavras if p in LEXICO_RELACIONAMENTO)
+        vetor[self.dimensoes] = float(romanticas == 0)
+        vetor[self.dimensoes + 1] = romanticas / max(len(palavras), 1) * 10
+        vetor[self.dimensoes + 2] = np.log1p(len(palavras)) / 10
+        return vetor
+
+    def matriz(self, textos: Sequence[str]) -> np.ndarray:
+        return np.vstack([self.vetorizar(t) for t in textos]) if len(textos) else np.zeros((0, self.dimensoes + 3), dtype=np.float32)
+
+    def treinar(
+        self,
+        textos: Sequence[str],
+        rotulos_na: Sequence[bool],
+        epocas: int = 300,
+        taxa: float = 0.5,
+        l2: float = 1e-4,
+    ) -> "PreFiltro":
+        """Ajusta os pesos por gradiente descendente com momento."""
+        X = self.matriz(textos)
+        y = np.asarray(rotulos_na, dtype=np.float32)
+        n = max(len(y), 1)
+        velocidade_w = np.zeros_like(self.pesos)
+        velocidade_b = 0.0
+        for _ in range(epocas):
+            p = _sigmoide(X @ self.pesos + self.vies)
+            erro = p - y
+            grad_w = X.T @ erro / n + l2 * self.pesos
+            grad_b = float(erro.mean()) if len(y) else 0.0
+            velocidade_w = 0.9 * velocidade_w - taxa * grad_w
+            velocidade_b = 0.9 * velocidade_b - taxa * grad_b
+            self.pesos += velocidade_w
+            self.vies += velocidade_b
+        return self
+
+    def probabilidades(self, textos: Sequence[str]) -> np.ndarray:
+        return _sigmoide(self.matriz(textos) @ self.pesos + self.vies)
+
+    def probabilidade_na(self, texto: str) -> float:
+        return float(_sigmoide(self.vetorizar(texto) @ self.pesos + self.vies))
+
+    def descartar(self, texto: str) -> bool:
+        """``True`` se a música pode ir direto para a saída como ``"na"``."""
+        return self.probabilidade_na(texto) >= self.limiar
+
+    def salvar(self, path: str | Path) -> None:
+        np.savez(path, pesos=self.pesos, vies=self.vies, dimensoes=self.dimensoes, limiar=self.limiar)
+
+    @classmethod
+    def carregar(cls, path: str | Path, limiar: Optional[float] = None) -> "PreFiltro":
+        dados = np.load(path)
+        filtro = cls(dimensoes=int(dados["dimensoes"]), limiar=float(dados["limiar"]))
+        filtro.pesos = dados["pesos"].astype(np.float32)
+        filtro.vies = float(dados["vies"])
+        if limiar is not None:
+            filtro.limiar = limiar
+        return filtro
+
+
+def _sigmoide(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+
+def avaliar(
+    probabilidades: np.ndarray,
+    rotulos_na: Sequence[bool],
+    limiares: Sequence[float] = (0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 0.99),
+) -> pd.DataFrame:
+    """Precisão/recall da decisão ``"na"`` contra os rótulos do LLM.
+
+    ``precisao`` é a fração das músicas descartadas que o LLM também marcou
+    como ``"na"``; ``recall`` é a fração dos ``"na"`` do LLM que o filtro
+    descarta; ``chamadas_evitadas`` é a fração do corpus que não vai ao LLM.
+    """
+    y = np.asarray(rotulos_na, dtype=bool)
+    linhas: List[Dict[str, float]] = []
+    for limiar in limiares:
+        previsto = probabilidades >= limiar
+        verdadeiros = int((previsto & y).sum())
+        linhas.append({
+            "limiar": limiar,
+            "precisao": verdadeiros / previsto.sum() if previsto.sum() else 1.0,
+            "recall": verdadeiros / y.sum() if y.sum() else 0.0,
+            "chamadas_evitadas": float(previsto.mean()) if len(y) else 0.0,
+            "toxicas_perdidas": int((previsto & ~y).sum()),
+        })
+    return pd.DataFrame(linhas)
+
+
+def carregar_rotulos(resultados_csv: str | Path, letras_csv: str | Path) -> pd.DataFrame:
+    """Junta os resultados do LLM com as letras originais pelo ``indice``."""
+    resultados = pd.read_csv(resultados_csv, usecols=["indice", "nivel_toxicidade"], keep_default_na=False)
+    letras = pd.read_csv(letras_csv, usecols=["Lyrics"])
+    dados = resultados.join(letras, on="indice", how="inner").dropna(subset=["Lyrics"])
+    dados["na"] = dados["nivel_toxicidade"].astype(str).str.strip().str.lower() == "na"
+    return dados
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Treina e avalia o pré-filtro de músicas sem relacionamento amoroso."
+    )
+    parser.add_argument("resultados_csv", help="CSV de resultados do LLM (colunas indice e nivel_toxicidade).")
+    parser.add_argument("letras_csv", help="CSV original das músicas (coluna Lyrics), indexado pela posição da linha.")
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="results/pre_filtro.npz",
+        help="Arquivo onde salvar o modelo treinado.",
+    )
+    parser.add_argument(
+        "--precisao-minima",
+        type=float,
+        default=0.95,
+        help="Precisão mínima da decisão 'na' usada para escolher o limiar salvo no modelo.",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = _parse_args()
+    dados = carregar_rotulos(args.resultados_csv, args.letras_csv)
+
+    # Divisão determinística treino/validação (80/20)
+    ordem = np.random.default_rng(42).permutation(len(dados))
+    corte = int(len(dados) * 0.8)
+    treino, validacao = dados.iloc[ordem[:corte]], dados.iloc[ordem[corte:]]
+
+    filtro = PreFiltro().treinar(treino["Lyrics"].tolist(), treino["na"].tolist())
+    tabela = avaliar(filtro.probabilidades(validacao["Lyrics"].tolist()), validacao["na"].tolist())
+    print("Avaliação no conjunto de validação (rótulos do LLM):")
+    print(tabela.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+    aceitaveis = tabela[tabela["precisao"] >= args.precisao_minima]
+    if aceitaveis.empty:
+        filtro.limiar = 1.0
+        print(f"Nenhum limiar atinge precisão {args.precisao_minima:.2f}; o filtro não descartará músicas.")
+    else:
+        filtro.limiar = float(aceitaveis.sort_values("chamadas_evitadas", ascending=False)["limiar"].iloc[0])
+        print(f"Limiar escolhido: {filtro.limiar}")
+
+    filtro.salvar(args.output)
+    print(f"Modelo salvo em: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
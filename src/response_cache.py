@@ -0,0 +1,105 @@
+"""Cache persistente das classificações devolvidas pelo modelo.
+
+A chave é o hash do conteúdo que determina a resposta (modelo, opções de
+geração, prefixo do prompt, exemplos e letra normalizada), então letras
+repetidas no dataset e novas execuções com a mesma configuração não voltam a
+chamar o Ollama. O arquivo é um SQLite com despejo LRU por número de entradas.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+def chave_cache(**partes: Any) -> str:
+    """Gera a chave de cache a partir das partes que influenciam a resposta."""
+    conteudo = json.dumps(partes, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+class CacheRespostas:
+    """Cache LRU em disco de resultados já validados."""
+
+    def __init__(self, path: str | Path, max_entradas: int = 100_000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entradas = max_entradas
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS respostas ("
+            " chave TEXT PRIMARY KEY,"
+            " resultado TEXT NOT NULL,"
+            " ultimo_acesso REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ultimo_acesso ON respostas (ultimo_acesso)"
+        )
+        self._conn.commit()
+        self._entradas = self._conn.execute("SELECT COUNT(*) FROM respostas").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._entradas
+
+    def obter(self, chave: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT resultado FROM respostas WHERE chave = ?", (chave,)
+            ).fetchone()
+            if linha is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE respostas SET ultimo_acesso = ? WHERE chave = ?", (time.time(), chave)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return json.loads(linha[0])
+
+    def guardar(self, chave: str, resultado: Dict[str, Any]) -> None:
+        with self._lock:
+            existe = self._conn.execute(
+                "SELECT 1 FROM respostas WHERE chave = ?", (chave,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO respostas (chave, resultado, ultimo_acesso) VALUES (?, ?, ?)",
+                (chave, json.dumps(resultado, ensure_ascii=False), time.time()),
+            )
+            if existe is None:
+                self._entradas += 1
+            excedente = self._entradas - self.max_entradas
+            if excedente > 0:
+                self._conn.execute(
+                    "DELETE FROM respostas WHERE chave IN ("
+                    " SELECT chave FROM respostas ORDER BY ultimo_acesso LIMIT ?)",
+                    (excedente,),
+                )
+                self._entradas -= excedente
+            self._conn.commit()
+
+    def invalidar(self) -> None:
+        """Remove todas as entradas do cache."""
+        with self._lock:
+            self._conn.execute("DELETE FROM respostas")
+            self._conn.commit()
+            self._entradas = 0
+
+    def estatisticas(self) -> Dict[str, Any]:
+        consultas = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "taxa_acerto": self.hits / consultas if consultas else 0.0,
+            "entradas": self._entradas,
+        }
+
+    def fechar(self) -> None:
+        with self._lock:
+            self._conn.close()